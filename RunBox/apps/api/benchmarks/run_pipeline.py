@@ -0,0 +1,408 @@
+"""
+Load test of the run pipeline: POST /api/runs through to a finished run.
+
+    cd apps/api
+    python -m benchmarks.run_pipeline --path inline --backend fake --requests 500
+    python -m benchmarks.run_pipeline --path celery --backend docker --mix python=3,go=1 \\
+        --payload-bytes 256,65536 --output results.json --compare baseline.json
+
+The FastAPI app is driven in-process over ASGI. `--path inline` executes runs inside the API
+(RUNBOX_RUN_EXECUTION_MODE=inline); `--path celery` publishes them through Celery to an
+in-process worker, with an in-memory broker and result backend and fakeredis standing in for
+Redis. Backends: `fake` (sleeps, no Docker or toolchains, for CI), `local` (LocalSandbox) and
+`docker` (the runner's DockerSandbox, celery path only, needs a Docker daemon).
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import importlib
+import importlib.util
+import json
+import logging
+import os
+import platform
+import random
+import resource
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import ExitStack
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+
+from runbox_sandbox import SandboxResult
+
+RUNNER_SRC = Path(__file__).resolve().parents[3] / "services" / "runner" / "src"
+PENDING = {"queued", "running"}
+
+SOURCES = {
+    "python": ("Main.py", 'print("ok")\n'),
+    "node": ("Main.mjs", 'console.log("ok");\n'),
+    "go": ("Main.go", 'package main\n\nimport "fmt"\n\nfunc main() {\n\tfmt.Println("ok")\n}\n'),
+    "rust": ("Main.rs", 'fn main() {\n    println!("ok");\n}\n'),
+}
+
+
+@dataclass
+class Sample:
+    language: str
+    payload_bytes: int
+    status: str
+    submit_ms: float
+    e2e_ms: float
+    peak_memory_kb: int | None = None
+
+
+@dataclass
+class Report:
+    config: dict
+    environment: dict
+    wall_s: float = 0.0
+    samples: list[Sample] = field(default_factory=list)
+    errors: dict[str, int] = field(default_factory=dict)
+
+
+def parse_mix(value: str) -> dict[str, int]:
+    mix = {}
+    for part in value.split(","):
+        language, _, weight = part.partition("=")
+        if language not in SOURCES:
+            raise argparse.ArgumentTypeError(f"unknown language {language!r}")
+        mix[language] = int(weight or 1)
+    return mix
+
+
+def build_payload(language: str, payload_bytes: int) -> dict:
+    name, source = SOURCES[language]
+    files = [{"name": name, "content": source}]
+    if payload_bytes > len(source):
+        files.append({"name": "payload.txt", "content": "x" * (payload_bytes - len(source))})
+    return {"language": language, "files": files}
+
+
+class FakeSandbox:
+    """Stand-in for LocalSandbox/DockerSandbox: sleeps a configurable latency and prints "ok"."""
+
+    def __init__(self, latency_ms: float, jitter_ms: float, seed: int) -> None:
+        self._latency_ms = latency_ms
+        self._jitter_ms = jitter_ms
+        self._random = random.Random(seed)
+
+    async def run_async(
+        self, language, files, build_cmd, run_cmd, env=None, stdin=None, on_output=None, usage=None
+    ):
+        elapsed = max(self._latency_ms + self._random.uniform(-1, 1) * self._jitter_ms, 0)
+        await asyncio.sleep(elapsed / 1000)
+        if usage is not None:
+            usage.setup_ms, usage.exec_ms = 0, int(elapsed)
+        return SandboxResult(0, "ok\n")
+
+
+def load_runner():
+    """Import the runner package under its own name; both services call their package `src`."""
+    os.environ.setdefault("RUNBOX_METRICS_PORT", "0")
+    spec = importlib.util.spec_from_file_location(
+        "runbox_runner", RUNNER_SRC / "__init__.py", submodule_search_locations=[str(RUNNER_SRC)]
+    )
+    package = importlib.util.module_from_spec(spec)
+    sys.modules["runbox_runner"] = package
+    spec.loader.exec_module(package)
+    return importlib.import_module("runbox_runner.worker")
+
+
+def configure(args: argparse.Namespace) -> None:
+    # Settings are read at import time, so the environment is set before `src` is imported.
+    os.environ["RUNBOX_RUN_EXECUTION_MODE"] = args.path
+    os.environ.setdefault("RUNBOX_STORAGE_BACKEND", "memory")
+    os.environ.setdefault("RUNBOX_RUN_LOG_STORAGE", "filesystem")
+    os.environ.setdefault("RUNBOX_RUN_LOG_DIR", tempfile.mkdtemp(prefix="runbox-bench-logs-"))
+    os.environ.setdefault("RUNBOX_METRICS_ENABLED", "false")
+    os.environ.setdefault("RUNBOX_SCHEDULER_MAX_QUEUE", str(args.requests + args.warmup))
+    # Clients are told apart by X-Real-IP, as behind the production proxy.
+    os.environ.setdefault("RUNBOX_TRUSTED_PROXIES", '["*"]')
+
+    import fakeredis
+    import fakeredis.aioredis
+
+    from src.core import redis as redis_clients
+
+    server = fakeredis.FakeServer()
+    redis_clients._redis = fakeredis.FakeRedis(server=server, decode_responses=True)
+    redis_clients._async_redis = fakeredis.aioredis.FakeRedis(server=server, decode_responses=True)
+
+
+def celery_worker(args: argparse.Namespace, stack: ExitStack) -> None:
+    """Serve `runner.execute` from threads of this process, backed by the chosen sandbox."""
+    import fakeredis
+    from celery.contrib.testing.worker import start_worker
+
+    from src.schemas.run import RunUsage
+    from src.services.executor import sandbox as local_sandbox
+    from src.services.queue import BATCH_TASK, EXECUTE_TASK, celery_client, runner_queues
+
+    celery_client.conf.update(
+        broker_url="memory://",
+        result_backend="cache+memory://",
+        broker_transport_options={"polling_interval": 0.005},
+        broker_connection_retry_on_startup=True,
+    )
+
+    if args.backend == "docker":
+        runner = load_runner()
+        runner_streaming = importlib.import_module("runbox_runner.streaming")
+        runner_streaming._redis = fakeredis.FakeRedis()
+        stack.callback(runner.sandbox.close)
+        execute, execute_batch = runner.execute_run.run, runner.execute_batch.run
+    else:
+        sandbox = local_sandbox if args.backend == "local" else fake_sandbox(args)
+
+        def execute(payload: dict) -> str:
+            # Each worker thread stands in for a runner process running one job at a time.
+            usage = RunUsage()
+            result = asyncio.run(
+                sandbox.run_async(
+                    payload["language"],
+                    payload["files"],
+                    payload.get("build_cmd"),
+                    payload.get("run_cmd"),
+                    payload.get("env"),
+                    usage=usage,
+                )
+            )
+            status = "failed" if result.failure_cause() else "completed"
+            data = {"output": result.output, "status": status, "usage": usage.model_dump()}
+            return json.dumps(data)
+
+        def execute_batch(payload: dict) -> str:
+            raise NotImplementedError("batch runs are not benchmarked")
+
+    celery_client.task(name=EXECUTE_TASK)(execute)
+    celery_client.task(name=BATCH_TASK)(execute_batch)
+    stack.enter_context(
+        start_worker(
+            celery_client,
+            pool="threads",
+            concurrency=args.workers,
+            queues=runner_queues(),
+            perform_ping_check=False,
+            loglevel="WARNING",
+        )
+    )
+
+
+def fake_sandbox(args: argparse.Namespace) -> FakeSandbox:
+    return FakeSandbox(args.fake_latency_ms, args.fake_jitter_ms, args.seed)
+
+
+async def drive(args: argparse.Namespace, report: Report) -> None:
+    import httpx
+
+    from src.main import app
+
+    rng = random.Random(args.seed)
+    languages = [language for language, weight in args.mix.items() for _ in range(weight)]
+    jobs: asyncio.Queue[tuple[int, str, int]] = asyncio.Queue()
+    for index in range(args.warmup + args.requests):
+        jobs.put_nowait((index, rng.choice(languages), rng.choice(args.payload_bytes)))
+    payloads = {
+        (language, size): build_payload(language, size)
+        for language in args.mix
+        for size in args.payload_bytes
+    }
+
+    async def client_loop(client: httpx.AsyncClient, worker: int) -> None:
+        # Distinct client addresses, so per-client admission limits apply as in production.
+        headers = {"X-Real-IP": f"10.0.0.{worker % args.clients + 1}"}
+        while not jobs.empty():
+            index, language, size = jobs.get_nowait()
+            started = time.perf_counter()
+            payload = payloads[language, size]
+            response = await client.post("/api/runs/", json=payload, headers=headers)
+            submitted = time.perf_counter()
+            if response.status_code != 202:
+                key = str(response.status_code)
+                report.errors[key] = report.errors.get(key, 0) + 1
+                continue
+            run = response.json()
+            while run["status"] in PENDING:
+                response = await client.get(f"/api/runs/{run['id']}/wait", params={"timeout": 25})
+                run = response.json()
+            if index < args.warmup:
+                continue
+            usage = run.get("usage") or {}
+            report.samples.append(
+                Sample(
+                    language=language,
+                    payload_bytes=size,
+                    status=run["status"],
+                    submit_ms=round((submitted - started) * 1000, 3),
+                    e2e_ms=round((time.perf_counter() - started) * 1000, 3),
+                    peak_memory_kb=usage.get("peak_memory_kb"),
+                )
+            )
+
+    transport = httpx.ASGITransport(app=app)
+    client = httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120)
+    async with app.router.lifespan_context(app), client:
+        started = time.perf_counter()
+        await asyncio.gather(*(client_loop(client, n) for n in range(args.concurrency)))
+        report.wall_s = time.perf_counter() - started
+
+
+def distribution(values: list[float]) -> dict[str, float]:
+    if not values:
+        return {}
+    if len(values) == 1:
+        values = values * 2
+    cuts = statistics.quantiles(values, n=100, method="inclusive")
+    return {
+        "p50": round(cuts[49], 2),
+        "p95": round(cuts[94], 2),
+        "p99": round(cuts[98], 2),
+        "mean": round(statistics.fmean(values), 2),
+        "max": round(max(values), 2),
+    }
+
+
+def summarize(report: Report, rss_before_kb: int, traced_peak: int | None) -> dict:
+    samples = report.samples
+    statuses: dict[str, int] = {}
+    for sample in samples:
+        statuses[sample.status] = statuses.get(sample.status, 0) + 1
+    groups = {}
+    for language in report.config["mix"]:
+        for size in report.config["payload_bytes"]:
+            group = [
+                s.e2e_ms for s in samples if s.language == language and s.payload_bytes == size
+            ]
+            if group:
+                groups[f"{language}/{size}"] = distribution(group)
+    sandbox_peaks = [s.peak_memory_kb for s in samples if s.peak_memory_kb is not None]
+    return {
+        "requests": len(samples),
+        "statuses": statuses,
+        "errors": report.errors,
+        "wall_s": round(report.wall_s, 3),
+        "throughput_rps": round(len(samples) / report.wall_s, 2) if report.wall_s else 0.0,
+        "submit_ms": distribution([s.submit_ms for s in samples]),
+        "e2e_ms": distribution([s.e2e_ms for s in samples]),
+        "e2e_ms_by_workload": groups,
+        "memory": {
+            "rss_before_kb": rss_before_kb,
+            # ru_maxrss is the process high-water mark (KiB on Linux).
+            "rss_peak_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+            "python_peak_kb": traced_peak // 1024 if traced_peak is not None else None,
+            "sandbox_peak_kb": distribution(sandbox_peaks),
+        },
+    }
+
+
+def compare(current: dict, baseline: dict) -> None:
+    print(f"\nvs baseline ({baseline['config'].get('label') or 'unlabelled'}):")
+    for metric in ("submit_ms", "e2e_ms"):
+        for cut in ("p50", "p95", "p99"):
+            old = baseline["results"].get(metric, {}).get(cut)
+            new = current["results"].get(metric, {}).get(cut)
+            if old and new is not None:
+                print(f"  {metric:<10} {cut}  {old:>9.2f} -> {new:>9.2f}  {(new - old) / old:+.1%}")
+    old, new = baseline["results"]["throughput_rps"], current["results"]["throughput_rps"]
+    if old:
+        print(f"  throughput      {old:>9.2f} -> {new:>9.2f}  {(new - old) / old:+.1%}")
+
+
+def print_results(results: dict) -> None:
+    print(
+        f"{results['requests']} runs in {results['wall_s']} s, "
+        f"{results['throughput_rps']} runs/s, statuses {results['statuses']}, "
+        f"errors {results['errors']}"
+    )
+    for metric in ("submit_ms", "e2e_ms"):
+        cuts = results[metric]
+        if cuts:
+            print(
+                f"{metric:<10} p50 {cuts['p50']:>9.2f}  p95 {cuts['p95']:>9.2f}  "
+                f"p99 {cuts['p99']:>9.2f}  max {cuts['max']:>9.2f}"
+            )
+    for workload, cuts in results["e2e_ms_by_workload"].items():
+        print(
+            f"  {workload:<16} p50 {cuts['p50']:>9.2f}  p95 {cuts['p95']:>9.2f}  "
+            f"p99 {cuts['p99']:>9.2f}"
+        )
+    memory = results["memory"]
+    print(
+        f"memory     rss {memory['rss_before_kb']} -> {memory['rss_peak_kb']} KiB, "
+        f"python peak {memory['python_peak_kb']} KiB"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--path", choices=("inline", "celery"), default="inline")
+    parser.add_argument("--backend", choices=("fake", "local", "docker"), default="fake")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--concurrency", type=int, default=8, help="concurrent API clients")
+    parser.add_argument("--clients", type=int, default=8, help="distinct client addresses")
+    parser.add_argument("--workers", type=int, default=4, help="celery worker threads")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix("python"))
+    parser.add_argument(
+        "--payload-bytes",
+        type=lambda value: [int(size) for size in value.split(",")],
+        default=[256],
+        help="comma-separated workspace sizes",
+    )
+    parser.add_argument("--fake-latency-ms", type=float, default=20.0)
+    parser.add_argument("--fake-jitter-ms", type=float, default=5.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--tracemalloc", action="store_true", help="track Python heap peak (slow)")
+    parser.add_argument("--label", default="", help="free-form label stored with the results")
+    parser.add_argument("--output", type=Path, help="write results as JSON")
+    parser.add_argument("--compare", type=Path, help="baseline JSON from an earlier --output")
+    args = parser.parse_args()
+    if args.backend == "docker" and args.path != "celery":
+        parser.error("the docker backend runs behind the runner; use --path celery")
+
+    configure(args)
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    rss_before_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if args.tracemalloc:
+        tracemalloc.start()
+
+    config = {key: value for key, value in vars(args).items() if key not in ("output", "compare")}
+    report = Report(
+        config=config,
+        environment={
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "started_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        },
+    )
+    with ExitStack() as stack:
+        if args.path == "celery":
+            celery_worker(args, stack)
+        elif args.backend == "fake":
+            from src.services import runs
+
+            runs.sandbox = fake_sandbox(args)
+        asyncio.run(drive(args, report))
+
+    traced_peak = tracemalloc.get_traced_memory()[1] if args.tracemalloc else None
+    document = {
+        "config": report.config,
+        "environment": report.environment,
+        "results": summarize(report, rss_before_kb, traced_peak),
+        "samples": [asdict(sample) for sample in report.samples],
+    }
+    print_results(document["results"])
+    if args.output:
+        args.output.write_text(json.dumps(document, indent=2, default=str))
+    if args.compare:
+        compare(document, json.loads(args.compare.read_text()))
+
+
+if __name__ == "__main__":
+    main()
@@ -11,6 +11,15 @@ class Settings(BaseSettings):
     backend_cors_origins: List[str] | str = Field(default_factory=lambda: ["http://localhost:3000"])
 
     database_url: str = "postgresql+psycopg2://runbox:runbox@db:5432/runbox"
+    # "database" persists through the async SQLAlchemy engine; "memory" keeps dev data in dicts.
+    storage_backend: str = "database"
+    database_auto_create: bool = True
+    # Add the in-memory store's demo project and owner/admin accounts to empty tables on startup.
+    database_seed: bool = False
+    database_pool_size: int = 10
+    database_max_overflow: int = 20
+    database_pool_recycle: int = 1800
+    database_pool_timeout: int = 30
     redis_url: str = "redis://redis:6379/0"
 
     minio_endpoint: str = "minio:9000"
@@ -18,12 +27,88 @@ class Settings(BaseSettings):
     minio_secret_key: str = "runbox-secret"
     minio_bucket: str = "artifacts"
     minio_secure: bool = False
+    # Outputs above `run_log_inline_limit` bytes (0 disables) are gzipped to the log store and
+    # replaced inline by a head/tail preview. "filesystem" stores logs under `run_log_dir`.
+    run_log_storage: str = "minio"
+    run_log_dir: str = "./var/run-logs"
+    run_log_inline_limit: int = 64 * 1024
+    run_log_preview_bytes: int = 4 * 1024
+    run_log_chunk_bytes: int = 64 * 1024
+    # Runners upload large outputs themselves; the URL must outlast the run's queueing and run.
+    run_log_upload_url_ttl: int = 2 * 3600
+    # Inline `stdin` is capped; larger inputs are uploaded to POST /runs/stdin and referenced.
+    run_stdin_inline_max_bytes: int = 1024 * 1024
+    run_stdin_max_bytes: int = 256 * 1024 * 1024
+    run_stdin_chunk_bytes: int = 64 * 1024
+    run_stdin_url_ttl: int = 3600
 
     jwt_secret_key: str = "change-me"
     jwt_algorithm: str = "HS256"
     access_token_expire_minutes: int = 30
+    # Password hashing runs off the event loop: "process" (CPU-bound, default) or "thread" pool.
+    auth_hash_executor: str = "process"
+    auth_hash_workers: int = 2
+    # Verified access tokens are cached this long (never past their expiry); 0 size disables.
+    auth_token_cache_ttl: int = 60
+    auth_token_cache_size: int = 1024
+
+    # Cache-Control max-age for published catalog responses; drafts are always revalidated.
+    project_cache_max_age: int = 30
+    # Seconds a serialized catalog response is kept in process; 0 disables the cache.
+    project_cache_ttl: int = 300
 
     runner_queue_name: str = "runbox-runs"
+    # Languages routed to a dedicated `<runner_queue_name>.<language>` queue; must match the
+    # runner's RUNBOX_LANGUAGE_QUEUES.
+    runner_language_queues: List[str] = Field(default_factory=list)
+    # Batch runs are sent with time limits scaled to their variant count, from these; they must
+    # match the runner's RUNBOX_SANDBOX_TIMEOUT, RUNBOX_SLOT_WAIT_TIMEOUT and
+    # RUNBOX_TASK_TIME_LIMIT_GRACE.
+    runner_sandbox_timeout: int = 30
+    runner_slot_wait_timeout: int = 120
+    runner_task_time_limit_grace: int = 30
+    # "inline" executes runs in-process, for deployments without a runner (the Render blueprint
+    # and compose files); "celery" publishes them to the runner queue.
+    run_execution_mode: str = "inline"
+    run_wait_timeout: int = 30
+    run_poll_interval: float = 0.25
+    run_history_max_entries: int = 10_000
+    # 0 keeps run history forever.
+    run_retention_days: int = 30
+    run_retention_interval: int = 3600
+
+    # Limits for the in-process LocalSandbox.
+    sandbox_timeout: int = 30
+    sandbox_output_limit: int = 1024 * 1024
+    sandbox_cpu_seconds: int = 30
+    sandbox_memory_mb: int = 512
+
+    # 0 derives the global slot count from host CPUs and memory.
+    scheduler_global_slots: int = 0
+    scheduler_language_slots: dict[str, int] = Field(default_factory=dict)
+    scheduler_max_queue: int = 100
+    scheduler_max_wait: int = 60
+    scheduler_max_pending_per_client: int = 10
+    scheduler_retry_after: int = 5
+    # Proxies (addresses or CIDR ranges, "*" for any) whose `X-Real-IP` names the client that
+    # admission control counts runs against; other peers are counted by their own address.
+    trusted_proxies: List[str] = Field(default_factory=list)
+
+    run_cache_enabled: bool = False
+    run_cache_ttl: int = 3600
+    run_cache_max_entries: int = 10_000
+    run_cache_max_entry_bytes: int = 256 * 1024
+    run_cache_inflight_ttl: int = 120
+    # Toolchain image digests per language, mixed into result cache keys; runs of languages
+    # without one are never cached.
+    run_image_digests: dict[str, str] = Field(default_factory=dict)
+
+    # Prometheus /metrics endpoint and per-route request latency middleware.
+    metrics_enabled: bool = True
+
+    run_stream_block_ms: int = 15_000
+    run_stream_batch_size: int = 100
+    run_stream_idle_timeout: int = 300
 
     model_config = SettingsConfigDict(env_file=".env", env_prefix="RUNBOX_")
 
@@ -0,0 +1,72 @@
+from __future__ import annotations
+
+import time
+
+from prometheus_client import Counter, Histogram
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# Request latencies are mostly sub-second; run phases are bounded by the sandbox timeout.
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+RUN_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+RUN_PHASES = ("queue", "setup", "build", "exec")
+
+http_request_duration = Histogram(
+    "runbox_http_request_duration_seconds",
+    "HTTP request latency by route template.",
+    ("method", "route", "status"),
+    buckets=REQUEST_BUCKETS,
+)
+run_duration = Histogram(
+    "runbox_run_duration_seconds",
+    "Run time from submission to result.",
+    ("language", "status"),
+    buckets=RUN_BUCKETS,
+)
+run_phase_duration = Histogram(
+    "runbox_run_phase_seconds",
+    "Time runs spent queued, in workspace setup, building and executing.",
+    ("language", "phase"),
+    buckets=RUN_BUCKETS,
+)
+sandbox_failures = Counter(
+    "runbox_sandbox_failures_total",
+    "Failed or rejected runs by cause.",
+    ("language", "cause"),
+)
+result_cache_lookups = Counter(
+    "runbox_result_cache_lookups_total",
+    "Result cache lookups by outcome (hit, miss, coalesced onto an in-flight run).",
+    ("outcome",),
+)
+
+
+class RequestMetricsMiddleware:
+    """
+    Pure ASGI middleware observing request latency. Requests are labelled by the matched route
+    template (`/api/runs/{run_id}`), never the raw path, and unmatched paths share one label.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = scope.get("route")
+            http_request_duration.labels(
+                scope["method"], route.path if route else "unmatched", str(status)
+            ).observe(time.perf_counter() - started)
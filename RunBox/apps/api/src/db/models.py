@@ -1,18 +1,21 @@
 from datetime import datetime
 from typing import List, Optional
 
-from sqlalchemy import Boolean, Column, DateTime, ForeignKey, String, Text
-from sqlalchemy.dialects.postgresql import JSONB, UUID
+from sqlalchemy import JSON, Boolean, DateTime, ForeignKey, Index, String, Text, Uuid
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import Mapped, mapped_column, relationship
-from sqlalchemy.sql import func
+from sqlalchemy.sql import ColumnElement, func, text
 
 from .base import Base
 
+# JSONB on Postgres, plain JSON elsewhere (e.g. SQLite in tests).
+JSONType = JSON().with_variant(JSONB(), "postgresql")
+
 
 class User(Base):
-    id: Mapped[str] = mapped_column(UUID(as_uuid=False), primary_key=True)
+    id: Mapped[str] = mapped_column(Uuid(as_uuid=False), primary_key=True)
     email: Mapped[str] = mapped_column(String(255), unique=True, index=True)
-    password_hash: Mapped[str] = mapped_column(String(255))
+    password_hash: Mapped[Optional[str]] = mapped_column(String(255))
     role: Mapped[str] = mapped_column(String(50), default="admin")
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
     last_login: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
@@ -21,25 +24,58 @@ class User(Base):
 
 
 class Project(Base):
-    id: Mapped[str] = mapped_column(UUID(as_uuid=False), primary_key=True)
+    id: Mapped[str] = mapped_column(Uuid(as_uuid=False), primary_key=True)
     slug: Mapped[str] = mapped_column(String(255), unique=True, index=True)
     title: Mapped[str] = mapped_column(String(255))
     description: Mapped[str] = mapped_column(Text)
     language: Mapped[str] = mapped_column(String(50))
-    tags: Mapped[list[str]] = mapped_column(JSONB, default=list)
+    tags: Mapped[list[str]] = mapped_column(JSONType, default=list)
     cover_url: Mapped[Optional[str]] = mapped_column(String(500))
     readme_md: Mapped[Optional[str]] = mapped_column(Text)
     build_cmd: Mapped[Optional[str]] = mapped_column(String(255))
     run_cmd: Mapped[Optional[str]] = mapped_column(String(255))
     status: Mapped[str] = mapped_column(String(50), default="draft")
+    cacheable: Mapped[bool] = mapped_column(Boolean, default=False)
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
-    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), onupdate=func.now()
+    )
 
     runs: Mapped[List["Run"]] = relationship("Run", back_populates="project")
 
 
+SEARCH_CONFIG = text("'english'::regconfig")
+
+
+def project_search_document() -> ColumnElement:
+    """
+    Weighted tsvector of a project (title A, tags B, description C, readme D). Queries must use
+    this exact expression for Postgres to match it against the GIN index below.
+    """
+
+    def weighted(vector: ColumnElement, weight: str) -> ColumnElement:
+        return func.setweight(vector, text(f"'{weight}'"))
+
+    def document(column: ColumnElement) -> ColumnElement:
+        return func.to_tsvector(SEARCH_CONFIG, func.coalesce(column, text("''")))
+
+    tags = func.jsonb_to_tsvector(SEARCH_CONFIG, Project.tags, text("'[\"string\"]'::jsonb"))
+    return (
+        weighted(document(Project.title), "A")
+        .op("||")(weighted(tags, "B"))
+        .op("||")(weighted(document(Project.description), "C"))
+        .op("||")(weighted(document(Project.readme_md), "D"))
+    )
+
+
+# Full-text search over projects; Postgres maintains it on every insert, update and delete.
+Index("ix_project_search", project_search_document(), postgresql_using="gin").ddl_if(
+    dialect="postgresql"
+)
+
+
 class Run(Base):
-    id: Mapped[str] = mapped_column(UUID(as_uuid=False), primary_key=True)
+    id: Mapped[str] = mapped_column(Uuid(as_uuid=False), primary_key=True)
     status: Mapped[str] = mapped_column(String(50), default="queued")
     language: Mapped[str] = mapped_column(String(50))
     logs_s3_key: Mapped[Optional[str]] = mapped_column(String(255))
@@ -47,11 +83,24 @@ class Run(Base):
     finished_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True))
     runtime_ms: Mapped[Optional[int]] = mapped_column()
 
-    user_id: Mapped[Optional[str]] = mapped_column(UUID(as_uuid=False), ForeignKey("user.id"))
-    project_id: Mapped[Optional[str]] = mapped_column(UUID(as_uuid=False), ForeignKey("project.id"))
+    user_id: Mapped[Optional[str]] = mapped_column(Uuid(as_uuid=False), ForeignKey("user.id"))
+    project_id: Mapped[Optional[str]] = mapped_column(Uuid(as_uuid=False), ForeignKey("project.id"))
+    project_slug: Mapped[Optional[str]] = mapped_column(String(255))
+
+    output: Mapped[str] = mapped_column(Text, default="")
+    error: Mapped[Optional[str]] = mapped_column(Text)
+    cache_hit: Mapped[bool] = mapped_column(Boolean, default=False)
+    queue_position: Mapped[Optional[int]] = mapped_column()
 
-    payload: Mapped[dict] = mapped_column(JSONB, default=dict)
+    payload: Mapped[dict] = mapped_column(JSONType, default=dict)
 
     user: Mapped[Optional[User]] = relationship("User", back_populates="runs")
     project: Mapped[Optional[Project]] = relationship("Project", back_populates="runs")
 
+    # Keyset pagination walks (started_at, id) newest first, optionally within one filter.
+    __table_args__ = (
+        Index("ix_run_started_at_id", "started_at", "id"),
+        Index("ix_run_project_slug_started_at_id", "project_slug", "started_at", "id"),
+        Index("ix_run_status_started_at_id", "status", "started_at", "id"),
+        Index("ix_run_language_started_at_id", "language", "started_at", "id"),
+    )
@@ -1,11 +1,51 @@
-from fastapi import FastAPI
+import asyncio
+import logging
+from contextlib import asynccontextmanager, suppress
+
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
 
 from .core.config import settings
 from .core.logging import configure_logging
+from .core.metrics import RequestMetricsMiddleware
+from .db.session import async_engine, init_models
+from .repositories.projects import SqlProjectRepository
+from .repositories.users import SqlUserRepository
 from .routes import auth, projects, runs, users
+from .services.auth import auth_service
+from .services.runs import run_service
 
 configure_logging()
+logger = logging.getLogger(__name__)
+
+
+async def prune_run_history() -> None:
+    while True:
+        try:
+            pruned = await run_service.prune()
+            if pruned:
+                logger.info("Pruned %s runs past retention", pruned)
+        except Exception:
+            logger.exception("Run history pruning failed")
+        await asyncio.sleep(settings.run_retention_interval)
+
+
+@asynccontextmanager
+async def lifespan(_: FastAPI):
+    if settings.storage_backend == "database" and settings.database_auto_create:
+        await init_models()
+    if settings.storage_backend == "database" and settings.database_seed:
+        await SqlUserRepository().seed()
+        await SqlProjectRepository().seed()
+    pruner = asyncio.create_task(prune_run_history())
+    yield
+    pruner.cancel()
+    with suppress(asyncio.CancelledError):
+        await pruner
+    auth_service.close()
+    await async_engine.dispose()
+
 
 app = FastAPI(
     title=settings.app_name,
@@ -13,6 +53,7 @@ app = FastAPI(
     openapi_url=f"{settings.api_prefix}/openapi.json",
     docs_url=f"{settings.api_prefix}/docs",
     redoc_url=f"{settings.api_prefix}/redoc",
+    lifespan=lifespan,
 )
 
 app.add_middleware(
@@ -23,6 +64,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+if settings.metrics_enabled:
+    app.add_middleware(RequestMetricsMiddleware)
+
 app.include_router(auth.router, prefix=settings.api_prefix)
 app.include_router(projects.router, prefix=settings.api_prefix)
 app.include_router(runs.router, prefix=settings.api_prefix)
@@ -32,3 +76,11 @@ app.include_router(users.router, prefix=settings.api_prefix)
 @app.get("/healthz", tags=["infra"])
 async def healthcheck() -> dict[str, str]:
     return {"status": "ok"}
+
+
+if settings.metrics_enabled:
+
+    @app.get("/metrics", tags=["infra"], include_in_schema=False)
+    def metrics() -> Response:
+        # Sync on purpose: collectors may hit Redis, so scrapes run in the threadpool.
+        return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
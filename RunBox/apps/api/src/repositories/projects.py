@@ -0,0 +1,253 @@
+from __future__ import annotations
+
+import json
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Protocol, Tuple
+from uuid import uuid4
+
+from sqlalchemy import Text, cast, delete, func, literal, or_, select, type_coerce
+from sqlalchemy.dialects.postgresql import JSONB
+
+from ..db import models
+from ..db.session import AsyncSessionLocal, async_engine
+from .search import ProjectSearchIndex, tokenize
+
+
+@dataclass
+class InMemoryProject:
+    id: str
+    slug: str
+    title: str
+    description: str
+    language: str
+    tags: List[str] = field(default_factory=list)
+    cover_url: Optional[str] = None
+    readme_md: Optional[str] = None
+    build_cmd: Optional[str] = None
+    run_cmd: Optional[str] = None
+    status: str = "draft"
+    cacheable: bool = False
+    created_at: str = "2024-03-01T00:00:00Z"
+    updated_at: str = "2024-03-01T00:00:00Z"
+
+
+@dataclass
+class ProjectSearch:
+    query: str | None = None
+    tag: str | None = None
+    language: str | None = None
+    status: str | None = None
+    limit: int = 20
+    offset: int = 0
+
+
+# (project, score) pairs for one page of results, and the total number of matches.
+SearchPage = Tuple[List[Tuple[Any, float]], int]
+
+# Search hits carry everything but the readme body.
+HIT_COLUMNS = (
+    models.Project.id,
+    models.Project.slug,
+    models.Project.title,
+    models.Project.description,
+    models.Project.language,
+    models.Project.tags,
+    models.Project.cover_url,
+    models.Project.status,
+)
+
+
+class ProjectRepository(Protocol):
+    async def list(self) -> List[Any]: ...
+
+    async def get(self, slug: str) -> Optional[Any]: ...
+
+    async def add(self, data: dict) -> Any: ...
+
+    async def update(self, slug: str, changes: dict) -> Optional[Any]: ...
+
+    async def delete(self, slug: str) -> bool: ...
+
+    async def search(self, params: ProjectSearch) -> SearchPage: ...
+
+    async def revision(self) -> str:
+        """Opaque token that changes whenever any project is added, updated or deleted."""
+        ...
+
+
+# The demo projects a fresh store starts with.
+SEED_PROJECTS = (
+    {
+        "slug": "realtime-chatbot",
+        "title": "Realtime Chatbot",
+        "description": "LangChain-powered chatbot streaming responses via WebSocket.",
+        "language": "python",
+        "tags": ["ai", "websocket", "langchain"],
+        "cover_url": "https://images.unsplash.com/photo-1523475472560-d2df97ec485c?auto=format&fit=crop&w=800&q=80",
+        "status": "published",
+    },
+)
+
+
+class InMemoryProjectRepository:
+    """Development store seeded with a demo project; used when `storage_backend="memory"`."""
+
+    def __init__(self) -> None:
+        self._projects: Dict[str, InMemoryProject] = {
+            data["slug"]: InMemoryProject(id=str(index), **data)
+            for index, data in enumerate(SEED_PROJECTS, start=1)
+        }
+        self._search = ProjectSearchIndex()
+        for project in self._projects.values():
+            self._search.add(project)
+        # Bumped on every write; the store lives in one process, so a counter is enough.
+        self._revision = 0
+
+    async def list(self) -> List[InMemoryProject]:
+        return list(self._projects.values())
+
+    async def get(self, slug: str) -> Optional[InMemoryProject]:
+        return self._projects.get(slug)
+
+    async def add(self, data: dict) -> InMemoryProject:
+        project = InMemoryProject(id=str(len(self._projects) + 1), **data)
+        self._projects[project.slug] = project
+        self._search.add(project)
+        self._revision += 1
+        return project
+
+    async def update(self, slug: str, changes: dict) -> Optional[InMemoryProject]:
+        project = self._projects.get(slug)
+        if not project:
+            return None
+        # Drop the old postings before mutating: removal reads the indexed tags and language.
+        self._search.remove(slug)
+        for key, value in changes.items():
+            setattr(project, key, value)
+        self._search.add(project)
+        self._revision += 1
+        return project
+
+    async def delete(self, slug: str) -> bool:
+        self._search.remove(slug)
+        self._revision += 1
+        return self._projects.pop(slug, None) is not None
+
+    async def search(self, params: ProjectSearch) -> SearchPage:
+        hits = self._search.search(params.query, params.tag, params.language, params.status)
+        return hits[params.offset:params.offset + params.limit], len(hits)
+
+    async def revision(self) -> str:
+        return str(self._revision)
+
+
+def _by_slug(slug: str):
+    return select(models.Project).where(models.Project.slug == slug)
+
+
+class SqlProjectRepository:
+    async def list(self) -> List[models.Project]:
+        async with AsyncSessionLocal() as session:
+            stmt = select(models.Project).order_by(models.Project.created_at)
+            return list(await session.scalars(stmt))
+
+    async def get(self, slug: str) -> Optional[models.Project]:
+        async with AsyncSessionLocal() as session:
+            return await session.scalar(_by_slug(slug))
+
+    async def add(self, data: dict) -> models.Project:
+        async with AsyncSessionLocal() as session:
+            project = models.Project(id=str(uuid4()), updated_at=datetime.now(timezone.utc), **data)
+            session.add(project)
+            await session.commit()
+            await session.refresh(project)
+            return project
+
+    async def update(self, slug: str, changes: dict) -> Optional[models.Project]:
+        async with AsyncSessionLocal() as session:
+            project = await session.scalar(_by_slug(slug))
+            if not project:
+                return None
+            for key, value in changes.items():
+                setattr(project, key, value)
+            # Set here rather than by the column's onupdate: SQLite's now() has whole seconds,
+            # and `revision` must change with every update.
+            project.updated_at = datetime.now(timezone.utc)
+            await session.commit()
+            await session.refresh(project)
+            return project
+
+    async def delete(self, slug: str) -> bool:
+        async with AsyncSessionLocal() as session:
+            stmt = delete(models.Project).where(models.Project.slug == slug)
+            result = await session.execute(stmt)
+            await session.commit()
+            return result.rowcount > 0
+
+    async def revision(self) -> str:
+        """The newest `updated_at` and the row count, which together change on every write."""
+        async with AsyncSessionLocal() as session:
+            stmt = select(func.max(models.Project.updated_at), func.count(models.Project.id))
+            newest, count = (await session.execute(stmt)).one()
+        return f"{newest.isoformat() if newest else '-'}:{count}"
+
+    async def seed(self) -> None:
+        """Add the `SEED_PROJECTS`, as the in-memory store has them, to an empty table."""
+        async with AsyncSessionLocal() as session:
+            if await session.scalar(select(func.count()).select_from(models.Project)):
+                return
+            session.add_all(models.Project(id=str(uuid4()), **data) for data in SEED_PROJECTS)
+            await session.commit()
+
+    async def search(self, params: ProjectSearch) -> SearchPage:
+        """
+        Ranked full-text search on Postgres (`ix_project_search`). Other databases fall back to
+        unranked substring matching, good enough for development against SQLite.
+        """
+        score = literal(0.0)
+        stmt = select(*HIT_COLUMNS)
+        if params.language is not None:
+            stmt = stmt.where(models.Project.language == params.language)
+        if params.status is not None:
+            stmt = stmt.where(models.Project.status == params.status)
+
+        if async_engine.dialect.name == "postgresql":
+            if params.tag is not None:
+                stmt = stmt.where(type_coerce(models.Project.tags, JSONB).contains([params.tag]))
+            if tokenize(params.query):
+                tsquery = func.websearch_to_tsquery(models.SEARCH_CONFIG, params.query)
+                document = models.project_search_document()
+                stmt = stmt.where(document.op("@@")(tsquery))
+                score = func.ts_rank(document, tsquery)
+        else:
+            if params.tag is not None:
+                stmt = stmt.where(cast(models.Project.tags, Text).contains(json.dumps(params.tag)))
+            for term in tokenize(params.query):
+                pattern = f"%{term}%"
+                stmt = stmt.where(
+                    or_(
+                        models.Project.title.ilike(pattern),
+                        models.Project.description.ilike(pattern),
+                        models.Project.readme_md.ilike(pattern),
+                        cast(models.Project.tags, Text).ilike(pattern),
+                    )
+                )
+
+        stmt = (
+            stmt.add_columns(score.label("score"), func.count().over().label("total"))
+            .order_by(score.desc(), models.Project.title, models.Project.slug)
+            .limit(params.limit)
+            .offset(params.offset)
+        )
+        async with AsyncSessionLocal() as session:
+            rows = (await session.execute(stmt)).all()
+            if rows:
+                return [(row, float(row.score)) for row in rows], rows[0].total
+            if not params.offset:
+                return [], 0
+            # Past the last page the window count has no row to ride on.
+            total = await session.scalar(
+                select(func.count()).select_from(stmt.limit(None).offset(None).subquery())
+            )
+            return [], total or 0
@@ -0,0 +1,249 @@
+from __future__ import annotations
+
+import base64
+import bisect
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, List, Optional, Protocol
+from uuid import UUID
+
+from sqlalchemy import delete, select, tuple_
+
+from ..core.config import settings
+from ..db import models
+from ..db.session import AsyncSessionLocal
+
+
+@dataclass
+class RunRecord:
+    id: str
+    status: str
+    language: str
+    started_at: datetime
+    finished_at: datetime | None = None
+    runtime_ms: int | None = None
+    files: List[dict] = field(default_factory=list)
+    build_cmd: str | None = None
+    run_cmd: str | None = None
+    env: Dict[str, str] = field(default_factory=dict)
+    stdin: str | None = None
+    stdin_ref: str | None = None
+    project_slug: str | None = None
+    output: str = ""
+    error: str | None = None
+    cache_key: str | None = None
+    cache_hit: bool = False
+    # Set when this run was coalesced onto an identical run already in flight.
+    source_run_id: str | None = None
+    client: str = "anonymous"
+    queue_position: int | None = None
+    # Set when the full output was offloaded to the log store; `output` then holds a preview.
+    logs_key: str | None = None
+    log_bytes: int | None = None
+    # Batch runs: input variants, how many run at once, and their results once finished.
+    variants: List[dict] | None = None
+    parallelism: int = 1
+    variant_results: List[dict] | None = None
+    # Phase timings, CPU, memory and I/O of the run (see schemas.run.RunUsage).
+    usage: dict | None = None
+
+
+# RunRecord fields kept in the Run.payload JSON column rather than in their own columns.
+PAYLOAD_FIELDS = (
+    "files",
+    "build_cmd",
+    "run_cmd",
+    "env",
+    "stdin",
+    "stdin_ref",
+    "cache_key",
+    "source_run_id",
+    "client",
+    "log_bytes",
+    "variants",
+    "parallelism",
+    "variant_results",
+    "usage",
+)
+
+
+# Listing order and keyset cursor: newest first, ties broken by id.
+Cursor = tuple[datetime, str]
+
+SUMMARY_COLUMNS = (
+    models.Run.id,
+    models.Run.status,
+    models.Run.language,
+    models.Run.project_slug,
+    models.Run.started_at,
+    models.Run.finished_at,
+    models.Run.runtime_ms,
+    models.Run.cache_hit,
+)
+
+
+@dataclass
+class RunFilters:
+    project_slug: str | None = None
+    status: str | None = None
+    language: str | None = None
+
+    def matches(self, run: RunRecord) -> bool:
+        return (
+            (self.project_slug is None or run.project_slug == self.project_slug)
+            and (self.status is None or run.status == self.status)
+            and (self.language is None or run.language == self.language)
+        )
+
+
+def is_uuid(value: str) -> bool:
+    """Ids are UUID columns: anything else cannot match, and Postgres rejects it outright."""
+    try:
+        UUID(value)
+    except ValueError:
+        return False
+    return True
+
+
+def encode_cursor(run: RunRecord) -> str:
+    raw = f"{run.started_at.isoformat()}|{run.id}".encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+
+def decode_cursor(cursor: str) -> Cursor:
+    """Raises ValueError for malformed cursors."""
+    started_at, run_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|", 1)
+    return datetime.fromisoformat(started_at), run_id
+
+
+class RunRepository(Protocol):
+    async def save(self, run: RunRecord) -> None: ...
+
+    async def get(self, run_id: str) -> Optional[RunRecord]: ...
+
+    async def list_page(
+        self, limit: int, after: Cursor | None, filters: RunFilters
+    ) -> List[RunRecord]: ...
+
+    async def prune(self, before: datetime) -> int: ...
+
+
+class InMemoryRunRepository:
+    """
+    Bounded run history. A sorted index of (started_at, id) keys gives ordered, keyset-paginated
+    listing without sorting the whole store; the oldest runs are evicted once the store holds
+    `run_history_max_entries` runs.
+    """
+
+    def __init__(self) -> None:
+        self._runs: Dict[str, RunRecord] = {}
+        self._index: List[Cursor] = []
+
+    async def save(self, run: RunRecord) -> None:
+        if run.id not in self._runs:
+            bisect.insort(self._index, (run.started_at, run.id))
+        self._runs[run.id] = run
+        overflow = len(self._index) - settings.run_history_max_entries
+        if overflow > 0:
+            for _, run_id in self._index[:overflow]:
+                del self._runs[run_id]
+            del self._index[:overflow]
+
+    async def get(self, run_id: str) -> Optional[RunRecord]:
+        return self._runs.get(run_id)
+
+    async def list_page(
+        self, limit: int, after: Cursor | None, filters: RunFilters
+    ) -> List[RunRecord]:
+        end = bisect.bisect_left(self._index, after) if after else len(self._index)
+        page: List[RunRecord] = []
+        for position in range(end - 1, -1, -1):
+            run = self._runs[self._index[position][1]]
+            if filters.matches(run):
+                page.append(run)
+                if len(page) == limit:
+                    break
+        return page
+
+    async def prune(self, before: datetime) -> int:
+        cut = bisect.bisect_left(self._index, (before, ""))
+        for _, run_id in self._index[:cut]:
+            del self._runs[run_id]
+        del self._index[:cut]
+        return cut
+
+
+def _to_record(row: models.Run) -> RunRecord:
+    payload = row.payload or {}
+    return RunRecord(
+        id=row.id,
+        status=row.status,
+        language=row.language,
+        started_at=row.started_at,
+        finished_at=row.finished_at,
+        runtime_ms=row.runtime_ms,
+        project_slug=row.project_slug,
+        output=row.output or "",
+        error=row.error,
+        cache_hit=row.cache_hit,
+        queue_position=row.queue_position,
+        logs_key=row.logs_s3_key,
+        **{name: payload[name] for name in PAYLOAD_FIELDS if name in payload},
+    )
+
+
+class SqlRunRepository:
+    async def save(self, run: RunRecord) -> None:
+        async with AsyncSessionLocal() as session:
+            await session.merge(
+                models.Run(
+                    id=run.id,
+                    status=run.status,
+                    language=run.language,
+                    started_at=run.started_at,
+                    finished_at=run.finished_at,
+                    runtime_ms=run.runtime_ms,
+                    project_slug=run.project_slug,
+                    output=run.output,
+                    error=run.error,
+                    cache_hit=run.cache_hit,
+                    queue_position=run.queue_position,
+                    logs_s3_key=run.logs_key,
+                    payload={name: getattr(run, name) for name in PAYLOAD_FIELDS},
+                )
+            )
+            await session.commit()
+
+    async def get(self, run_id: str) -> Optional[RunRecord]:
+        if not is_uuid(run_id):
+            return None
+        async with AsyncSessionLocal() as session:
+            row = await session.get(models.Run, run_id)
+            return _to_record(row) if row else None
+
+    async def list_page(
+        self, limit: int, after: Cursor | None, filters: RunFilters
+    ) -> List[RunRecord]:
+        # Only summary columns: output and payload blobs are never loaded for listings.
+        stmt = select(*SUMMARY_COLUMNS)
+        if filters.project_slug is not None:
+            stmt = stmt.where(models.Run.project_slug == filters.project_slug)
+        if filters.status is not None:
+            stmt = stmt.where(models.Run.status == filters.status)
+        if filters.language is not None:
+            stmt = stmt.where(models.Run.language == filters.language)
+        if after:
+            stmt = stmt.where(tuple_(models.Run.started_at, models.Run.id) < tuple_(*after))
+        stmt = stmt.order_by(models.Run.started_at.desc(), models.Run.id.desc()).limit(limit)
+
+        async with AsyncSessionLocal() as session:
+            rows = await session.execute(stmt)
+            return [RunRecord(**row._asdict()) for row in rows]
+
+    async def prune(self, before: datetime) -> int:
+        async with AsyncSessionLocal() as session:
+            result = await session.execute(
+                delete(models.Run).where(models.Run.started_at < before)
+            )
+            await session.commit()
+            return result.rowcount
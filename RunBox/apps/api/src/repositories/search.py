@@ -0,0 +1,125 @@
+from __future__ import annotations
+
+import math
+import re
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset(
+    "a an and are as at be by for from in is it of on or that the this to with".split()
+)
+
+# Relative weight of a term occurrence per field; mirrors the setweight() classes on Postgres.
+FIELD_WEIGHTS = {"title": 4.0, "tags": 3.0, "description": 2.0, "readme_md": 1.0}
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    if not text:
+        return []
+    return [token for token in TOKEN_RE.findall(text.lower()) if token not in STOPWORDS]
+
+
+def _field_text(project: Any, name: str) -> Optional[str]:
+    value = getattr(project, name)
+    return " ".join(value) if name == "tags" else value
+
+
+class ProjectSearchIndex:
+    """
+    Inverted index over project text for the in-memory store. Postings map each term to the
+    field-weighted term frequency per project slug, alongside exact-match tag and language
+    indexes. `add`/`remove` touch only the postings of the project's own terms, so writes cost
+    O(size of the project) regardless of catalog size.
+    """
+
+    def __init__(self) -> None:
+        self._postings: Dict[str, Dict[str, float]] = {}
+        self._terms: Dict[str, Set[str]] = {}
+        self._tags: Dict[str, Set[str]] = {}
+        self._languages: Dict[str, Set[str]] = {}
+        self._projects: Dict[str, Any] = {}
+
+    def __len__(self) -> int:
+        return len(self._projects)
+
+    def add(self, project: Any) -> None:
+        self.remove(project.slug)
+        slug = project.slug
+        weights: Counter[str] = Counter()
+        for name, weight in FIELD_WEIGHTS.items():
+            for term in tokenize(_field_text(project, name)):
+                weights[term] += weight
+        for term, weight in weights.items():
+            self._postings.setdefault(term, {})[slug] = weight
+        self._terms[slug] = set(weights)
+        for tag in project.tags or []:
+            self._tags.setdefault(tag, set()).add(slug)
+        self._languages.setdefault(project.language, set()).add(slug)
+        self._projects[slug] = project
+
+    def remove(self, slug: str) -> None:
+        project = self._projects.pop(slug, None)
+        if project is None:
+            return
+        for term in self._terms.pop(slug):
+            _discard(self._postings, term, slug)
+        for tag in project.tags or []:
+            _discard(self._tags, tag, slug)
+        _discard(self._languages, project.language, slug)
+
+    def search(
+        self,
+        query: Optional[str],
+        tag: Optional[str] = None,
+        language: Optional[str] = None,
+        status: Optional[str] = None,
+    ) -> List[Tuple[Any, float]]:
+        """
+        Projects matching every query term (and the filters), best first. Scores sum the
+        weighted term frequency times the term's inverse document frequency.
+        """
+        candidates: Optional[Set[str]] = None
+        if tag:
+            candidates = set(self._tags.get(tag, ()))
+        if language:
+            candidates = _narrow(candidates, self._languages.get(language, ()))
+
+        scores: Dict[str, float] = {}
+        terms = set(tokenize(query))
+        if terms:
+            # Walk the rarest term first so the intersection shrinks as early as possible.
+            for term in sorted(terms, key=lambda term: len(self._postings.get(term, ()))):
+                postings = self._postings.get(term, {})
+                candidates = _narrow(candidates, postings)
+                if not candidates:
+                    return []
+                idf = math.log(1 + len(self._projects) / len(postings))
+                for slug in candidates:
+                    scores[slug] = scores.get(slug, 0.0) + postings[slug] * idf
+        elif candidates is None:
+            candidates = set(self._projects)
+
+        hits = [
+            (self._projects[slug], round(scores.get(slug, 0.0), 4))
+            for slug in candidates
+            if status is None or self._projects[slug].status == status
+        ]
+        hits.sort(key=lambda hit: (-hit[1], hit[0].title.lower(), hit[0].slug))
+        return hits
+
+
+def _discard(index: Dict[str, Any], key: str, slug: str) -> None:
+    entries = index.get(key)
+    if entries is None:
+        return
+    if isinstance(entries, dict):
+        entries.pop(slug, None)
+    else:
+        entries.discard(slug)
+    if not entries:
+        del index[key]
+
+
+def _narrow(candidates: Optional[Set[str]], slugs: Iterable[str]) -> Set[str]:
+    return set(slugs) if candidates is None else candidates.intersection(slugs)
@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Protocol
+from uuid import uuid4
+
+from sqlalchemy import delete, func, select
+
+from ..db import models
+from ..db.session import AsyncSessionLocal
+from .runs import is_uuid
+
+# (email, role) of the accounts a fresh store starts with.
+SEED_USERS = (("owner@runbox.dev", "owner"), ("admin@runbox.dev", "admin"))
+
+
+@dataclass
+class InMemoryUser:
+    id: str
+    email: str
+    role: str
+    created_at: datetime
+    last_login: Optional[datetime] = None
+
+
+class UserRepository(Protocol):
+    async def list(self) -> List[Any]: ...
+
+    async def add(self, email: str, role: str) -> Any: ...
+
+    async def delete(self, user_id: str) -> bool: ...
+
+
+class InMemoryUserRepository:
+    """Development store seeded with the owner/admin accounts."""
+
+    def __init__(self) -> None:
+        now = datetime.now(timezone.utc)
+        self._users: Dict[str, InMemoryUser] = {
+            role: InMemoryUser(
+                id=str(uuid4()), email=email, role=role, created_at=now, last_login=now
+            )
+            for email, role in SEED_USERS
+        }
+
+    async def list(self) -> List[InMemoryUser]:
+        return list(self._users.values())
+
+    async def add(self, email: str, role: str) -> InMemoryUser:
+        user = InMemoryUser(
+            id=str(uuid4()),
+            email=email,
+            role=role,
+            created_at=datetime.now(timezone.utc),
+            last_login=None,
+        )
+        self._users[user.id] = user
+        return user
+
+    async def delete(self, user_id: str) -> bool:
+        return self._users.pop(user_id, None) is not None
+
+
+class SqlUserRepository:
+    async def list(self) -> List[models.User]:
+        async with AsyncSessionLocal() as session:
+            stmt = select(models.User).order_by(models.User.created_at)
+            return list(await session.scalars(stmt))
+
+    async def add(self, email: str, role: str) -> models.User:
+        async with AsyncSessionLocal() as session:
+            user = models.User(id=str(uuid4()), email=email, role=role)
+            session.add(user)
+            await session.commit()
+            await session.refresh(user)
+            return user
+
+    async def delete(self, user_id: str) -> bool:
+        if not is_uuid(user_id):
+            return False
+        async with AsyncSessionLocal() as session:
+            result = await session.execute(delete(models.User).where(models.User.id == user_id))
+            await session.commit()
+            return result.rowcount > 0
+
+    async def seed(self) -> None:
+        """Add the `SEED_USERS` accounts, as the in-memory store has them, to an empty table."""
+        async with AsyncSessionLocal() as session:
+            if await session.scalar(select(func.count()).select_from(models.User)):
+                return
+            session.add_all(
+                models.User(id=str(uuid4()), email=email, role=role) for email, role in SEED_USERS
+            )
+            await session.commit()
@@ -1,16 +1,24 @@
-from fastapi import APIRouter, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status
 
-from ..schemas.auth import LoginRequest, Token
+from ..schemas.auth import LoginRequest, Token, TokenPayload, User
 from ..services.auth import auth_service
+from .deps import current_claims
 
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
 
 @router.post("/login", response_model=Token)
-def login(payload: LoginRequest) -> Token:
-    token = auth_service.authenticate(payload)
+async def login(payload: LoginRequest) -> Token:
+    token = await auth_service.authenticate(payload)
     if not token:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
     return token
 
+
+@router.get("/me", response_model=User)
+async def me(claims: TokenPayload = Depends(current_claims)) -> User:
+    user = auth_service.get_user(claims.sub)
+    if not user:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Unknown user")
+    return user
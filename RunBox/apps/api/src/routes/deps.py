@@ -0,0 +1,25 @@
+from __future__ import annotations
+
+from typing import Optional
+
+from fastapi import Depends, HTTPException, status
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+
+from ..schemas.auth import TokenPayload
+from ..services.auth import auth_service
+
+bearer_scheme = HTTPBearer(auto_error=False)
+
+
+async def current_claims(
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(bearer_scheme),
+) -> TokenPayload:
+    """Verified access token claims; 401 for missing, invalid or expired tokens."""
+    claims = auth_service.verify_token(credentials.credentials) if credentials else None
+    if claims is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid or missing access token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return claims
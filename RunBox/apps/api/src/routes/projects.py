@@ -1,41 +1,79 @@
-from fastapi import APIRouter, HTTPException, status
+from typing import Optional
 
-from ..schemas.project import Project, ProjectCreate, ProjectUpdate
-from ..services.projects import project_service
+from fastapi import APIRouter, HTTPException, Query, Request, Response, status
+
+from ..core.config import settings
+from ..repositories.projects import ProjectSearch
+from ..schemas.project import Project, ProjectCreate, ProjectSearchPage, ProjectUpdate
+from ..services.projects import CatalogEntry, project_service
 
 
 router = APIRouter(prefix="/projects", tags=["projects"])
 
 
+def _etag_matches(header: Optional[str], etag: str) -> bool:
+    # If-None-Match uses the weak comparison: W/"x" matches "x".
+    if not header:
+        return False
+    candidates = {candidate.strip().removeprefix("W/") for candidate in header.split(",")}
+    return "*" in candidates or etag in candidates
+
+
+def catalog_response(request: Request, entry: CatalogEntry) -> Response:
+    """Serve a cached catalog body; `304` without a body when the client's copy is current."""
+    cache_control = (
+        f"public, max-age={settings.project_cache_max_age}" if entry.public else "private, no-cache"
+    )
+    headers = {"ETag": entry.etag, "Cache-Control": cache_control}
+    if _etag_matches(request.headers.get("if-none-match"), entry.etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(entry.body, media_type="application/json", headers=headers)
+
+
 @router.get("/", response_model=list[Project])
-def list_projects() -> list[Project]:
-    return project_service.list()
+async def list_projects(
+    request: Request, status_filter: Optional[str] = Query(default=None, alias="status")
+) -> Response:
+    return catalog_response(request, await project_service.list_response(status_filter))
+
+
+@router.get("/search", response_model=ProjectSearchPage)
+async def search_projects(
+    q: Optional[str] = Query(default=None, max_length=200),
+    tag: Optional[str] = None,
+    language: Optional[str] = None,
+    status_filter: Optional[str] = Query(default=None, alias="status"),
+    limit: int = Query(default=20, ge=1, le=100),
+    offset: int = Query(default=0, ge=0),
+) -> ProjectSearchPage:
+    params = ProjectSearch(q, tag, language, status_filter, limit, offset)
+    return await project_service.search(params)
 
 
 @router.get("/{slug}", response_model=Project)
-def get_project(slug: str) -> Project:
-    project = project_service.get_by_slug(slug)
-    if not project:
+async def get_project(slug: str, request: Request) -> Response:
+    entry = await project_service.get_response(slug)
+    if not entry:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Project not found")
-    return project
+    return catalog_response(request, entry)
 
 
 @router.post("/", response_model=Project, status_code=status.HTTP_201_CREATED)
-def create_project(payload: ProjectCreate) -> Project:
-    return project_service.create(payload)
+async def create_project(payload: ProjectCreate) -> Project:
+    return await project_service.create(payload)
 
 
 @router.put("/{slug}", response_model=Project)
-def update_project(slug: str, payload: ProjectUpdate) -> Project:
-    project = project_service.update(slug, payload)
+async def update_project(slug: str, payload: ProjectUpdate) -> Project:
+    project = await project_service.update(slug, payload)
     if not project:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Project not found")
     return project
 
 
 @router.delete("/{slug}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_project(slug: str) -> None:
-    deleted = project_service.delete(slug)
+async def delete_project(slug: str) -> None:
+    deleted = await project_service.delete(slug)
     if not deleted:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Project not found")
 
@@ -1,17 +1,216 @@
-from fastapi import APIRouter, status
+import asyncio
+import ipaddress
+import tempfile
+from typing import AsyncIterator
 
-from ..schemas.run import RunResult, RunCreate
+from fastapi import (
+    APIRouter,
+    Header,
+    HTTPException,
+    Query,
+    Request,
+    WebSocket,
+    WebSocketDisconnect,
+    status,
+)
+from pydantic import ValidationError
+from fastapi.responses import StreamingResponse
+
+from ..repositories.runs import RunFilters
+from ..core.config import settings
+from ..schemas.run import RunBatchCreate, RunCreate, RunPage, RunResult, StdinUpload
+from ..services.logs import RangeNotSatisfiable
 from ..services.runs import run_service
+from ..services.scheduler import SchedulerFull, run_scheduler
+from ..services.stdin import stdin_store
+from ..services.streams import run_stream_reader
 
 
 router = APIRouter(prefix="/runs", tags=["runs"])
 
 
-@router.get("/", response_model=list[RunResult])
-def list_runs() -> list[RunResult]:
-    return run_service.list_recent()
+@router.get("/", response_model=RunPage)
+async def list_runs(
+    limit: int = Query(default=50, ge=1, le=200),
+    cursor: str | None = None,
+    project_slug: str | None = None,
+    status_filter: str | None = Query(default=None, alias="status"),
+    language: str | None = None,
+) -> RunPage:
+    filters = RunFilters(project_slug=project_slug, status=status_filter, language=language)
+    try:
+        return await run_service.list_page(limit, cursor, filters)
+    except ValueError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor"
+        ) from exc
+
+
+def _trusted_proxy(host: str) -> bool:
+    if "*" in settings.trusted_proxies:
+        return True
+    try:
+        address = ipaddress.ip_address(host)
+    except ValueError:
+        return False
+    return any(
+        address in ipaddress.ip_network(proxy, strict=False) for proxy in settings.trusted_proxies
+    )
+
+
+def client_key(request: Request | WebSocket) -> str:
+    """The peer address, or the `X-Real-IP` it forwards when it is a trusted proxy."""
+    peer = request.client.host if request.client else None
+    forwarded = request.headers.get("x-real-ip")
+    if forwarded and peer and _trusted_proxy(peer):
+        return forwarded
+    return peer or "anonymous"
+
+
+@router.post("/", response_model=RunResult, status_code=status.HTTP_202_ACCEPTED)
+async def create_run(payload: RunCreate, request: Request) -> RunResult:
+    try:
+        return await run_service.create(payload, client=client_key(request))
+    except ValueError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(exc)
+        ) from exc
+    except SchedulerFull as exc:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail={"message": str(exc), "queue_depth": exc.queue_depth},
+            headers={"Retry-After": str(exc.retry_after)},
+        ) from exc
+
+
+@router.post("/stdin", response_model=StdinUpload, status_code=status.HTTP_201_CREATED)
+async def upload_stdin(request: Request) -> StdinUpload:
+    """Store a large stdin blob from the raw request body; pass the ref as `stdin_ref`."""
+    with tempfile.SpooledTemporaryFile(max_size=settings.run_stdin_chunk_bytes * 16) as spool:
+        size = 0
+        async for chunk in request.stream():
+            size += len(chunk)
+            if size > settings.run_stdin_max_bytes:
+                raise HTTPException(
+                    status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                    detail="stdin is too large",
+                )
+            spool.write(chunk)
+        spool.seek(0)
+        ref = await asyncio.to_thread(stdin_store.put, spool, size)
+    return StdinUpload(stdin_ref=ref, size=size)
+
+
+@router.websocket("/interactive")
+async def interactive_run(websocket: WebSocket) -> None:
+    """
+    Interactive session for the playground terminal. The first message is a RunCreate payload;
+    then `{"type": "stdin", "data": ...}` frames feed the process and `{"type": "eof"}` closes
+    its input. The server sends `stdout`/`stderr` frames and a final `exit` frame with the run.
+    """
+    await websocket.accept()
+    try:
+        payload = RunCreate.model_validate(await websocket.receive_json())
+    except (ValidationError, ValueError) as exc:
+        await websocket.send_json({"type": "error", "detail": str(exc)})
+        await websocket.close(code=1003)
+        return
+
+    async def stdin() -> AsyncIterator[bytes]:
+        try:
+            while True:
+                message = await websocket.receive_json()
+                if message.get("type") == "eof":
+                    return
+                if message.get("type") == "stdin":
+                    yield str(message.get("data", "")).encode()
+        except WebSocketDisconnect:
+            return
+
+    async def send(stream: str, data: str) -> None:
+        try:
+            await websocket.send_json({"type": stream, "data": data})
+        except (WebSocketDisconnect, RuntimeError):
+            pass
+
+    try:
+        run = await run_service.interactive(payload, client_key(websocket), stdin(), send)
+    except SchedulerFull as exc:
+        await websocket.send_json({"type": "error", "detail": str(exc)})
+        await websocket.close(code=1013)
+        return
+    try:
+        await websocket.send_json({"type": "exit", "run": run.model_dump(mode="json")})
+        await websocket.close()
+    except (WebSocketDisconnect, RuntimeError):
+        pass
+
+
+@router.post("/batch", response_model=RunResult, status_code=status.HTTP_202_ACCEPTED)
+async def create_batch(payload: RunBatchCreate, request: Request) -> RunResult:
+    try:
+        return await run_service.create_batch(payload, client=client_key(request))
+    except SchedulerFull as exc:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail={"message": str(exc), "queue_depth": exc.queue_depth},
+            headers={"Retry-After": str(exc.retry_after)},
+        ) from exc
+
+
+@router.get("/scheduler")
+async def scheduler_stats() -> dict:
+    return await asyncio.to_thread(run_scheduler.stats)
+
+
+@router.get("/{run_id}", response_model=RunResult)
+async def get_run(run_id: str) -> RunResult:
+    run = await run_service.get(run_id)
+    if not run:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Run not found")
+    return run
+
+
+@router.get("/{run_id}/wait", response_model=RunResult)
+async def wait_for_run(run_id: str, timeout: float = Query(default=25, ge=0, le=60)) -> RunResult:
+    run = await run_service.wait(run_id, timeout)
+    if not run:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Run not found")
+    return run
+
+
+@router.get("/{run_id}/logs")
+async def run_logs(
+    run_id: str, range_header: str | None = Header(default=None, alias="Range")
+) -> StreamingResponse:
+    try:
+        logs = await run_service.logs(run_id, range_header)
+    except RangeNotSatisfiable as exc:
+        raise HTTPException(
+            status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+            detail=str(exc),
+            headers={"Content-Range": f"bytes */{exc.size}"},
+        ) from exc
+    if not logs:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Run not found")
+
+    headers = {"Accept-Ranges": "bytes", "Content-Length": str(logs.end - logs.start + 1)}
+    if logs.partial:
+        headers["Content-Range"] = f"bytes {logs.start}-{logs.end}/{logs.size}"
+    return StreamingResponse(
+        logs.body,
+        status_code=status.HTTP_206_PARTIAL_CONTENT if logs.partial else status.HTTP_200_OK,
+        media_type="text/plain",
+        headers=headers,
+    )
 
 
-@router.post("/", response_model=RunResult, status_code=status.HTTP_200_OK)
-def create_run(payload: RunCreate) -> RunResult:
-    return run_service.create(payload)
+@router.get("/{run_id}/stream")
+async def stream_run(
+    run_id: str, last_event_id: str | None = Header(default=None)
+) -> StreamingResponse:
+    return StreamingResponse(
+        run_stream_reader.events(run_id, last_event_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
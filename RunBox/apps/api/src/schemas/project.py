@@ -15,6 +15,7 @@ class ProjectBase(BaseModel):
     build_cmd: Optional[str] = None
     run_cmd: Optional[str] = None
     status: str = "draft"
+    cacheable: bool = False
 
 
 class ProjectCreate(ProjectBase):
@@ -31,6 +32,7 @@ class ProjectUpdate(BaseModel):
     build_cmd: Optional[str] = None
     run_cmd: Optional[str] = None
     status: Optional[str] = None
+    cacheable: Optional[bool] = None
 
 
 class Project(ProjectBase):
@@ -41,3 +43,25 @@ class Project(ProjectBase):
     class Config:
         from_attributes = True
 
+
+
+class ProjectSearchHit(BaseModel):
+    id: str
+    slug: str
+    title: str
+    description: str
+    language: str
+    tags: List[str] = []
+    cover_url: Optional[str] = None
+    status: str
+    score: float = 0.0
+
+    class Config:
+        from_attributes = True
+
+
+class ProjectSearchPage(BaseModel):
+    items: List[ProjectSearchHit]
+    total: int
+    limit: int
+    offset: int
@@ -1,30 +1,89 @@
 from datetime import datetime
 from typing import List, Optional
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, field_validator
+
+from runbox_sandbox import MAX_BATCH_VARIANTS, check_file_name
 
 
 class RunFile(BaseModel):
+    # Relative to the workspace: no absolute paths, `..` parts or NUL bytes.
     name: str
     content: str
 
+    @field_validator("name")
+    @classmethod
+    def relative_name(cls, value: str) -> str:
+        return check_file_name(value)
+
 
 class RunCreate(BaseModel):
+    language: str
+    files: List[RunFile]
+    build_cmd: Optional[str] = None
+    run_cmd: Optional[str] = None
+    env: dict[str, str] = Field(default_factory=dict)
+    # Inline text, or a reference returned by POST /runs/stdin for large inputs.
+    stdin: Optional[str] = None
+    stdin_ref: Optional[str] = None
+    project_slug: Optional[str] = None
+    stream: bool = False
+
+
+class StdinUpload(BaseModel):
+    stdin_ref: str
+    size: int
+
+
+class RunVariant(BaseModel):
+    stdin: Optional[str] = None
+    args: List[str] = Field(default_factory=list)
+
+
+class RunBatchCreate(BaseModel):
     language: str
     files: List[RunFile]
     build_cmd: Optional[str] = None
     run_cmd: Optional[str] = None
     env: dict[str, str] = Field(default_factory=dict)
     project_slug: Optional[str] = None
+    variants: List[RunVariant] = Field(min_length=1, max_length=MAX_BATCH_VARIANTS)
+    parallelism: int = Field(default=1, ge=1, le=8)
+
+
+class VariantResult(BaseModel):
+    index: int
+    exit_code: Optional[int]
+    stdout: str
+    stderr: str
+    timed_out: bool = False
+    truncated: bool = False
+    duration_ms: int
+
+
+class RunUsage(BaseModel):
+    """Per-run accounting: phase wall-clock times, CPU time, peak memory and I/O."""
+
+    queue_ms: Optional[int] = None
+    setup_ms: Optional[int] = None
+    build_ms: Optional[int] = None
+    exec_ms: Optional[int] = None
+    cpu_user_ms: Optional[int] = None
+    cpu_system_ms: Optional[int] = None
+    peak_memory_kb: Optional[int] = None
+    io_write_bytes: Optional[int] = None
+    output_bytes: Optional[int] = None
 
 
 class Run(BaseModel):
     id: str
     status: str
     language: str
+    project_slug: Optional[str] = None
     started_at: datetime
     finished_at: Optional[datetime]
     runtime_ms: Optional[int]
+    cache_hit: bool = False
 
     class Config:
         from_attributes = True
@@ -33,6 +92,18 @@ class Run(BaseModel):
 class RunResult(Run):
     output: str
     error: Optional[str] = None
+    queue_position: Optional[int] = None
+    # Total size of the full output when it was offloaded; `output` then holds a preview.
+    log_bytes: Optional[int] = None
+    # Per-variant results of batch runs, in submission order.
+    variant_results: Optional[List[VariantResult]] = None
+    # Absent for cache hits and runs that never reached a sandbox.
+    usage: Optional[RunUsage] = None
 
     class Config:
         from_attributes = True
+
+
+class RunPage(BaseModel):
+    items: List[Run]
+    next_cursor: Optional[str] = None
@@ -1,36 +1,82 @@
+from __future__ import annotations
+
+import asyncio
+import multiprocessing
+import time
+from collections import OrderedDict
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
-from typing import Optional
+from typing import Callable, Dict, Optional, Tuple
 from uuid import uuid4
 
-from jose import jwt
+from jose import JWTError, jwt
 from passlib.context import CryptContext
+from pydantic import ValidationError
 
 from ..core.config import settings
-from ..schemas.auth import LoginRequest, Token, User
+from ..schemas.auth import LoginRequest, Token, TokenPayload, User
 
 pwd_context = CryptContext(schemes=["sha256_crypt"], deprecated="auto")
 
 
+def _hash(password: str) -> str:
+    return pwd_context.hash(password)
+
+
+def _verify(password: str, hashed: str) -> bool:
+    return pwd_context.verify(password, hashed)
+
+
 class AuthService:
     """
     Minimal in-memory auth service.
     Replace with proper persistence and NextAuth adapter integration later.
+
+    Password hashing runs in a small worker pool so login bursts don't stall the event loop,
+    and decoded access tokens are cached briefly so protected routes skip signature checks.
     """
 
     def __init__(self) -> None:
-        hashed_password = pwd_context.hash("runbox")
         self._users = {
             "owner@runbox.dev": User(id=str(uuid4()), email="owner@runbox.dev", role="owner", last_login=None)
         }
-        self._passwords = {"owner@runbox.dev": hashed_password}
+        # Seed credentials are hashed on first use rather than at import.
+        self._seed_passwords = {"owner@runbox.dev": "runbox"}
+        self._passwords: Dict[str, str] = {}
+        self._executor: Optional[Executor] = None
+        self._tokens: OrderedDict[str, Tuple[TokenPayload, float]] = OrderedDict()
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if settings.auth_hash_executor == "process":
+                # spawn, not fork: the API process runs threads (event loop, executors).
+                self._executor = ProcessPoolExecutor(
+                    max_workers=settings.auth_hash_workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            else:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=settings.auth_hash_workers, thread_name_prefix="auth-hash"
+                )
+        return self._executor
 
-    def authenticate(self, payload: LoginRequest) -> Optional[Token]:
+    async def _offload(self, fn: Callable[..., object], *args: str):
+        return await asyncio.get_running_loop().run_in_executor(self._get_executor(), fn, *args)
+
+    async def _password_hash(self, email: str) -> Optional[str]:
+        hashed = self._passwords.get(email)
+        if hashed is None and email in self._seed_passwords:
+            hashed = await self._offload(_hash, self._seed_passwords[email])
+            hashed = self._passwords.setdefault(email, hashed)
+        return hashed
+
+    async def authenticate(self, payload: LoginRequest) -> Optional[Token]:
         user = self._users.get(payload.email)
         if not user:
             return None
 
-        hashed = self._passwords[payload.email]
-        if not pwd_context.verify(payload.password, hashed):
+        hashed = await self._password_hash(payload.email)
+        if not hashed or not await self._offload(_verify, payload.password, hashed):
             return None
 
         expires_delta = timedelta(minutes=settings.access_token_expire_minutes)
@@ -38,8 +84,43 @@ class AuthService:
         token = jwt.encode(
             {"sub": user.id, "exp": int(expire.timestamp())}, settings.jwt_secret_key, algorithm=settings.jwt_algorithm
         )
-        self._users[payload.email] = User(**user.model_dump(), last_login=datetime.now(timezone.utc))
+        last_login = datetime.now(timezone.utc)
+        self._users[payload.email] = user.model_copy(update={"last_login": last_login})
         return Token(access_token=token, expires_at=expire)
 
+    def verify_token(self, token: str) -> Optional[TokenPayload]:
+        """
+        Decode and verify an access token. Verified tokens are cached for up to
+        `auth_token_cache_ttl` seconds (never past their own expiry), LRU-bounded.
+        """
+        now = time.time()
+        cached = self._tokens.get(token)
+        if cached:
+            claims, valid_until = cached
+            if now < valid_until:
+                self._tokens.move_to_end(token)
+                return claims
+            del self._tokens[token]
+
+        try:
+            claims = TokenPayload(
+                **jwt.decode(token, settings.jwt_secret_key, algorithms=[settings.jwt_algorithm])
+            )
+        except (JWTError, ValidationError):
+            return None
+        if settings.auth_token_cache_size:
+            self._tokens[token] = (claims, min(claims.exp, now + settings.auth_token_cache_ttl))
+            if len(self._tokens) > settings.auth_token_cache_size:
+                self._tokens.popitem(last=False)
+        return claims
+
+    def get_user(self, user_id: str) -> Optional[User]:
+        return next((user for user in self._users.values() if user.id == user_id), None)
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
 
 auth_service = AuthService()
@@ -1,11 +1,25 @@
 from __future__ import annotations
 
+import asyncio
 import os
+import resource
+import shlex
+import signal
 import subprocess
-from dataclasses import dataclass
+import time
+from contextlib import suppress
+from dataclasses import dataclass, field
 from pathlib import Path
 from tempfile import TemporaryDirectory
-from typing import List
+from typing import IO, AsyncIterable, Awaitable, Callable, Iterable, List, Union
+
+from runbox_sandbox import STDIN_DIR, Capabilities, SandboxResult, configure, workspace_path
+
+from ..core.config import settings
+from ..schemas.run import RunUsage
+
+StdinSource = Union[Iterable[bytes], AsyncIterable[bytes]]
+OutputCallback = Callable[[str, bytes], Awaitable[None]]
 
 DEFAULT_COMMANDS = {
     "python": "python3 Main.py",
@@ -14,68 +28,361 @@ DEFAULT_COMMANDS = {
     "rust": "/usr/local/rustup/toolchains/1.77.2-x86_64-unknown-linux-gnu/bin/rustc Main.rs && ./Main",
 }
 
+
+def language_label(language: str) -> str:
+    """`language` is client input; metrics label unknown ones "other" to bound cardinality."""
+    return language if language in DEFAULT_COMMANDS else "other"
+
+
 ENV_OVERRIDES = {
     "node": {"NODE_ENV": "production"},
 }
 
+READ_CHUNK = 64 * 1024
+DRAIN_GRACE = 1.0
+
+configure(settings.sandbox_timeout, f"{settings.sandbox_memory_mb}m", settings.sandbox_output_limit)
+
+
+def _limit_argv() -> list[str]:
+    """
+    Command prefix that applies the sandbox rlimits through prlimit(1): a `preexec_fn` would
+    run Python between fork and exec in this threaded process, which can deadlock.
+    """
+    limits = []
+    if settings.sandbox_cpu_seconds:
+        limit = settings.sandbox_cpu_seconds
+        limits.append(f"--cpu={limit}:{limit + 1}")
+    if settings.sandbox_memory_mb:
+        # RLIMIT_DATA rather than RLIMIT_AS: Go and V8 reserve large PROT_NONE regions up front.
+        limit = settings.sandbox_memory_mb * 1024 * 1024
+        limits.append(f"--data={limit}")
+    return ["prlimit", *limits, "--"] if limits else []
+
+
+def _kill_group(pid: int) -> None:
+    try:
+        os.killpg(pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+
 
 @dataclass
-class ExecutionResult:
-    exit_code: int
-    stdout: str
-    stderr: str
+class _Capture:
+    """Output read from one pipe so far; kept when the read is abandoned."""
+
+    data: bytearray = field(default_factory=bytearray)
+    # More than `sandbox_output_limit` bytes were produced.
+    over_limit: bool = False
+    # Still open after the process exited (held by an escaped descendant) and abandoned.
+    left_open: bool = False
 
-    @property
-    def output(self) -> str:
-        combined = self.stdout.strip()
-        if self.stderr.strip():
-            return f"{combined}\n{self.stderr.strip()}" if combined else self.stderr.strip()
-        return combined
+
+async def _drain(
+    pipe: IO[bytes],
+    capture: _Capture,
+    limit: int,
+    name: str = "",
+    on_output: OutputCallback | None = None,
+) -> None:
+    """Read a pipe to EOF into `capture`, keeping at most `limit` bytes and forwarding chunks."""
+    loop = asyncio.get_running_loop()
+    reader = asyncio.StreamReader(limit=READ_CHUNK)
+    transport, _ = await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), pipe)
+    buffer = capture.data
+    try:
+        while chunk := await reader.read(READ_CHUNK):
+            if on_output:
+                await on_output(name, chunk)
+            room = limit - len(buffer)
+            if len(chunk) > room:
+                capture.over_limit = True
+                chunk = chunk[: max(room, 0)]
+            buffer.extend(chunk)
+    finally:
+        transport.close()
+
+
+async def _feed(pipe: IO[bytes], source: StdinSource) -> None:
+    """Write `source` to the child's stdin as it is produced, honouring pipe back-pressure."""
+    loop = asyncio.get_running_loop()
+    transport, protocol = await loop.connect_write_pipe(asyncio.streams.FlowControlMixin, pipe)
+    writer = asyncio.StreamWriter(transport, protocol, None, loop)
+    try:
+        if isinstance(source, AsyncIterable):
+            async for chunk in source:
+                writer.write(chunk)
+                await writer.drain()
+        else:
+            # Blob-backed sources block on I/O; pull them from a worker thread.
+            chunks = iter(source)
+            while (chunk := await asyncio.to_thread(next, chunks, None)) is not None:
+                writer.write(chunk)
+                await writer.drain()
+    except (BrokenPipeError, ConnectionResetError):
+        # The process exited without reading all of its input.
+        pass
+    finally:
+        transport.close()
+
+
+async def _wait(pid: int) -> tuple[int, resource.struct_rusage]:
+    """Reap `pid` without blocking the loop, returning its exit code and rusage."""
+    loop = asyncio.get_running_loop()
+    try:
+        pidfd: int | None = os.pidfd_open(pid)
+    except (AttributeError, OSError):
+        pidfd = None
+    try:
+        while True:
+            waited, status, usage = os.wait4(pid, os.WNOHANG)
+            if waited:
+                return os.waitstatus_to_exitcode(status), usage
+            if pidfd is None:
+                await asyncio.sleep(0.01)
+                continue
+            exited = loop.create_future()
+            loop.add_reader(pidfd, lambda: exited.done() or exited.set_result(None))
+            try:
+                await exited
+            finally:
+                loop.remove_reader(pidfd)
+    finally:
+        if pidfd is not None:
+            os.close(pidfd)
+
+
+def _add_rusage(usage: RunUsage, rusage: resource.struct_rusage) -> None:
+    """Fold one reaped command's rusage (build or run) into the run's usage."""
+    usage.cpu_user_ms = (usage.cpu_user_ms or 0) + int(rusage.ru_utime * 1000)
+    usage.cpu_system_ms = (usage.cpu_system_ms or 0) + int(rusage.ru_stime * 1000)
+    # ru_oublock counts 512-byte blocks written to storage.
+    usage.io_write_bytes = (usage.io_write_bytes or 0) + rusage.ru_oublock * 512
+    usage.peak_memory_kb = max(usage.peak_memory_kb or 0, rusage.ru_maxrss)
+
+
+def _elapsed_ms(started: float) -> int:
+    return int((time.monotonic() - started) * 1000)
 
 
 class LocalSandbox:
-    def run(
+    """
+    Executes runs as local subprocesses on the event loop.
+    Each command runs in its own process group under CPU/memory rlimits; the group is killed on
+    timeout, and stdout/stderr are read incrementally into bounded buffers. Implements the
+    runner's `ExecutionBackend` contract for inline runs and returns the shared `SandboxResult`;
+    rlimits are not the runner's limits. Only the async API is offered: runs belong on the
+    caller's event loop, not a fresh one each.
+    """
+
+    name = "local"
+    capabilities = Capabilities(streaming=True, stdin=True, batch=True)
+
+    async def _execute(
+        self,
+        command: str,
+        cwd: Path,
+        env: dict[str, str],
+        timeout: float,
+        stdin: StdinSource | None = None,
+        on_output: OutputCallback | None = None,
+        usage: RunUsage | None = None,
+    ) -> SandboxResult:
+        # Popen rather than asyncio.create_subprocess_exec: asyncio's child watcher reaps the
+        # process itself, which would hide its rusage (peak RSS) from us.
+        process = subprocess.Popen(
+            [*_limit_argv(), "/bin/sh", "-c", command],
+            cwd=cwd,
+            env=env,
+            stdin=subprocess.DEVNULL if stdin is None else subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            start_new_session=True,
+        )
+        limit = settings.sandbox_output_limit
+        stdout, stderr = _Capture(), _Capture()
+        readers = {
+            asyncio.create_task(_drain(process.stdout, stdout, limit, "stdout", on_output)): stdout,
+            asyncio.create_task(_drain(process.stderr, stderr, limit, "stderr", on_output)): stderr,
+        }
+        feeder = asyncio.create_task(_feed(process.stdin, stdin)) if stdin is not None else None
+
+        timed_out = False
+        try:
+            exit_code, rusage = await asyncio.wait_for(_wait(process.pid), timeout)
+        except asyncio.TimeoutError:
+            timed_out = True
+            _kill_group(process.pid)
+            exit_code, rusage = await _wait(process.pid)
+        # Background processes left in the group would otherwise keep the pipes open.
+        _kill_group(process.pid)
+        process.returncode = exit_code
+        if feeder:
+            feeder.cancel()
+            with suppress(asyncio.CancelledError):
+                await feeder
+
+        done, pending = await asyncio.wait(readers, timeout=DRAIN_GRACE)
+        for reader in done:
+            # Re-raise read errors, e.g. from `on_output`.
+            reader.result()
+        for reader in pending:
+            # Keep what was read; the rest is lost with the escaped process holding the pipe.
+            reader.cancel()
+            readers[reader].left_open = True
+        if pending:
+            await asyncio.wait(pending)
+
+        result = SandboxResult(
+            stdout=stdout.data.decode(errors="replace"),
+            stderr=stderr.data.decode(errors="replace"),
+            timed_out=timed_out,
+            truncated=any(capture.over_limit or capture.left_open for capture in (stdout, stderr)),
+        )
+        if not timed_out:
+            # Negative for signals; reported as 128 + signum like a shell would.
+            result.exit_code = exit_code if exit_code >= 0 else 128 - exit_code
+        if usage is not None:
+            _add_rusage(usage, rusage)
+        return result
+
+    async def run_async(
         self,
         language: str,
         files: List[dict[str, str]],
         build_cmd: str | None,
         run_cmd: str | None,
-    ) -> ExecutionResult:
+        env: dict[str, str] | None = None,
+        stdin: StdinSource | None = None,
+        on_output: OutputCallback | None = None,
+        usage: RunUsage | None = None,
+    ) -> SandboxResult:
+        """
+        `stdin` and `on_output` apply to the run command only, not to the build step. A failed
+        build is returned as the result; `usage` then carries no `exec_ms`.
+        """
+        usage = usage or RunUsage()
         command = run_cmd or DEFAULT_COMMANDS.get(language)
         if not command:
-            return ExecutionResult(1, "", f"Language '{language}' is not supported.")
+            return SandboxResult(error=f"Runner failure: language {language!r} is not supported")
 
+        started = time.monotonic()
+        deadline = started + settings.sandbox_timeout
         with TemporaryDirectory(prefix="runbox-") as tmp:
             workspace = Path(tmp)
-            for file in files:
-                path = workspace / file["name"]
-                path.parent.mkdir(parents=True, exist_ok=True)
-                path.write_text(file["content"], encoding="utf-8")
-
-            env = os.environ.copy()
-            env.update(ENV_OVERRIDES.get(language, {}))
+            try:
+                self._write_files(workspace, files)
+            except ValueError as exc:
+                return SandboxResult(error=f"Runner failure: {exc}")
+            environment = self._environment(language, env)
+            usage.setup_ms = _elapsed_ms(started)
 
             if build_cmd:
-                build = subprocess.run(
-                    build_cmd,
-                    cwd=workspace,
-                    shell=True,
-                    text=True,
-                    capture_output=True,
-                    env=env,
+                build_started = time.monotonic()
+                build = await self._execute(
+                    build_cmd, workspace, environment, deadline - build_started, usage=usage
                 )
-                if build.returncode != 0:
-                    return ExecutionResult(build.returncode, build.stdout, build.stderr)
+                usage.build_ms = _elapsed_ms(build_started)
+                if build.failure_cause():
+                    return build
 
-            process = subprocess.run(
+            exec_started = time.monotonic()
+            result = await self._execute(
                 command,
-                cwd=workspace,
-                shell=True,
-                text=True,
-                capture_output=True,
-                env=env,
+                workspace,
+                environment,
+                max(deadline - exec_started, 0),
+                stdin,
+                on_output,
+                usage,
+            )
+            usage.exec_ms = _elapsed_ms(exec_started)
+            usage.output_bytes = len(result.stdout.encode()) + len(result.stderr.encode())
+            return result
+
+    def _write_files(self, workspace: Path, files: List[dict[str, str]]) -> None:
+        for file in files:
+            path = workspace_path(workspace, file["name"])
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(file["content"], encoding="utf-8")
+
+    def _environment(self, language: str, extra: dict[str, str] | None = None) -> dict[str, str]:
+        env = os.environ.copy()
+        env.update(ENV_OVERRIDES.get(language, {}))
+        env.update(extra or {})
+        return env
+
+    async def run_batch_async(
+        self,
+        language: str,
+        files: List[dict[str, str]],
+        build_cmd: str | None,
+        run_cmd: str | None,
+        variants: List[dict],
+        parallelism: int = 1,
+        env: dict[str, str] | None = None,
+        usage: RunUsage | None = None,
+    ) -> dict:
+        """Build once, then run each variant (stdin and extra args) with bounded parallelism."""
+        usage = usage or RunUsage()
+        command = run_cmd or DEFAULT_COMMANDS.get(language)
+        if not command:
+            output = f"Runner failure: language {language!r} is not supported"
+            return {"status": "failed", "output": output, "variants": []}
+
+        started = time.monotonic()
+        with TemporaryDirectory(prefix="runbox-") as tmp:
+            workspace = Path(tmp)
+            stdin_files = [
+                {"name": f"{STDIN_DIR}/{index}", "content": variant.get("stdin") or ""}
+                for index, variant in enumerate(variants)
+            ]
+            try:
+                self._write_files(workspace, files + stdin_files)
+            except ValueError as exc:
+                return {"status": "failed", "output": f"Runner failure: {exc}", "variants": []}
+            env = self._environment(language, env)
+            usage.setup_ms = _elapsed_ms(started)
+
+            build_output = ""
+            if build_cmd:
+                build_started = time.monotonic()
+                build = await self._execute(
+                    build_cmd, workspace, env, settings.sandbox_timeout, usage=usage
+                )
+                usage.build_ms = _elapsed_ms(build_started)
+                build_output = build.output
+                if build.failure_cause():
+                    return {"status": "failed", "output": build_output, "variants": []}
+
+            gate = asyncio.Semaphore(max(parallelism, 1))
+
+            async def run_variant(index: int) -> dict:
+                args = shlex.join(variants[index].get("args") or [])
+                line = f"{command} {args} < {STDIN_DIR}/{index}"
+                async with gate:
+                    variant_started = time.monotonic()
+                    result = await self._execute(
+                        line, workspace, env, settings.sandbox_timeout, usage=usage
+                    )
+                return {
+                    "index": index,
+                    "exit_code": result.exit_code,
+                    "stdout": result.stdout,
+                    "stderr": result.stderr,
+                    "timed_out": result.timed_out,
+                    "truncated": result.truncated,
+                    "duration_ms": _elapsed_ms(variant_started),
+                }
+
+            exec_started = time.monotonic()
+            results = await asyncio.gather(*(run_variant(index) for index in range(len(variants))))
+            usage.exec_ms = _elapsed_ms(exec_started)
+            usage.output_bytes = sum(
+                len(variant["stdout"].encode()) + len(variant["stderr"].encode())
+                for variant in results
             )
-            return ExecutionResult(process.returncode, process.stdout, process.stderr)
+            return {"status": "completed", "output": build_output, "variants": list(results)}
 
 
 sandbox = LocalSandbox()
@@ -0,0 +1,199 @@
+from __future__ import annotations
+
+import gzip
+import shutil
+import tempfile
+from dataclasses import dataclass
+from datetime import timedelta
+from pathlib import Path
+from typing import BinaryIO, Iterator, Optional, Protocol, Tuple
+
+from minio import Minio
+
+from runbox_sandbox.tasks import LOG_GZIP_LEVEL, log_preview
+
+from ..core.config import settings
+
+
+def log_key(run_id: str) -> str:
+    return f"runs/{run_id}/output.log.gz"
+
+
+class RangeNotSatisfiable(Exception):
+    def __init__(self, size: int) -> None:
+        super().__init__(f"Requested range not satisfiable for {size} bytes")
+        self.size = size
+
+
+@dataclass
+class LogSlice:
+    body: Iterator[bytes]
+    start: int
+    end: int
+    size: int
+    partial: bool
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    Resolve a single `bytes=` range against `size` into inclusive (start, end) offsets.
+    Returns None when the whole body should be served (no, multiple or malformed ranges).
+    """
+    if not header or not header.startswith("bytes=") or "," in header or not size:
+        return None
+    first, _, last = header[len("bytes="):].strip().partition("-")
+    try:
+        if not first:
+            start, end = max(size - int(last), 0), size - 1
+        else:
+            start = int(first)
+            end = min(int(last), size - 1) if last else size - 1
+    except ValueError:
+        return None
+    if start > end or start >= size:
+        raise RangeNotSatisfiable(size)
+    return start, end
+
+
+def preview(data: bytes) -> str:
+    """Head and tail of an offloaded log, kept inline on the run record."""
+    return log_preview(data, settings.run_log_preview_bytes)
+
+
+class LogBackend(Protocol):
+    def put(self, key: str, body: BinaryIO, length: int) -> None: ...
+
+    def open(self, key: str) -> BinaryIO: ...
+
+    def url(self, key: str) -> str: ...
+
+    def upload_url(self, key: str) -> str: ...
+
+
+class FilesystemLogBackend:
+    """Local stand-in for object storage (development and tests)."""
+
+    def __init__(self, root: str) -> None:
+        self._root = Path(root)
+
+    def put(self, key: str, body: BinaryIO, length: int) -> None:
+        path = self._root / key
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with path.open("wb") as target:
+            shutil.copyfileobj(body, target)
+
+    def open(self, key: str) -> BinaryIO:
+        return (self._root / key).open("rb")
+
+    def url(self, key: str) -> str:
+        return (self._root / key).resolve().as_uri()
+
+    def upload_url(self, key: str) -> str:
+        # Only usable by a runner on the same host, which writes the file directly.
+        path = self._root / key
+        path.parent.mkdir(parents=True, exist_ok=True)
+        return path.resolve().as_uri()
+
+
+class MinioLogBackend:
+    def __init__(self) -> None:
+        self._client: Optional[Minio] = None
+
+    def _get_client(self) -> Minio:
+        if self._client is None:
+            self._client = Minio(
+                settings.minio_endpoint,
+                access_key=settings.minio_access_key,
+                secret_key=settings.minio_secret_key,
+                secure=settings.minio_secure,
+            )
+            if not self._client.bucket_exists(settings.minio_bucket):
+                self._client.make_bucket(settings.minio_bucket)
+        return self._client
+
+    def put(self, key: str, body: BinaryIO, length: int) -> None:
+        self._get_client().put_object(
+            settings.minio_bucket,
+            key,
+            body,
+            length,
+            content_type="application/gzip",
+        )
+
+    def open(self, key: str) -> BinaryIO:
+        return self._get_client().get_object(settings.minio_bucket, key)
+
+    def url(self, key: str) -> str:
+        expires = timedelta(seconds=settings.run_stdin_url_ttl)
+        return self._get_client().presigned_get_object(settings.minio_bucket, key, expires=expires)
+
+    def upload_url(self, key: str) -> str:
+        expires = timedelta(seconds=settings.run_log_upload_url_ttl)
+        return self._get_client().presigned_put_object(settings.minio_bucket, key, expires=expires)
+
+
+class RunLogStore:
+    """
+    Gzip-compressed run logs in object storage. Reads decompress incrementally in
+    `run_log_chunk_bytes` chunks, so serving a range never holds the full log in memory.
+    """
+
+    def __init__(self, backend: LogBackend) -> None:
+        self._backend = backend
+
+    def put(self, run_id: str, data: bytes) -> str:
+        key = log_key(run_id)
+        with tempfile.SpooledTemporaryFile(max_size=settings.run_log_chunk_bytes * 16) as spool:
+            with gzip.GzipFile(
+                fileobj=spool, mode="wb", compresslevel=LOG_GZIP_LEVEL
+            ) as compressed:
+                compressed.write(data)
+            length = spool.tell()
+            spool.seek(0)
+            self._backend.put(key, spool, length)
+        return key
+
+    def upload_url(self, run_id: str) -> str:
+        """Where the runner uploads the gzipped log of a run whose output is too large to inline."""
+        return self._backend.upload_url(log_key(run_id))
+
+    def iter_range(self, key: str, start: int, end: int) -> Iterator[bytes]:
+        """Yield the decompressed bytes in [start, end]."""
+        raw = self._backend.open(key)
+        try:
+            with gzip.GzipFile(fileobj=raw, mode="rb") as stream:
+                position = 0
+                while position <= end:
+                    chunk = stream.read(settings.run_log_chunk_bytes)
+                    if not chunk:
+                        break
+                    chunk_end = position + len(chunk)
+                    if chunk_end > start:
+                        yield chunk[max(start - position, 0):end + 1 - position]
+                    position = chunk_end
+        finally:
+            raw.close()
+            release = getattr(raw, "release_conn", None)
+            if release:
+                release()
+
+    def slice(self, key: str, size: int, range_header: Optional[str]) -> LogSlice:
+        """Raises RangeNotSatisfiable for ranges outside the log."""
+        bounds = parse_range(range_header, size)
+        start, end = bounds or (0, size - 1)
+        return LogSlice(self.iter_range(key, start, end), start, end, size, bounds is not None)
+
+
+def inline_slice(output: str, range_header: Optional[str]) -> LogSlice:
+    data = output.encode()
+    bounds = parse_range(range_header, len(data))
+    start, end = bounds or (0, len(data) - 1)
+    return LogSlice(iter([data[start:end + 1]]), start, end, len(data), bounds is not None)
+
+
+log_backend: LogBackend = (
+    FilesystemLogBackend(settings.run_log_dir)
+    if settings.run_log_storage == "filesystem"
+    else MinioLogBackend()
+)
+log_store = RunLogStore(log_backend)
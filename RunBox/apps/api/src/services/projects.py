@@ -1,87 +1,141 @@
 from __future__ import annotations
 
-from dataclasses import dataclass, field
-from typing import Dict, List, Optional
+import hashlib
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
 
-from ..schemas.project import Project, ProjectCreate, ProjectUpdate
+from pydantic import TypeAdapter
 
+from ..core.config import settings
+from ..repositories.projects import (
+    InMemoryProjectRepository,
+    ProjectRepository,
+    ProjectSearch,
+    SqlProjectRepository,
+)
+from ..schemas.project import (
+    Project,
+    ProjectCreate,
+    ProjectSearchHit,
+    ProjectSearchPage,
+    ProjectUpdate,
+)
 
-@dataclass
-class InMemoryProject:
-    id: str
-    slug: str
-    title: str
-    description: str
-    language: str
-    tags: List[str] = field(default_factory=list)
-    cover_url: Optional[str] = None
-    readme_md: Optional[str] = None
-    build_cmd: Optional[str] = None
-    run_cmd: Optional[str] = None
-    status: str = "draft"
-    created_at: str = "2024-03-01T00:00:00Z"
-    updated_at: str = "2024-03-01T00:00:00Z"
+project_list_adapter = TypeAdapter(List[Project])
 
 
-class ProjectService:
+@dataclass(frozen=True)
+class CatalogEntry:
+    """A serialized catalog response and its strong ETag."""
+
+    body: bytes
+    etag: str
+    public: bool
+
+
+CatalogKey = Tuple[str, Optional[str]]
+
+
+def catalog_etag(key: CatalogKey, revision: str) -> str:
+    """Derived from the store's revision, so every API process hands out the same ETag."""
+    return f'"{hashlib.sha256(f"{key}:{revision}".encode()).hexdigest()[:32]}"'
+
+
+class ProjectCatalogCache:
     """
-    Development placeholder service storing projects in-memory.
-    Replace with real database interactions once migrations land.
+    Serialized project listings (keyed by status filter) and single projects (keyed by slug),
+    each stored with the repository revision it was read at. An entry is served only while
+    the revision is unchanged, so writes made through any API process (or straight to the
+    database) invalidate it, and for at most `project_cache_ttl` seconds in any case.
     """
 
     def __init__(self) -> None:
-        self._projects: Dict[str, InMemoryProject] = {
-            "realtime-chatbot": InMemoryProject(
-                id="1",
-                slug="realtime-chatbot",
-                title="Realtime Chatbot",
-                description="LangChain-powered chatbot streaming responses via WebSocket.",
-                language="python",
-                tags=["ai", "websocket", "langchain"],
-                cover_url="https://images.unsplash.com/photo-1523475472560-d2df97ec485c?auto=format&fit=crop&w=800&q=80",
-                status="published",
-            )
-        }
-
-    def list(self) -> List[Project]:
-        return [Project.model_validate(vars(project)) for project in self._projects.values()]
-
-    def get_by_slug(self, slug: str) -> Optional[Project]:
-        project = self._projects.get(slug)
-        if not project:
+        self._entries: Dict[CatalogKey, Tuple[str, float, CatalogEntry]] = {}
+
+    def get(self, key: CatalogKey, revision: str) -> Optional[CatalogEntry]:
+        cached = self._entries.get(key)
+        if cached is None:
             return None
-        return Project.model_validate(vars(project))
-
-    def create(self, payload: ProjectCreate) -> Project:
-        project = InMemoryProject(
-            id=str(len(self._projects) + 1),
-            slug=payload.slug,
-            title=payload.title,
-            description=payload.description,
-            language=payload.language,
-            tags=payload.tags,
-            cover_url=payload.cover_url,
-            readme_md=payload.readme_md,
-            build_cmd=payload.build_cmd,
-            run_cmd=payload.run_cmd,
-            status=payload.status,
-        )
-        self._projects[project.slug] = project
-        return Project.model_validate(vars(project))
-
-    def update(self, slug: str, payload: ProjectUpdate) -> Optional[Project]:
-        project = self._projects.get(slug)
-        if not project:
+        stored_revision, expires_at, entry = cached
+        if stored_revision != revision or expires_at <= time.monotonic():
+            del self._entries[key]
             return None
+        return entry
 
-        for key, value in payload.model_dump(exclude_unset=True).items():
-            setattr(project, key, value)
-        self._projects[slug] = project
-        return Project.model_validate(vars(project))
+    def put(self, key: CatalogKey, revision: str, body: bytes, public: bool) -> CatalogEntry:
+        entry = CatalogEntry(body, catalog_etag(key, revision), public)
+        if settings.project_cache_ttl > 0:
+            expires_at = time.monotonic() + settings.project_cache_ttl
+            self._entries[key] = (revision, expires_at, entry)
+        return entry
 
-    def delete(self, slug: str) -> bool:
-        return self._projects.pop(slug, None) is not None
 
+class ProjectService:
+    def __init__(self, repository: ProjectRepository) -> None:
+        self._repository = repository
+        self._catalog = ProjectCatalogCache()
+
+    async def list(self) -> List[Project]:
+        return [Project.model_validate(project) for project in await self._repository.list()]
+
+    async def list_response(self, status: Optional[str] = None) -> CatalogEntry:
+        """Serialized listing, optionally only projects in `status` (e.g. "published")."""
+        key = ("list", status)
+        # Read before the projects: a write in between leaves the entry on the older revision.
+        revision = await self._repository.revision()
+        entry = self._catalog.get(key, revision)
+        if entry is None:
+            projects = [
+                project
+                for project in await self.list()
+                if status is None or project.status == status
+            ]
+            body = project_list_adapter.dump_json(projects)
+            entry = self._catalog.put(key, revision, body, public=status == "published")
+        return entry
+
+    async def search(self, params: ProjectSearch) -> ProjectSearchPage:
+        hits, total = await self._repository.search(params)
+        items = [
+            ProjectSearchHit.model_validate(project).model_copy(update={"score": score})
+            for project, score in hits
+        ]
+        return ProjectSearchPage(items=items, total=total, limit=params.limit, offset=params.offset)
+
+    async def get_by_slug(self, slug: str) -> Optional[Project]:
+        project = await self._repository.get(slug)
+        if not project:
+            return None
+        return Project.model_validate(project)
+
+    async def get_response(self, slug: str) -> Optional[CatalogEntry]:
+        key = ("project", slug)
+        revision = await self._repository.revision()
+        entry = self._catalog.get(key, revision)
+        if entry is None:
+            project = await self.get_by_slug(slug)
+            if not project:
+                return None
+            body = project.model_dump_json().encode()
+            entry = self._catalog.put(key, revision, body, public=project.status == "published")
+        return entry
+
+    async def create(self, payload: ProjectCreate) -> Project:
+        project = await self._repository.add(payload.model_dump())
+        return Project.model_validate(project)
+
+    async def update(self, slug: str, payload: ProjectUpdate) -> Optional[Project]:
+        project = await self._repository.update(slug, payload.model_dump(exclude_unset=True))
+        if not project:
+            return None
+        return Project.model_validate(project)
+
+    async def delete(self, slug: str) -> bool:
+        deleted = await self._repository.delete(slug)
+        return deleted
 
-project_service = ProjectService()
 
+project_service = ProjectService(
+    InMemoryProjectRepository() if settings.storage_backend == "memory" else SqlProjectRepository()
+)
@@ -0,0 +1,64 @@
+from __future__ import annotations
+
+from typing import List
+
+from celery import Celery
+from celery.result import AsyncResult
+from redis import Redis
+
+from runbox_sandbox import tasks as shared
+from runbox_sandbox.tasks import RESULT_SERIALIZER
+
+from ..core.config import settings
+
+EXECUTE_TASK = "runner.execute"
+BATCH_TASK = "runner.execute_batch"
+
+shared.register_result_serializer()
+
+celery_client = Celery("runbox-api", broker=settings.redis_url, backend=settings.redis_url)
+celery_client.conf.update(
+    task_default_queue=settings.runner_queue_name,
+    result_serializer=RESULT_SERIALIZER,
+    result_accept_content=["json", RESULT_SERIALIZER],
+)
+
+
+def runner_queue(language: str) -> str:
+    if language in settings.runner_language_queues:
+        return f"{settings.runner_queue_name}.{language}"
+    return settings.runner_queue_name
+
+
+def runner_queues() -> List[str]:
+    name = settings.runner_queue_name
+    return [name, *(f"{name}.{language}" for language in settings.runner_language_queues)]
+
+
+def queue_depth(redis: Redis) -> int:
+    """Runs published to any runner queue and not yet picked up."""
+    return sum(redis.llen(queue) for queue in runner_queues())
+
+
+def batch_time_limits(variants: int, parallelism: int) -> tuple[int, int]:
+    """Limits for a batch, from the runner settings mirrored in ours."""
+    return shared.batch_time_limits(
+        variants,
+        parallelism,
+        settings.runner_sandbox_timeout,
+        settings.runner_slot_wait_timeout,
+        settings.runner_task_time_limit_grace,
+    )
+
+
+def submit_run(payload: dict, task: str = EXECUTE_TASK) -> None:
+    queue = runner_queue(payload.get("language", ""))
+    limits = {}
+    if task == BATCH_TASK:
+        soft, hard = batch_time_limits(len(payload["variants"]), payload.get("parallelism", 1))
+        limits = {"soft_time_limit": soft, "time_limit": hard}
+    celery_client.send_task(task, args=[payload], task_id=payload["id"], queue=queue, **limits)
+
+
+def get_result(run_id: str) -> AsyncResult:
+    return AsyncResult(run_id, app=celery_client)
@@ -0,0 +1,100 @@
+from __future__ import annotations
+
+import hashlib
+import time
+from typing import Optional
+
+import orjson
+from redis.exceptions import WatchError
+
+from ..core.config import settings
+from ..core.redis import get_redis
+from ..schemas.run import RunCreate
+
+CACHE_PREFIX = "runbox:cache:"
+INDEX_KEY = "runbox:cache:index"
+
+
+def cache_key(payload: RunCreate) -> str:
+    """
+    Stable hash of the normalized run payload and the toolchain image it would run on.
+    Only languages with a digest in `run_image_digests` are cacheable.
+    """
+    normalized = {
+        "language": payload.language,
+        "files": sorted((file.name, file.content) for file in payload.files),
+        "build_cmd": (payload.build_cmd or "").strip(),
+        "run_cmd": (payload.run_cmd or "").strip(),
+        "env": sorted(payload.env.items()),
+        "stdin": payload.stdin,
+        "stdin_ref": payload.stdin_ref,
+        "image": settings.run_image_digests[payload.language],
+    }
+    return hashlib.sha256(orjson.dumps(normalized)).hexdigest()
+
+
+class RunResultCache:
+    """
+    Content-addressed cache of finished run results stored in Redis.
+    Entries expire after `run_cache_ttl`; a sorted-set index by last access keeps at most
+    `run_cache_max_entries` entries, evicting the least recently used ones first.
+    """
+
+    def get(self, key: str) -> Optional[dict]:
+        client = get_redis()
+        raw = client.get(CACHE_PREFIX + key)
+        if raw is None:
+            return None
+        client.zadd(INDEX_KEY, {key: time.time()})
+        return orjson.loads(raw)
+
+    def put(self, key: str, result: dict) -> None:
+        data = orjson.dumps(result)
+        if len(data) > settings.run_cache_max_entry_bytes:
+            return
+
+        client = get_redis()
+        with client.pipeline() as pipe:
+            pipe.set(CACHE_PREFIX + key, data, ex=settings.run_cache_ttl)
+            pipe.zadd(INDEX_KEY, {key: time.time()})
+            pipe.zcard(INDEX_KEY)
+            size = pipe.execute()[-1]
+
+        overflow = size - settings.run_cache_max_entries
+        if overflow > 0:
+            evicted = [member for member, _ in client.zpopmin(INDEX_KEY, overflow)]
+            client.delete(*(CACHE_PREFIX + member for member in evicted))
+
+    def claim(self, key: str, run_id: str) -> Optional[str]:
+        """
+        Register `run_id` as the in-flight execution for `key`.
+        Returns the id of the run already in flight, or None when the caller should execute.
+        """
+        client = get_redis()
+        lock_key = f"{CACHE_PREFIX}{key}:inflight"
+        if client.set(lock_key, run_id, nx=True, ex=settings.run_cache_inflight_ttl):
+            return None
+        leader = client.get(lock_key)
+        return leader if leader and leader != run_id else None
+
+    def holder(self, key: str) -> Optional[str]:
+        """The run currently holding the in-flight claim on `key`, if any."""
+        return get_redis().get(f"{CACHE_PREFIX}{key}:inflight")
+
+    def release(self, key: str, run_id: str) -> None:
+        """Drop the in-flight claim on `key`, but only while `run_id` still holds it."""
+        lock_key = f"{CACHE_PREFIX}{key}:inflight"
+        with get_redis().pipeline() as pipe:
+            try:
+                pipe.watch(lock_key)
+                if pipe.get(lock_key) != run_id:
+                    return
+                pipe.multi()
+                pipe.delete(lock_key)
+                pipe.execute()
+            except WatchError:
+                # Expired and claimed by another run in the meantime; that claim is theirs.
+                pass
+
+
+result_cache = RunResultCache()
@@ -1,71 +1,511 @@
 from __future__ import annotations
 
-from dataclasses import dataclass, field
-from datetime import datetime, timezone
+import asyncio
+import codecs
+from contextlib import suppress
+from dataclasses import asdict
+from datetime import datetime, timedelta, timezone
+import json
 import logging
-from typing import Dict, List
+import time
+from typing import AsyncIterator, Awaitable, Callable, Iterator, List, Optional
 from uuid import uuid4
 
-from ..schemas.run import RunResult, RunCreate
-from .executor import sandbox
+from runbox_sandbox import SandboxResult
 
-logger = logging.getLogger(__name__)
+from ..core import metrics
+from ..core.config import settings
+from ..core.redis import get_async_redis
+from ..repositories.runs import (
+    InMemoryRunRepository,
+    RunFilters,
+    RunRecord,
+    RunRepository,
+    SqlRunRepository,
+    decode_cursor,
+    encode_cursor,
+)
+from ..schemas.run import Run, RunBatchCreate, RunCreate, RunPage, RunResult, RunUsage
+from .executor import language_label, sandbox
+from .logs import LogSlice, inline_slice, log_key, log_store, preview
+from .projects import project_service
+from .queue import BATCH_TASK, get_result, submit_run
+from .result_cache import cache_key, result_cache
+from .scheduler import SchedulerFull, run_scheduler
+from .stdin import stdin_key, stdin_store
+from .streams import input_key, run_stream_reader
 
+logger = logging.getLogger(__name__)
 
-@dataclass
-class InMemoryRun:
-    id: str
-    status: str
-    language: str
-    started_at: datetime
-    finished_at: datetime | None = None
-    runtime_ms: int | None = None
-    files: List[dict] = field(default_factory=list)
-    project_slug: str | None = None
-    output: str = ""
-    error: str | None = None
+PENDING_STATUSES = {"queued", "running"}
 
 
 class RunService:
     """
-    Development placeholder service that pretends to enqueue jobs on the runner queue.
-    It returns synthetic run identifiers to unblock the frontend.
+    Publishes runs to the runner queue and tracks their status from the Celery result backend.
+    With `run_execution_mode="inline"` runs execute in-process through LocalSandbox instead.
+    Run records are written through the repository; Redis/Celery calls run in worker threads.
     """
 
-    def __init__(self) -> None:
-        self._runs: Dict[str, InMemoryRun] = {}
+    def __init__(self, repository: RunRepository) -> None:
+        self._repository = repository
 
-    def create(self, payload: RunCreate) -> RunResult:
-        run_id = str(uuid4())
-        run = InMemoryRun(
-            id=run_id,
+    def _new_record(self, payload: RunCreate | RunBatchCreate, client: str) -> RunRecord:
+        return RunRecord(
+            id=str(uuid4()),
             status="queued",
             language=payload.language,
             started_at=datetime.now(timezone.utc),
             files=[file.model_dump() for file in payload.files],
+            build_cmd=payload.build_cmd,
+            run_cmd=payload.run_cmd,
+            env=payload.env,
             project_slug=payload.project_slug,
+            client=client,
         )
-        self._runs[run_id] = run
 
-        execution = sandbox.run(
-            language=payload.language,
-            files=[file.model_dump() for file in payload.files],
-            build_cmd=payload.build_cmd,
-            run_cmd=payload.run_cmd,
+    def _with_stdin(self, run: RunRecord, payload: RunCreate) -> RunRecord:
+        """Raises ValueError for oversized inline stdin or unknown stdin references."""
+        inline_max = settings.run_stdin_inline_max_bytes
+        if payload.stdin is not None and len(payload.stdin.encode()) > inline_max:
+            raise ValueError(
+                "Inline stdin is too large; upload it to /runs/stdin and pass stdin_ref"
+            )
+        if payload.stdin_ref is not None:
+            stdin_key(payload.stdin_ref)
+        run.stdin = payload.stdin
+        run.stdin_ref = payload.stdin_ref
+        return run
+
+    def _stdin_source(self, run: RunRecord) -> Iterator[bytes] | None:
+        if run.stdin_ref:
+            return stdin_store.chunks(run.stdin_ref)
+        if run.stdin is not None:
+            return iter([run.stdin.encode()])
+        return None
+
+    async def create(self, payload: RunCreate, client: str = "anonymous") -> RunResult:
+        """Raises ValueError for invalid stdin."""
+        run = self._with_stdin(self._new_record(payload, client), payload)
+        run.cache_key = await self._cache_key_for(payload)
+        return await self._start(run, {"stream": payload.stream})
+
+    async def interactive(
+        self,
+        payload: RunCreate,
+        client: str,
+        stdin: AsyncIterator[bytes],
+        send: Callable[[str, str], Awaitable[None]],
+    ) -> RunResult:
+        """
+        Run with stdin fed from `stdin` as it arrives and output pushed to `send` as produced.
+        Runner-side sessions relay input through a Redis stream the worker reads from.
+        """
+        run = self._new_record(payload, client)
+        if settings.run_execution_mode == "inline":
+            await self._repository.save(run)
+            queued = time.monotonic()
+            try:
+                async with run_scheduler.slot(run.language, run.client):
+                    usage = RunUsage(queue_ms=int((time.monotonic() - queued) * 1000))
+                    execution = await self._run_interactive(run, stdin, send, usage)
+            except SchedulerFull:
+                self._reject(run)
+                await self._repository.save(run)
+                raise
+            await asyncio.to_thread(self._finish, run, self._execution_data(execution, usage))
+            await self._repository.save(run)
+            return self._to_result(run)
+
+        await self._start(run, {"stream": True, "interactive": True})
+        pump = asyncio.create_task(self._relay_input(run.id, stdin))
+        try:
+            async for entry in run_stream_reader.entries(run.id):
+                if entry and entry[1] == "chunk":
+                    await send(entry[2]["stream"], entry[2]["data"])
+        finally:
+            pump.cancel()
+            with suppress(asyncio.CancelledError):
+                await pump
+        return await self.wait(run.id, settings.run_wait_timeout)
+
+    async def _run_interactive(
+        self,
+        run: RunRecord,
+        stdin: AsyncIterator[bytes],
+        send: Callable[[str, str], Awaitable[None]],
+        usage: RunUsage,
+    ) -> SandboxResult:
+        decoders = {
+            name: codecs.getincrementaldecoder("utf-8")("replace") for name in ("stdout", "stderr")
+        }
+
+        async def forward(name: str, data: bytes) -> None:
+            if text := decoders[name].decode(data):
+                await send(name, text)
+
+        execution = await sandbox.run_async(
+            run.language, run.files, run.build_cmd, run.run_cmd, run.env, stdin, forward, usage
         )
+        for name, decoder in decoders.items():
+            if text := decoder.decode(b"", final=True):
+                await send(name, text)
+        return execution
+
+    async def _relay_input(self, run_id: str, stdin: AsyncIterator[bytes]) -> None:
+        client = get_async_redis()
+        key = input_key(run_id)
+        try:
+            async for chunk in stdin:
+                await client.xadd(key, {"data": chunk})
+        finally:
+            await client.xadd(key, {"eof": 1})
+            await client.expire(key, settings.run_stream_idle_timeout)
+
+    async def create_batch(self, payload: RunBatchCreate, client: str = "anonymous") -> RunResult:
+        """Run every variant against one build of the file set, in a single sandbox session."""
+        run = self._new_record(payload, client)
+        run.variants = [variant.model_dump() for variant in payload.variants]
+        run.parallelism = payload.parallelism
+        return await self._start(run, {})
+
+    async def _start(self, run: RunRecord, options: dict) -> RunResult:
+        try:
+            if settings.run_execution_mode == "inline":
+                # Inline runs take a while; make them visible in the history before they finish.
+                await self._repository.save(run)
+                await self._run_inline(run)
+            else:
+                await asyncio.to_thread(self._dispatch, run, options)
+        except SchedulerFull:
+            self._reject(run)
+            raise
+        finally:
+            await self._repository.save(run)
+        return self._to_result(run)
+
+    def _from_cache(self, run: RunRecord) -> bool:
+        """Finish the run from the result cache, or claim its key (or join whoever holds it)."""
+        if not run.cache_key:
+            return False
+        cached = result_cache.get(run.cache_key)
+        if cached:
+            metrics.result_cache_lookups.labels("hit").inc()
+            self._finish(run, cached, cache_hit=True)
+            return True
+        run.source_run_id = result_cache.claim(run.cache_key, run.id)
+        metrics.result_cache_lookups.labels("coalesced" if run.source_run_id else "miss").inc()
+        return False
+
+    def _reject(self, run: RunRecord) -> None:
+        run.status = "rejected"
+        metrics.sandbox_failures.labels(language_label(run.language), "rejected").inc()
+        if run.cache_key:
+            result_cache.release(run.cache_key, run.id)
+
+    async def _run_inline(self, run: RunRecord) -> None:
+        if await asyncio.to_thread(self._from_cache, run):
+            return
+        if run.source_run_id and await self._wait_for_cached(run):
+            return
+        queued = time.monotonic()
+        async with run_scheduler.slot(run.language, run.client):
+            run.usage = {"queue_ms": int((time.monotonic() - queued) * 1000)}
+            await self._execute_inline(run)
+
+    def _dispatch(self, run: RunRecord, options: dict) -> None:
+        """`options` are extra job fields for the runner, e.g. `stream`."""
+        run_id = run.id
+        if self._from_cache(run):
+            return
+        if run.source_run_id:
+            logger.info("Coalesced run %s onto in-flight run %s", run_id, run.source_run_id)
+            return
+
+        run.queue_position = run_scheduler.admit(run.client)
+        job = {
+            "id": run_id,
+            "language": run.language,
+            "files": run.files,
+            "build_cmd": run.build_cmd,
+            "run_cmd": run.run_cmd,
+            "env": run.env,
+            # The worker releases the client's pending slot when the run ends.
+            "client": run.client,
+            # Wall-clock epoch, so the worker can account the time spent queued.
+            "submitted_at": time.time(),
+            **self._log_upload(run_id),
+            **options,
+        }
+        try:
+            if run.variants is not None:
+                batch = {**job, "variants": run.variants, "parallelism": run.parallelism}
+                submit_run(batch, BATCH_TASK)
+            else:
+                stdin_url = stdin_store.url(run.stdin_ref) if run.stdin_ref else None
+                submit_run({**job, "stdin": run.stdin, "stdin_url": stdin_url})
+        except Exception as exc:
+            # Fails the run and gives up its claim, so coalesced followers take over.
+            error = f"Runner unavailable: {exc}"
+            self._finish(run, {"status": "failed", "error": error, "cause": "task_error"})
+            raise
+        logger.info("Queued run %s at position %s", run_id, run.queue_position)
 
+    def _log_upload(self, run_id: str) -> dict:
+        """Job fields telling the runner where to offload an output too large to inline."""
+        if not settings.run_log_inline_limit:
+            return {}
+        try:
+            url = log_store.upload_url(run_id)
+        except Exception:
+            logger.exception("No log upload URL for run %s; its output stays inline", run_id)
+            return {}
+        return {
+            "log_url": url,
+            "log_inline_limit": settings.run_log_inline_limit,
+            "log_preview_bytes": settings.run_log_preview_bytes,
+        }
+
+    async def _cache_key_for(self, payload: RunCreate) -> str | None:
+        if not settings.run_cache_enabled or not payload.project_slug:
+            return None
+        if payload.language not in settings.run_image_digests:
+            # Without a pinned image a toolchain upgrade would keep serving stale results.
+            return None
+        project = await project_service.get_by_slug(payload.project_slug)
+        if not project or not project.cacheable:
+            return None
+        return cache_key(payload)
+
+    async def _wait_for_cached(self, run: RunRecord) -> bool:
+        deadline = time.monotonic() + settings.run_wait_timeout
+        while time.monotonic() < deadline:
+            cached = await asyncio.to_thread(result_cache.get, run.cache_key)
+            if cached:
+                await asyncio.to_thread(self._finish, run, cached, True)
+                return True
+            await asyncio.sleep(settings.run_poll_interval)
+        return False
+
+    def _finish(self, run: RunRecord, data: dict, cache_hit: bool = False) -> None:
         run.finished_at = datetime.now(timezone.utc)
         run.runtime_ms = int((run.finished_at - run.started_at).total_seconds() * 1000)
-        run.status = "completed" if execution.exit_code == 0 else "failed"
-        run.output = execution.output
-        run.error = execution.stderr if execution.exit_code != 0 else None
-        self._runs[run_id] = run
+        run.status = data["status"]
+        run.output = data.get("output", "")
+        run.error = data.get("error")
+        run.variant_results = data.get("variants", run.variant_results)
+        if data.get("logs_key"):
+            # Offloaded by the runner; `output` holds the preview.
+            run.logs_key, run.log_bytes = data["logs_key"], data.get("log_bytes")
+        if data.get("usage"):
+            run.usage = {**(run.usage or {}), **data["usage"]}
+        run.cache_hit = cache_hit
+        if run.queue_position is not None:
+            # Normally already released by the worker; this covers tasks that died.
+            run_scheduler.complete(run.id, run.client)
+
+        self._observe(run, data.get("cause"))
+
+        if run.cache_key and not cache_hit:
+            if run.status == "completed":
+                cached = {"status": run.status, "output": run.output, "error": run.error}
+                if run.logs_key:
+                    cached.update(logs_key=run.logs_key, log_bytes=run.log_bytes)
+                result_cache.put(run.cache_key, cached)
+            result_cache.release(run.cache_key, run.id)
+        self._offload_output(run)
+
+    def _observe(self, run: RunRecord, cause: str | None) -> None:
+        language = language_label(run.language)
+        metrics.run_duration.labels(language, run.status).observe(run.runtime_ms / 1000)
+        for phase in metrics.RUN_PHASES:
+            elapsed = (run.usage or {}).get(f"{phase}_ms")
+            if elapsed is not None:
+                metrics.run_phase_duration.labels(language, phase).observe(elapsed / 1000)
+        # Coalesced runs and cache hits report a failure that was already counted.
+        if run.status == "failed" and not run.cache_hit and not run.source_run_id:
+            metrics.sandbox_failures.labels(language, cause or "error").inc()
+
+    def _offload_output(self, run: RunRecord) -> None:
+        """Offload inline runs' output, and queued runs' whose runner could not."""
+        if run.logs_key:
+            return
+        data = run.output.encode()
+        if not settings.run_log_inline_limit or len(data) <= settings.run_log_inline_limit:
+            return
+        try:
+            run.logs_key = log_store.put(run.id, data)
+        except Exception:
+            logger.exception("Failed to offload logs of run %s; keeping them inline", run.id)
+            return
+        run.log_bytes = len(data)
+        run.output = preview(data)
+
+    async def _execute_inline(self, run: RunRecord) -> None:
+        # Carries on from the time spent waiting for a slot.
+        usage = RunUsage.model_validate(run.usage or {})
+        if run.variants is not None:
+            batch = await sandbox.run_batch_async(
+                language=run.language,
+                files=run.files,
+                build_cmd=run.build_cmd,
+                run_cmd=run.run_cmd,
+                variants=run.variants,
+                parallelism=run.parallelism,
+                env=run.env,
+                usage=usage,
+            )
+            batch["usage"] = usage.model_dump()
+            if batch["status"] == "failed":
+                batch["error"] = batch["output"]
+                batch["cause"] = "build"
+            await asyncio.to_thread(self._finish, run, batch)
+            return
+
+        execution = await sandbox.run_async(
+            language=run.language,
+            files=run.files,
+            build_cmd=run.build_cmd,
+            run_cmd=run.run_cmd,
+            env=run.env,
+            stdin=self._stdin_source(run),
+            usage=usage,
+        )
+        await asyncio.to_thread(self._finish, run, self._execution_data(execution, usage))
+
+    def _execution_data(self, execution: SandboxResult, usage: RunUsage) -> dict:
+        """The result in the shape the runner's `execute_run` reports it."""
+        cause = execution.failure_cause()
+        if cause and usage.build_ms is not None and usage.exec_ms is None:
+            # Failed builds return before the run step.
+            cause = "build"
+        return {
+            "status": "failed" if cause else "completed",
+            "output": execution.output,
+            "error": execution.output if cause else None,
+            "usage": usage.model_dump(),
+            "cause": cause,
+        }
+
+    def _refresh(self, run: RunRecord) -> None:
+        if run.status not in PENDING_STATUSES or settings.run_execution_mode == "inline":
+            return
+
+        result = get_result(run.source_run_id or run.id)
+        if result.state == "STARTED":
+            run.status = "running"
+            return
+        if not result.ready():
+            if run.source_run_id:
+                self._follow(run)
+            return
+
+        if result.successful():
+            data = json.loads(result.result)
+            status = data.get("status", "completed")
+            output = data.get("output", "")
+            log_bytes = data.get("log_bytes")
+            data = {
+                "status": status,
+                "output": output,
+                "error": output if status == "failed" else None,
+                "variants": data.get("variants"),
+                "usage": data.get("usage"),
+                "cause": data.get("cause"),
+                # Set when the runner offloaded the output under the run's (or leader's) key.
+                "logs_key": log_key(run.source_run_id or run.id) if log_bytes else None,
+                "log_bytes": log_bytes,
+            }
+        else:
+            data = {"status": "failed", "error": str(result.result), "cause": "task_error"}
+        # Followers report the leader's result; it is the leader's to cache and release.
+        self._finish(run, data, cache_hit=run.source_run_id is not None)
+
+    def _follow(self, run: RunRecord) -> None:
+        """
+        Check on a follower whose leader has not finished. Once the leader's claim is gone with
+        no cached result (it was rejected, never queued, or outlived the claim), run it alone.
+        """
+        cached = result_cache.get(run.cache_key)
+        if cached:
+            self._finish(run, cached, cache_hit=True)
+            return
+        if result_cache.holder(run.cache_key) == run.source_run_id:
+            return
+        logger.info("Run %s lost its in-flight run %s; dispatching it", run.id, run.source_run_id)
+        run.source_run_id = None
+        try:
+            self._dispatch(run, {})
+        except SchedulerFull:
+            self._reject(run)
+        except Exception:
+            # `_dispatch` has already failed the run.
+            logger.exception("Failed to dispatch run %s", run.id)
+
+    async def _sync(self, run: RunRecord) -> None:
+        """Pull the latest status from the result backend and persist it if it changed."""
+        if run.status not in PENDING_STATUSES or settings.run_execution_mode == "inline":
+            return
+        before = (run.status, run.source_run_id)
+        await asyncio.to_thread(self._refresh, run)
+        if (run.status, run.source_run_id) != before:
+            await self._repository.save(run)
+
+    def _to_result(self, run: RunRecord) -> RunResult:
+        return RunResult.model_validate(asdict(run))
+
+    async def get(self, run_id: str) -> Optional[RunResult]:
+        run = await self._repository.get(run_id)
+        if not run:
+            return None
+        await self._sync(run)
+        return self._to_result(run)
+
+    async def logs(self, run_id: str, range_header: str | None) -> Optional[LogSlice]:
+        """Raises RangeNotSatisfiable for ranges outside the log."""
+        run = await self._repository.get(run_id)
+        if not run:
+            return None
+        await self._sync(run)
+        if run.logs_key:
+            return log_store.slice(run.logs_key, run.log_bytes or 0, range_header)
+        return inline_slice(run.output, range_header)
+
+    async def wait(self, run_id: str, timeout: float) -> Optional[RunResult]:
+        run = await self._repository.get(run_id)
+        if not run:
+            return None
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + min(timeout, settings.run_wait_timeout)
+        await self._sync(run)
+        while run.status in PENDING_STATUSES and loop.time() < deadline:
+            await asyncio.sleep(settings.run_poll_interval)
+            await self._sync(run)
+        return self._to_result(run)
+
+    async def list_page(self, limit: int, cursor: str | None, filters: RunFilters) -> RunPage:
+        """Raises ValueError for malformed cursors."""
+        after = decode_cursor(cursor) if cursor else None
+        runs = await self._repository.list_page(limit + 1, after, filters)
+        next_cursor = encode_cursor(runs[limit - 1]) if len(runs) > limit else None
 
-        return RunResult.model_validate({**vars(run), "output": run.output, "error": run.error})
+        items: List[Run] = []
+        for run in runs[:limit]:
+            if run.status in PENDING_STATUSES and settings.run_execution_mode != "inline":
+                # Listings carry summaries only; load the full record to refresh pending runs.
+                run = await self._repository.get(run.id) or run
+                await self._sync(run)
+            items.append(Run.model_validate(run))
+        return RunPage(items=items, next_cursor=next_cursor)
 
-    def list_recent(self) -> List[RunResult]:
-        sorted_runs = sorted(self._runs.values(), key=lambda run: run.started_at, reverse=True)
-        return [RunResult.model_validate({**vars(run), "output": run.output, "error": run.error}) for run in sorted_runs[:50]]
+    async def prune(self) -> int:
+        if not settings.run_retention_days:
+            return 0
+        before = datetime.now(timezone.utc) - timedelta(days=settings.run_retention_days)
+        return await self._repository.prune(before)
 
 
-run_service = RunService()
+run_service = RunService(
+    InMemoryRunRepository() if settings.storage_backend == "memory" else SqlRunRepository()
+)
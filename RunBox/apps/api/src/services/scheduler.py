@@ -0,0 +1,247 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import AsyncIterator, Iterator
+
+from prometheus_client import REGISTRY
+from prometheus_client.core import GaugeMetricFamily
+from redis.exceptions import RedisError
+
+from runbox_sandbox import DONE_KEY, DONE_TTL, MAX_BATCH_VARIANTS, PENDING_KEY
+
+from ..core.config import settings
+from ..core.redis import get_redis
+from .executor import language_label
+from .queue import batch_time_limits, queue_depth
+
+
+class SchedulerFull(Exception):
+    def __init__(self, queue_depth: int, retry_after: int) -> None:
+        super().__init__(f"Run queue is full ({queue_depth} waiting)")
+        self.queue_depth = queue_depth
+        self.retry_after = retry_after
+
+
+@dataclass
+class _Ticket:
+    language: str
+    client: str
+    enqueued_at: float = field(default_factory=time.monotonic)
+    granted: asyncio.Event = field(default_factory=asyncio.Event)
+
+
+@lru_cache()
+def host_slots() -> int:
+    """Concurrent sandboxes this host can run without oversubscribing CPU or memory."""
+    cpus = os.cpu_count() or 1
+    try:
+        memory_mb = os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES") // (1024 * 1024)
+    except (ValueError, OSError):
+        memory_mb = 0
+    by_memory = memory_mb // settings.sandbox_memory_mb if settings.sandbox_memory_mb else cpus
+    return max(1, min(cpus, by_memory or 1))
+
+
+class RunScheduler:
+    """
+    Admission control in front of sandbox execution.
+    In-process runs wait for a global and a per-language slot; waiters are served round-robin
+    across clients so one busy client cannot starve the others. When the wait queue is full,
+    new runs are rejected immediately instead of piling up. Waiters are coroutines, so a queue
+    of them holds no threads; the lock only guards reads from `stats` and the collector.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._waiting: OrderedDict[str, deque[_Ticket]] = OrderedDict()
+        self._running: dict[str, int] = {}
+        self._running_total = 0
+        self._wait_count = 0
+        self._wait_total_ms = 0.0
+        self._wait_max_ms = 0.0
+
+    @property
+    def global_slots(self) -> int:
+        return settings.scheduler_global_slots or host_slots()
+
+    def language_slots(self, language: str) -> int:
+        return settings.scheduler_language_slots.get(language, self.global_slots)
+
+    def _queue_depth(self) -> int:
+        return sum(len(tickets) for tickets in self._waiting.values())
+
+    def _has_slot(self, language: str) -> bool:
+        return (
+            self._running_total < self.global_slots
+            and self._running.get(language, 0) < self.language_slots(language)
+        )
+
+    def _grant(self, ticket: _Ticket) -> None:
+        self._running_total += 1
+        self._running[ticket.language] = self._running.get(ticket.language, 0) + 1
+        waited_ms = (time.monotonic() - ticket.enqueued_at) * 1000
+        self._wait_count += 1
+        self._wait_total_ms += waited_ms
+        self._wait_max_ms = max(self._wait_max_ms, waited_ms)
+        ticket.granted.set()
+
+    def _dispatch(self) -> None:
+        # Round-robin over clients: serve the first client with a runnable ticket, then move
+        # it to the back of the rotation.
+        progressed = True
+        while progressed and self._running_total < self.global_slots:
+            progressed = False
+            for client, tickets in list(self._waiting.items()):
+                ticket = next((t for t in tickets if self._has_slot(t.language)), None)
+                if ticket is None:
+                    continue
+                tickets.remove(ticket)
+                if tickets:
+                    self._waiting.move_to_end(client)
+                else:
+                    del self._waiting[client]
+                self._grant(ticket)
+                progressed = True
+                break
+
+    def _release(self, ticket: _Ticket) -> None:
+        with self._lock:
+            self._running_total -= 1
+            self._running[ticket.language] -= 1
+            self._dispatch()
+
+    def _withdraw(self, ticket: _Ticket) -> None:
+        tickets = self._waiting[ticket.client]
+        tickets.remove(ticket)
+        if not tickets:
+            del self._waiting[ticket.client]
+
+    @asynccontextmanager
+    async def slot(self, language: str, client: str) -> AsyncIterator[None]:
+        ticket = _Ticket(language=language, client=client)
+        with self._lock:
+            depth = self._queue_depth()
+            if depth >= settings.scheduler_max_queue and not self._has_slot(language):
+                raise SchedulerFull(depth, settings.scheduler_retry_after)
+            self._waiting.setdefault(client, deque()).append(ticket)
+            self._dispatch()
+
+        try:
+            await asyncio.wait_for(ticket.granted.wait(), settings.scheduler_max_wait)
+        except BaseException as exc:
+            with self._lock:
+                granted = ticket.granted.is_set()
+                if not granted:
+                    self._withdraw(ticket)
+                    depth = self._queue_depth()
+            if not granted:
+                if isinstance(exc, asyncio.TimeoutError):
+                    raise SchedulerFull(depth, settings.scheduler_retry_after) from None
+                raise
+            # Granted just as the wait ended: keep the slot unless the waiter was cancelled.
+            if not isinstance(exc, asyncio.TimeoutError):
+                self._release(ticket)
+                raise
+        try:
+            yield
+        finally:
+            self._release(ticket)
+
+    def admit(self, client: str) -> int:
+        """
+        Admission check for runs published to the runner queue.
+        Returns the position the run will take in the queue.
+        """
+        redis = get_redis()
+        depth = queue_depth(redis)
+        if depth >= settings.scheduler_max_queue:
+            raise SchedulerFull(depth, settings.scheduler_retry_after)
+
+        key = PENDING_KEY.format(client=client)
+        pending = redis.incr(key)
+        if pending == 1:
+            # A backstop for releases that never happen (e.g. a worker killed mid-run): no run
+            # outlives the largest batch's hard time limit. Set only when the count starts, so
+            # a steadily busy client's leaks still expire.
+            redis.expire(key, batch_time_limits(MAX_BATCH_VARIANTS, 1)[1])
+        if pending > settings.scheduler_max_pending_per_client:
+            redis.decr(key)
+            raise SchedulerFull(depth, settings.scheduler_retry_after)
+        return depth + 1
+
+    def complete(self, run_id: str, client: str) -> None:
+        """Release the run's pending slot unless the runner (or another poll) already did."""
+        redis = get_redis()
+        if not redis.set(DONE_KEY.format(run_id=run_id), 1, nx=True, ex=DONE_TTL):
+            return
+        key = PENDING_KEY.format(client=client)
+        if redis.decr(key) < 0:
+            # The count expired while the run was pending.
+            redis.delete(key)
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = {
+                "global_slots": self.global_slots,
+                "running": dict(self._running),
+                "running_total": self._running_total,
+                "queue_depth": self._queue_depth(),
+                "avg_wait_ms": (
+                    int(self._wait_total_ms / self._wait_count) if self._wait_count else 0
+                ),
+                "max_wait_ms": int(self._wait_max_ms),
+            }
+        if settings.run_execution_mode != "inline":
+            stats["runner_queue_depth"] = queue_depth(get_redis())
+        return stats
+
+
+class SchedulerCollector:
+    """Scheduler gauges for Prometheus, read from the live scheduler state at scrape time."""
+
+    def __init__(self, scheduler: RunScheduler) -> None:
+        self._scheduler = scheduler
+
+    def collect(self) -> Iterator[GaugeMetricFamily]:
+        scheduler = self._scheduler
+        running = GaugeMetricFamily(
+            "runbox_scheduler_running",
+            "In-process runs holding a sandbox slot.",
+            labels=["language"],
+        )
+        counts: dict[str, int] = {}
+        with scheduler._lock:
+            for language, count in scheduler._running.items():
+                label = language_label(language)
+                counts[label] = counts.get(label, 0) + count
+            waiting = scheduler._queue_depth()
+        for label, count in counts.items():
+            running.add_metric([label], count)
+        yield running
+        yield GaugeMetricFamily(
+            "runbox_scheduler_waiting", "In-process runs waiting for a slot.", value=waiting
+        )
+        yield GaugeMetricFamily(
+            "runbox_scheduler_slots", "Global in-process slot count.", value=scheduler.global_slots
+        )
+        if settings.run_execution_mode != "inline":
+            try:
+                depth = queue_depth(get_redis())
+            except RedisError:
+                return
+            yield GaugeMetricFamily(
+                "runbox_runner_queue_depth",
+                "Runs published to the runner queue and not yet picked up.",
+                value=depth,
+            )
+
+
+run_scheduler = RunScheduler()
+REGISTRY.register(SchedulerCollector(run_scheduler))
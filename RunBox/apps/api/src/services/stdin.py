@@ -0,0 +1,50 @@
+from __future__ import annotations
+
+import re
+from typing import BinaryIO, Iterator
+from uuid import uuid4
+
+from ..core.config import settings
+from .logs import LogBackend, log_backend
+
+REF_PATTERN = re.compile(r"[0-9a-f]{32}")
+
+
+def stdin_key(ref: str) -> str:
+    """Raises ValueError for references that were not issued by `StdinStore.put`."""
+    if not REF_PATTERN.fullmatch(ref):
+        raise ValueError(f"Invalid stdin reference {ref!r}")
+    return f"stdin/{ref}"
+
+
+class StdinStore:
+    """
+    Uploaded stdin blobs, kept in the same object storage as run logs. Runs read them back
+    in `run_stdin_chunk_bytes` chunks, so large inputs are never held in memory whole.
+    """
+
+    def __init__(self, backend: LogBackend) -> None:
+        self._backend = backend
+
+    def put(self, body: BinaryIO, length: int) -> str:
+        ref = uuid4().hex
+        self._backend.put(stdin_key(ref), body, length)
+        return ref
+
+    def chunks(self, ref: str) -> Iterator[bytes]:
+        raw = self._backend.open(stdin_key(ref))
+        try:
+            while chunk := raw.read(settings.run_stdin_chunk_bytes):
+                yield chunk
+        finally:
+            raw.close()
+            release = getattr(raw, "release_conn", None)
+            if release:
+                release()
+
+    def url(self, ref: str) -> str:
+        """Location the runner downloads the blob from."""
+        return self._backend.url(stdin_key(ref))
+
+
+stdin_store = StdinStore(log_backend)
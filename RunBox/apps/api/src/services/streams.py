@@ -0,0 +1,67 @@
+from __future__ import annotations
+
+from typing import AsyncIterator, Optional, Tuple
+
+import orjson
+
+from ..core.config import settings
+from ..core.redis import get_async_redis
+
+
+def stream_key(run_id: str) -> str:
+    return f"runbox:runs:{run_id}:output"
+
+
+def input_key(run_id: str) -> str:
+    return f"runbox:runs:{run_id}:input"
+
+
+StreamEntry = Tuple[str, str, dict]
+
+
+class RunStreamReader:
+    """
+    Tails the per-run Redis stream written by the runner and renders it as server-sent events.
+    Entries are only read as fast as the client consumes them, so a slow client never
+    makes the API buffer more than one XREAD batch.
+    """
+
+    async def entries(
+        self, run_id: str, last_event_id: str | None = None
+    ) -> AsyncIterator[Optional[StreamEntry]]:
+        """Yield (entry id, event, fields) until the `end` entry; None marks an idle block."""
+        client = get_async_redis()
+        key = stream_key(run_id)
+        cursor = last_event_id or "0-0"
+        idle_ms = 0
+
+        while idle_ms < settings.run_stream_idle_timeout * 1000:
+            batches = await client.xread(
+                {key: cursor},
+                count=settings.run_stream_batch_size,
+                block=settings.run_stream_block_ms,
+            )
+            if not batches:
+                idle_ms += settings.run_stream_block_ms
+                yield None
+                continue
+
+            idle_ms = 0
+            for entry_id, fields in batches[0][1]:
+                cursor = entry_id
+                event = fields.pop("event", "chunk")
+                yield entry_id, event, fields
+                if event == "end":
+                    return
+
+    async def events(self, run_id: str, last_event_id: str | None = None) -> AsyncIterator[bytes]:
+        async for entry in self.entries(run_id, last_event_id):
+            if entry is None:
+                yield b": keep-alive\n\n"
+                continue
+            entry_id, event, fields = entry
+            head = f"id: {entry_id}\nevent: {event}\n".encode()
+            yield head + b"data: " + orjson.dumps(fields) + b"\n\n"
+
+
+run_stream_reader = RunStreamReader()
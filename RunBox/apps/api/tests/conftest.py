@@ -0,0 +1,40 @@
+import os
+import tempfile
+
+# Settings and the engine are created at import time, so point them at SQLite before `src` loads.
+_database_dir = tempfile.mkdtemp(prefix="runbox-tests-")
+os.environ["RUNBOX_DATABASE_URL"] = f"sqlite:///{_database_dir}/runbox.db"
+os.environ["RUNBOX_STORAGE_BACKEND"] = "database"
+os.environ["RUNBOX_METRICS_ENABLED"] = "false"
+os.environ["RUNBOX_RUN_LOG_STORAGE"] = "filesystem"
+os.environ["RUNBOX_RUN_LOG_DIR"] = f"{_database_dir}/logs"
+
+import fakeredis  # noqa: E402
+import fakeredis.aioredis  # noqa: E402
+import pytest  # noqa: E402
+
+from src.core import redis as redis_clients  # noqa: E402
+from src.db.base import Base  # noqa: E402
+from src.db.session import async_engine, init_models  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+async def database():
+    """Fresh tables for every test; the engine is disposed as each test's event loop ends."""
+    await init_models()
+    yield
+    async with async_engine.begin() as connection:
+        for table in reversed(Base.metadata.sorted_tables):
+            await connection.execute(table.delete())
+    await async_engine.dispose()
+
+
+@pytest.fixture
+def redis(monkeypatch):
+    """fakeredis behind the API's Redis clients, shared by the sync and async ones."""
+    server = fakeredis.FakeServer()
+    client = fakeredis.FakeRedis(server=server, decode_responses=True)
+    async_client = fakeredis.aioredis.FakeRedis(server=server, decode_responses=True)
+    monkeypatch.setattr(redis_clients, "_redis", client)
+    monkeypatch.setattr(redis_clients, "_async_redis", async_client)
+    return client
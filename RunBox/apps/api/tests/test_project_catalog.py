@@ -0,0 +1,46 @@
+from src.repositories.projects import SqlProjectRepository
+from src.schemas.project import ProjectCreate, ProjectUpdate
+from src.services.projects import ProjectService
+
+
+def make_project(slug: str) -> ProjectCreate:
+    return ProjectCreate(
+        slug=slug, title=slug.title(), description="demo", language="python", status="published"
+    )
+
+
+async def test_revision_changes_on_every_write():
+    repository = SqlProjectRepository()
+    await repository.add(make_project("one").model_dump())
+    revisions = [await repository.revision()]
+    await repository.add(make_project("two").model_dump())
+    revisions.append(await repository.revision())
+    # Back-to-back updates land within the same second.
+    for title in ("One", "Uno"):
+        await repository.update("one", {"title": title})
+        revisions.append(await repository.revision())
+    await repository.delete("two")
+    revisions.append(await repository.revision())
+    assert len(set(revisions)) == len(revisions)
+
+
+async def test_catalog_sees_writes_from_other_processes():
+    # Two services over one database stand in for two API processes.
+    reader, writer = ProjectService(SqlProjectRepository()), ProjectService(SqlProjectRepository())
+    await writer.create(make_project("one"))
+
+    listing = await reader.list_response("published")
+    project = await reader.get_response("one")
+    assert listing == await reader.list_response("published")
+    assert (await writer.list_response("published")).etag == listing.etag
+
+    await writer.update("one", ProjectUpdate(title="Renamed"))
+    updated = await reader.list_response("published")
+    assert updated.etag != listing.etag
+    assert b"Renamed" in updated.body
+    assert b"Renamed" in (await reader.get_response("one")).body
+    assert (await reader.get_response("one")).etag != project.etag
+
+    await writer.delete("one")
+    assert await reader.get_response("one") is None
+    assert b"one" not in (await reader.list_response("published")).body
@@ -0,0 +1,121 @@
+from datetime import datetime, timedelta, timezone
+from uuid import uuid4
+
+import httpx
+
+from src.repositories.projects import SEED_PROJECTS, SqlProjectRepository
+from src.repositories.runs import (
+    RunFilters,
+    RunRecord,
+    SqlRunRepository,
+    decode_cursor,
+    encode_cursor,
+)
+from src.repositories.users import SEED_USERS, SqlUserRepository
+
+STARTED = datetime(2024, 3, 1, tzinfo=timezone.utc)
+
+
+def make_run(offset: int, **fields) -> RunRecord:
+    fields = {"status": "completed", "language": "python", **fields}
+    return RunRecord(id=str(uuid4()), started_at=STARTED + timedelta(seconds=offset), **fields)
+
+
+async def test_run_save_and_get():
+    repository = SqlRunRepository()
+    run = make_run(0, files=[{"name": "Main.py", "content": "print(1)"}], output="1", client="c1")
+    await repository.save(run)
+
+    stored = await repository.get(run.id)
+    assert stored is not None
+    assert (stored.status, stored.output, stored.client) == ("completed", "1", "c1")
+    assert stored.files == run.files
+
+    run.status = "failed"
+    await repository.save(run)
+    assert (await repository.get(run.id)).status == "failed"
+
+
+async def test_run_get_unknown_or_malformed_id():
+    repository = SqlRunRepository()
+    assert await repository.get(str(uuid4())) is None
+    assert await repository.get("not-a-uuid") is None
+
+
+async def test_run_keyset_pagination():
+    repository = SqlRunRepository()
+    runs = [make_run(offset) for offset in range(5)]
+    # Two runs share a start time; the id breaks the tie.
+    runs.append(make_run(2))
+    for run in runs:
+        await repository.save(run)
+    expected = sorted(runs, key=lambda run: (run.started_at, run.id), reverse=True)
+
+    seen, after = [], None
+    while True:
+        page = await repository.list_page(2, after, RunFilters())
+        seen.extend(run.id for run in page)
+        if len(page) < 2:
+            break
+        after = decode_cursor(encode_cursor(page[-1]))
+    assert seen == [run.id for run in expected]
+
+
+async def test_run_list_filters_and_prune():
+    repository = SqlRunRepository()
+    old = make_run(0, project_slug="demo")
+    recent = make_run(60, language="go")
+    for run in (old, recent):
+        await repository.save(run)
+
+    by_project = await repository.list_page(10, None, RunFilters(project_slug="demo"))
+    assert [run.id for run in by_project] == [old.id]
+    by_language = await repository.list_page(10, None, RunFilters(language="go"))
+    assert [run.id for run in by_language] == [recent.id]
+
+    assert await repository.prune(STARTED + timedelta(seconds=30)) == 1
+    assert await repository.get(old.id) is None
+
+
+async def test_project_crud():
+    repository = SqlProjectRepository()
+    project = await repository.add(
+        {"slug": "demo", "title": "Demo", "description": "A demo.", "language": "go"}
+    )
+    assert (await repository.get("demo")).id == project.id
+    assert [p.slug for p in await repository.list()] == ["demo"]
+
+    updated = await repository.update("demo", {"title": "Renamed"})
+    assert updated.title == "Renamed"
+    assert await repository.update("missing", {"title": "x"}) is None
+
+    assert await repository.delete("demo")
+    assert not await repository.delete("demo")
+    assert await repository.get("demo") is None
+
+
+async def test_user_add_list_delete():
+    repository = SqlUserRepository()
+    user = await repository.add("dev@runbox.dev", "admin")
+    assert [u.email for u in await repository.list()] == ["dev@runbox.dev"]
+    assert not await repository.delete("not-a-uuid")
+    assert await repository.delete(user.id)
+    assert await repository.list() == []
+
+
+async def test_seed_fills_empty_tables_once():
+    users, projects = SqlUserRepository(), SqlProjectRepository()
+    for _ in range(2):
+        await users.seed()
+        await projects.seed()
+    assert sorted(u.email for u in await users.list()) == sorted(e for e, _ in SEED_USERS)
+    assert [p.slug for p in await projects.list()] == [p["slug"] for p in SEED_PROJECTS]
+
+
+async def test_routes_return_404_for_malformed_ids():
+    from src.main import app
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        assert (await client.get("/api/runs/not-a-uuid")).status_code == 404
+        assert (await client.delete("/api/admin/users/not-a-uuid")).status_code == 404
@@ -0,0 +1,12 @@
+from src.services.result_cache import result_cache
+
+
+def test_release_keeps_another_runs_claim(redis):
+    assert result_cache.claim("key", "leader") is None
+    assert result_cache.claim("key", "follower") == "leader"
+
+    result_cache.release("key", "follower")
+    assert result_cache.claim("key", "other") == "leader"
+
+    result_cache.release("key", "leader")
+    assert result_cache.claim("key", "other") is None
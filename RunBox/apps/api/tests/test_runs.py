@@ -0,0 +1,110 @@
+import json
+from types import SimpleNamespace
+
+import httpx
+import pytest
+from starlette.requests import Request
+
+from src.core.config import settings
+from src.main import app
+from src.routes.runs import client_key
+from src.schemas.run import RunCreate
+from src.services import runs
+from src.services.logs import log_key
+from src.services.result_cache import result_cache
+
+
+@pytest.fixture
+async def client():
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        yield client
+
+
+@pytest.mark.parametrize("name", ["../x", "/etc/x", "a/../../x", "x\0", "x" * 256])
+async def test_runs_reject_file_names_outside_the_workspace(client, name):
+    files = [{"name": name, "content": "print('hi')\n"}]
+    response = await client.post("/api/runs/", json={"language": "python", "files": files})
+    assert response.status_code == 422
+    batch = {"language": "python", "files": files, "variants": [{}]}
+    assert (await client.post("/api/runs/batch", json=batch)).status_code == 422
+
+
+def new_run():
+    payload = RunCreate(language="python", files=[{"name": "Main.py", "content": "print(1)\n"}])
+    return runs.run_service._new_record(payload, "client")
+
+
+def follower_of(leader: str):
+    run = new_run()
+    run.cache_key, run.source_run_id = "key", leader
+    return run
+
+
+def test_follower_takes_the_cached_result_of_its_leader(redis):
+    run = follower_of("leader")
+    result_cache.claim("key", "leader")
+    runs.run_service._follow(run)
+    assert run.status == "queued"
+
+    result_cache.put("key", {"status": "completed", "output": "1\n", "error": None})
+    runs.run_service._follow(run)
+    assert (run.status, run.output, run.cache_hit) == ("completed", "1\n", True)
+
+
+def test_follower_runs_alone_once_its_leader_gave_up(redis, monkeypatch):
+    submitted = []
+    monkeypatch.setattr(runs, "submit_run", lambda job, *_: submitted.append(job["id"]))
+    # The leader was rejected, so its claim is gone and it never published a result.
+    run = follower_of("leader")
+    runs.run_service._follow(run)
+    assert submitted == [run.id] and run.source_run_id is None
+    assert result_cache.holder("key") == run.id
+
+
+@pytest.mark.parametrize(
+    ("proxies", "expected"),
+    [([], "10.0.0.2"), (["10.0.0.0/8"], "203.0.113.7"), (["*"], "203.0.113.7")],
+)
+def test_client_key_trusts_x_real_ip_only_from_trusted_proxies(monkeypatch, proxies, expected):
+    monkeypatch.setattr(settings, "trusted_proxies", proxies)
+    scope = {
+        "type": "http",
+        "headers": [(b"x-real-ip", b"203.0.113.7")],
+        "client": ("10.0.0.2", 5000),
+    }
+    assert client_key(Request(scope)) == expected
+
+
+def test_refresh_keeps_the_log_the_runner_offloaded(monkeypatch):
+    published = {"status": "completed", "output": "head ... tail", "log_bytes": 1 << 20}
+    result = SimpleNamespace(
+        state="SUCCESS", ready=lambda: True, successful=lambda: True, result=json.dumps(published)
+    )
+    monkeypatch.setattr(settings, "run_execution_mode", "celery")
+    monkeypatch.setattr(runs, "get_result", lambda run_id: result)
+    run = new_run()
+    runs.run_service._refresh(run)
+    assert (run.status, run.output) == ("completed", "head ... tail")
+    assert (run.logs_key, run.log_bytes) == (log_key(run.id), 1 << 20)
+
+
+async def test_batch_reports_timed_out_and_truncated_variants(client, monkeypatch):
+    monkeypatch.setattr(settings, "sandbox_timeout", 1)
+    monkeypatch.setattr(settings, "sandbox_output_limit", 1000)
+    source = (
+        "import sys, time\n"
+        "mode = sys.argv[1]\n"
+        "if mode == 'sleep':\n    time.sleep(10)\n"
+        "print('x' * (5000 if mode == 'flood' else 1))\n"
+    )
+    batch = {
+        "language": "python",
+        "files": [{"name": "Main.py", "content": source}],
+        "variants": [{"args": ["ok"]}, {"args": ["sleep"]}, {"args": ["flood"]}],
+        "parallelism": 3,
+    }
+    response = await client.post("/api/runs/batch", json=batch)
+    assert response.status_code == 202
+    flags = [(v["timed_out"], v["truncated"]) for v in response.json()["variant_results"]]
+    assert flags == [(False, False), (True, False), (False, True)]
@@ -133,7 +133,14 @@ export default function PlaygroundShell() {
         throw new Error(`Failed to start run (${response.status})`);
       }
 
-      const payload = (await response.json()) as RunResponse;
+      let payload = (await response.json()) as RunResponse;
+      while (payload.status === "queued" || payload.status === "running") {
+        const waitResponse = await fetch(`${endpoint}/${payload.id}/wait`, { cache: "no-store" });
+        if (!waitResponse.ok) {
+          throw new Error(`Failed to fetch run status (${waitResponse.status})`);
+        }
+        payload = (await waitResponse.json()) as RunResponse;
+      }
       const outputLines = payload.output ? payload.output.split(/\r?\n/).filter(Boolean) : [];
       if (outputLines.length === 0 && payload.error) {
         outputLines.push(payload.error);
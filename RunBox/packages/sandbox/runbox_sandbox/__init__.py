@@ -0,0 +1,161 @@
+"""
+Execution contract shared by the runner's backends and the API's inline LocalSandbox, so both
+report runs the same way: one result type, one set of capability flags, one failure taxonomy.
+Also the constants the API and the runner must agree on.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from pathlib import Path, PurePosixPath
+
+__all__ = [
+    "DONE_KEY",
+    "DONE_TTL",
+    "MAX_BATCH_VARIANTS",
+    "MAX_FILE_NAME",
+    "PENDING_KEY",
+    "STDIN_DIR",
+    "Capabilities",
+    "Limits",
+    "SandboxResult",
+    "check_file_name",
+    "configure",
+    "failure_cause",
+    "workspace_path",
+]
+
+# Batch variants read their stdin from files shipped with the workspace.
+STDIN_DIR = ".runbox-stdin"
+MAX_FILE_NAME = 255
+# The API caps batches at this many variants; the runner's batch time limits fit the largest.
+MAX_BATCH_VARIANTS = 100
+
+# A client's count of runs published to the runner queue and not finished yet, and the flag
+# that makes releasing a run's count idempotent: the worker releases it when the run ends, the
+# API when it reads the result, whichever comes first.
+PENDING_KEY = "runbox:scheduler:pending:{client}"
+DONE_KEY = "runbox:done:{run_id}"
+# As long as the runner keeps results.
+DONE_TTL = 24 * 3600
+
+
+def check_file_name(name: str) -> str:
+    """Reject submitted file names that are absolute, climb out with `..`, or are malformed."""
+    path = PurePosixPath(name)
+    if (
+        not name
+        or len(name) > MAX_FILE_NAME
+        or "\0" in name
+        or "\\" in name
+        or path.is_absolute()
+        or ".." in path.parts
+    ):
+        raise ValueError(f"invalid file name {name!r}")
+    return name
+
+
+def workspace_path(workspace: Path, name: str) -> Path:
+    """Where `name` is written under `workspace`; raises ValueError if it would land outside."""
+    root = workspace.resolve()
+    path = (root / check_file_name(name)).resolve()
+    if path == root or not path.is_relative_to(root):
+        raise ValueError(f"invalid file name {name!r}")
+    return path
+
+
+@dataclass(frozen=True)
+class Limits:
+    """The limits result messages quote; each service configures its own."""
+
+    timeout: float = 30
+    memory: str = "512m"
+    output_limit: int = 1024 * 1024
+
+
+_limits = Limits()
+
+
+def configure(timeout: float, memory: str, output_limit: int) -> None:
+    global _limits
+    _limits = Limits(timeout, memory, output_limit)
+
+
+def failure_cause(output: str) -> str | None:
+    """Classify a run's output by the failure prefix it starts with, if any."""
+    if output.startswith("Runner unavailable:"):
+        return "docker_unavailable"
+    if output.startswith("Runner failure: no "):
+        return "no_slot"
+    if output.startswith(("Runner failure: time limit", "Process timed out")):
+        return "timeout"
+    if output.startswith("Runner failure:"):
+        return "docker_error"
+    if output.startswith("Process killed: out of memory"):
+        return "oom_killed"
+    if not output.startswith("Process exited with code"):
+        return None
+    code = output.split("\n", 1)[0].rsplit(" ", 1)[-1]
+    # 128 and above are signals; None means the exec never reported one.
+    return "killed" if not code.isdigit() or int(code) >= 128 else "exit_code"
+
+
+@dataclass
+class SandboxResult:
+    """
+    Outcome of one sandboxed run, whatever the backend. `error` is set when the backend itself
+    failed and the program's outcome is unknown; otherwise `exit_code` is None only when the run
+    was killed, and signals are reported as 128 + signum.
+    """
+
+    exit_code: int | None = None
+    stdout: str = ""
+    stderr: str = ""
+    timed_out: bool = False
+    oom_killed: bool = False
+    truncated: bool = False
+    error: str | None = None
+
+    def failure_cause(self) -> str | None:
+        if self.error:
+            return failure_cause(self.error)
+        if self.timed_out:
+            return "timeout"
+        if self.oom_killed:
+            return "oom_killed"
+        if self.exit_code == 0:
+            return None
+        return "killed" if self.exit_code is None or self.exit_code >= 128 else "exit_code"
+
+    @property
+    def kill_reason(self) -> str | None:
+        if self.timed_out:
+            return f"Process timed out after {_limits.timeout}s"
+        if self.oom_killed:
+            return f"Process killed: out of memory ({_limits.memory} limit)"
+        return None
+
+    @property
+    def output(self) -> str:
+        """Combined output as reported to clients, headed by the failure if there was one."""
+        if self.error:
+            return self.error
+        combined = self.stdout + self.stderr
+        if self.truncated:
+            combined += f"\n[output truncated at {_limits.output_limit} bytes per stream]"
+        if self.kill_reason:
+            return f"{self.kill_reason}\n{combined}"
+        if self.exit_code != 0:
+            return f"Process exited with code {self.exit_code}\n{combined}"
+        return combined
+
+
+@dataclass(frozen=True)
+class Capabilities:
+    # `stream` forwards output to the publisher while the run is in progress (rather than after).
+    streaming: bool = False
+    # `run` and `stream` accept a stdin source.
+    stdin: bool = False
+    # Runs are confined to the service's CPU/memory limits with networking disabled.
+    limits: bool = False
+    # `run_batch` builds once and shares the build across variants.
+    batch: bool = False
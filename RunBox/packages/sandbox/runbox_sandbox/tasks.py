@@ -0,0 +1,77 @@
+"""
+Runner task conventions the API and the runner must agree on: the serializer results are
+stored with, the time limits a batch is given, and how large outputs are offloaded to the log
+store.
+"""
+from __future__ import annotations
+
+import gzip
+import json
+
+__all__ = [
+    "GZIP_MAGIC",
+    "LOG_GZIP_LEVEL",
+    "RESULT_SERIALIZER",
+    "batch_time_limits",
+    "dumps_result",
+    "loads_result",
+    "log_preview",
+    "register_result_serializer",
+]
+
+# Celery 5.3's Redis backend ignores `result_compression`, so results are gzipped by a
+# serializer instead. Decoding also accepts plain JSON, so readers can register it
+# unconditionally and read results from runners with compression disabled the same way.
+RESULT_SERIALIZER = "json-gzip"
+GZIP_MAGIC = b"\x1f\x8b"
+# Offloaded run logs are stored gzipped at this level.
+LOG_GZIP_LEVEL = 6
+
+
+def dumps_result(value: object) -> bytes:
+    return gzip.compress(json.dumps(value).encode(), compresslevel=6)
+
+
+def loads_result(payload: bytes | str) -> object:
+    if isinstance(payload, str):
+        payload = payload.encode()
+    if payload[:2] == GZIP_MAGIC:
+        payload = gzip.decompress(payload)
+    return json.loads(payload)
+
+
+def register_result_serializer() -> None:
+    """Register `RESULT_SERIALIZER` with kombu; both services have it through Celery."""
+    from kombu.serialization import register
+
+    register(
+        RESULT_SERIALIZER,
+        dumps_result,
+        loads_result,
+        content_type="application/x-runbox-json-gzip",
+        content_encoding="binary",
+    )
+
+
+def batch_time_limits(
+    variants: int,
+    parallelism: int,
+    sandbox_timeout: int,
+    slot_wait_timeout: int,
+    grace: int,
+) -> tuple[int, int]:
+    """
+    Soft and hard limits for `runner.execute_batch`: the slot wait, the build and a
+    `sandbox_timeout` per round of `parallelism` variants, plus `grace` for cleanup.
+    """
+    rounds = -(-variants // max(parallelism, 1))
+    soft = slot_wait_timeout + (1 + rounds) * sandbox_timeout
+    return soft, soft + grace
+
+
+def log_preview(data: bytes, span: int) -> str:
+    """Head and tail of an offloaded log, kept inline in its place."""
+    head = data[:span].decode(errors="ignore")
+    tail = data[-span:].decode(errors="ignore")
+    omitted = len(data) - 2 * span
+    return f"{head}\n... [{omitted} bytes omitted, see /logs] ...\n{tail}"
@@ -0,0 +1,54 @@
+"""
+Startup cost of each execution backend.
+
+    cd services/runner
+    python -m benchmarks.backend_startup [--backend process] [--runs 5]
+
+Reports the median wall time per backend for a hello-world program and for a no-op command,
+which is the backend's own startup cost. Backends unavailable here (e.g. no Docker daemon) are
+skipped. The contract itself is checked by `tests/test_backend_conformance.py`.
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import statistics
+import time
+
+os.environ.setdefault("RUNBOX_METRICS_PORT", "0")
+
+from src.backends import BACKENDS, backend_factory  # noqa: E402
+
+HELLO = [{"name": "Main.py", "content": "print('hello')\n"}]
+
+
+def time_backend(backend, runs: int) -> None:
+    probe = backend.run("python", HELLO, None, None)
+    if probe.error:
+        print(f"{backend.name:<10} unavailable: {probe.error.splitlines()[0][:120]}")
+        return
+    for label, files, run_cmd in (("hello", HELLO, None), ("no-op", [], ":")):
+        samples = []
+        for _ in range(runs):
+            started = time.perf_counter()
+            backend.run("python", files, None, run_cmd)
+            samples.append((time.perf_counter() - started) * 1000)
+        print(f"{backend.name:<10} {label:<6} p50 {statistics.median(samples):.1f} ms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--backend", action="append", choices=sorted(BACKENDS))
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    for name in args.backend or BACKENDS:
+        backend = backend_factory(name)()
+        try:
+            time_backend(backend, args.runs)
+        finally:
+            backend.close()
+
+
+if __name__ == "__main__":
+    main()
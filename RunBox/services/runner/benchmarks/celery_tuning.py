@@ -0,0 +1,190 @@
+"""
+Benchmark Celery tuning against a mix of short and long jobs.
+
+    cd services/runner
+    python -m benchmarks.celery_tuning [--jobs 200] [--long-ratio 0.1] [--workers 2]
+
+Publishes jobs at `--load` of the workers' capacity (Poisson arrivals) to `--workers` in-process
+workers (threads pool, in-memory broker) under three configurations: Celery's defaults
+(prefetch x4, early acks, JSON results), the runner's `celery_config()`, and the same with long
+jobs routed to their own queue served by a dedicated worker. Jobs sleep instead of running
+sandboxes, so the numbers isolate scheduling: throughput and submit-to-finish latency
+percentiles per job class, plus stored result sizes.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import statistics
+import threading
+import time
+from contextlib import ExitStack
+
+from celery import Celery
+from celery.contrib.testing.worker import start_worker
+from kombu.serialization import dumps
+from kombu.transport import memory
+
+from src.celeryconfig import RESULT_SERIALIZER, celery_config
+from src.config import settings
+
+
+class PromptMemoryTransport(memory.Transport):
+    """
+    The in-memory transport, draining in short slices. Celery runs acks from pool threads on
+    the consumer loop between drains, which the Redis transport's event loop does promptly but
+    the default 2 s drain here would delay, understating late acks.
+    """
+
+    def drain_events(self, connection, timeout=None):
+        return super().drain_events(connection, timeout=0.01)
+
+
+QUEUE = settings.runner_queue_name
+LONG_QUEUE = f"{QUEUE}.long"
+BROKER = {
+    "broker_url": "memory://",
+    "broker_transport": PromptMemoryTransport,
+    "result_backend": "cache+memory://",
+    "broker_transport_options": {"polling_interval": 0.005},
+    "broker_connection_retry_on_startup": True,
+}
+DEFAULTS = {
+    "task_default_queue": QUEUE,
+    "worker_prefetch_multiplier": 4,
+    "task_acks_late": False,
+    "result_serializer": "json",
+}
+
+
+class Scenario:
+    def __init__(self, name: str, config: dict, dedicated_long_queue: bool = False) -> None:
+        self.name = name
+        self.config = {**config, **BROKER}
+        self.dedicated_long_queue = dedicated_long_queue
+
+    def queues(self, worker: int, workers: int) -> list[str]:
+        if not self.dedicated_long_queue or workers == 1:
+            return [QUEUE, LONG_QUEUE] if self.dedicated_long_queue else [QUEUE]
+        return [LONG_QUEUE] if worker == 0 else [QUEUE]
+
+
+def scenarios() -> list[Scenario]:
+    tuned = {**celery_config(), "task_queues": None}
+    return [
+        Scenario("defaults", DEFAULTS),
+        Scenario("tuned", tuned),
+        Scenario("tuned+queues", tuned, dedicated_long_queue=True),
+    ]
+
+
+def percentile(samples: list[float], pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def run_scenario(scenario: Scenario, args: argparse.Namespace, jobs: list[bool]) -> dict:
+    submitted: dict[int, float] = {}
+    finished: dict[int, float] = {}
+    done = threading.Event()
+    output = "x" * args.output_bytes
+
+    def job(index: int, seconds: float) -> str:
+        time.sleep(seconds)
+        finished[index] = time.monotonic()
+        if len(finished) == len(jobs):
+            done.set()
+        return json.dumps({"output": output, "status": "completed"})
+
+    with ExitStack() as stack:
+        for worker in range(args.workers):
+            app = Celery(f"bench-{scenario.name}-{worker}")
+            app.conf.update(scenario.config)
+            # Not shared: each scenario's apps must run their own `job` closure.
+            app.task(name="bench.job", shared=False)(job)
+            stack.enter_context(
+                start_worker(
+                    app,
+                    pool="threads",
+                    concurrency=args.concurrency,
+                    queues=scenario.queues(worker, args.workers),
+                    perform_ping_check=False,
+                    loglevel="WARNING",
+                )
+            )
+        producer = Celery("bench-producer")
+        producer.conf.update(scenario.config)
+        mean_ms = args.long_ratio * args.long_ms + (1 - args.long_ratio) * args.short_ms
+        rate = args.load * args.workers * args.concurrency * 1000 / mean_ms
+        arrivals = random.Random(args.seed)
+        started = time.monotonic()
+        for index, long in enumerate(jobs):
+            seconds = (args.long_ms if long else args.short_ms) / 1000
+            queue = LONG_QUEUE if long and scenario.dedicated_long_queue else QUEUE
+            submitted[index] = time.monotonic()
+            producer.send_task("bench.job", args=[index, seconds], queue=queue)
+            time.sleep(arrivals.expovariate(rate))
+        if not done.wait(args.timeout):
+            raise SystemExit(f"{scenario.name}: {len(finished)}/{len(jobs)} jobs after timeout")
+        elapsed = time.monotonic() - started
+
+    report = {"elapsed_s": round(elapsed, 3), "jobs_per_s": round(len(jobs) / elapsed, 1)}
+    for label, kind in (("short", False), ("long", True)):
+        samples = [
+            (finished[index] - submitted[index]) * 1000
+            for index, long in enumerate(jobs)
+            if long == kind
+        ]
+        if samples:
+            report[label] = {
+                "p50_ms": round(statistics.median(samples), 1),
+                "p95_ms": round(percentile(samples, 95), 1),
+                "p99_ms": round(percentile(samples, 99), 1),
+            }
+    return report
+
+
+def result_sizes(output_bytes: int) -> dict:
+    """Bytes stored in the result backend for one run result, per result serializer."""
+    lines = "\n".join(f"step {n}: compiling module_{n % 40}.py" for n in range(output_bytes // 32))
+    result = json.dumps({"output": lines[:output_bytes], "status": "completed"})
+    meta = {"status": "SUCCESS", "result": result, "traceback": None, "children": []}
+    return {name: len(dumps(meta, serializer=name)[2]) for name in ("json", RESULT_SERIALIZER)}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--jobs", type=int, default=200)
+    parser.add_argument("--long-ratio", type=float, default=0.1)
+    parser.add_argument("--short-ms", type=int, default=20)
+    parser.add_argument("--long-ms", type=int, default=1000)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--concurrency", type=int, default=2)
+    parser.add_argument("--load", type=float, default=0.7, help="offered load, 0-1 of capacity")
+    parser.add_argument("--output-bytes", type=int, default=64 * 1024)
+    parser.add_argument("--timeout", type=float, default=300)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    jobs = [rng.random() < args.long_ratio for _ in range(args.jobs)]
+    print(
+        f"{args.jobs} jobs ({sum(jobs)} long x {args.long_ms} ms, rest {args.short_ms} ms), "
+        f"{args.workers} workers x {args.concurrency} threads"
+    )
+    for scenario in scenarios():
+        report = run_scenario(scenario, args, jobs)
+        classes = "  ".join(
+            f"{label} p50 {report[label]['p50_ms']:.0f} p95 {report[label]['p95_ms']:.0f} "
+            f"p99 {report[label]['p99_ms']:.0f} ms"
+            for label in ("short", "long")
+            if label in report
+        )
+        print(f"{scenario.name:<13} {report['jobs_per_s']:>6.1f} jobs/s  {classes}")
+    sizes = result_sizes(args.output_bytes)
+    print("result bytes  " + "  ".join(f"{name} {size}" for name, size in sizes.items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Benchmark Python startup through the fork server against `python Main.py`.
+
+    cd services/runner
+    python -m benchmarks.forkserver [--runs 50]
+
+Starts `src/forkserver/server.py` locally with `RUNBOX_FORKSERVER_PRELOAD`, then times
+wall-clock runs of each program as a subprocess: plain `python Main.py`, and the runner's
+fork-server command (the client relaying to the server). Outputs of both paths must match,
+including a program that mutates module, environment and working-directory state, which must not
+leak into the next run. No Docker needed; inside a container the same commands run as execs.
+"""
+from __future__ import annotations
+
+import argparse
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from src import forkserver
+from src.config import settings
+from src.forkserver.server import address
+
+PROGRAMS = {
+    "hello": "print('hello')\n",
+    "stdlib": (
+        "import collections, dataclasses, datetime, decimal, json, re, typing\n"
+        "counts = collections.Counter(re.findall(r'\\w+', 'a b a c b a'))\n"
+        "print(json.dumps(counts.most_common(2)), decimal.Decimal('1.1') * 3)\n"
+    ),
+    "isolation": (
+        "import json, os, sys\n"
+        "print(getattr(json, 'leaked', None), os.environ.get('LEAKED'), sorted(os.listdir('.')))\n"
+        "json.leaked = True\n"
+        "os.environ['LEAKED'] = '1'\n"
+        "open('stray.txt', 'w').close()\n"
+        "sys.exit(3)\n"
+    ),
+    "traceback": "def fail():\n    raise ValueError('boom')\n\nfail()\n",
+}
+
+
+def percentile(samples: list[float], pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def fresh_workspace(root: Path, source: str) -> Path:
+    """A clean /workspace per run, as the container pool's reset leaves it."""
+    workspace = root / "workspace"
+    shutil.rmtree(workspace, ignore_errors=True)
+    workspace.mkdir()
+    (workspace / "Main.py").write_text(source)
+    return workspace
+
+
+def time_runs(command: list[str], root: Path, source: str, runs: int) -> tuple[list[float], set]:
+    samples, outputs = [], set()
+    for _ in range(runs):
+        workspace = fresh_workspace(root, source)
+        started = time.perf_counter()
+        done = subprocess.run(command, cwd=workspace, capture_output=True, text=True)
+        samples.append((time.perf_counter() - started) * 1000)
+        outputs.add((done.returncode, done.stdout, done.stderr))
+    return samples, outputs
+
+
+def start_server(root: Path) -> subprocess.Popen:
+    server_dir = root / "server"
+    server_dir.mkdir()
+    server = Path(forkserver.__file__).with_name("server.py")
+    shutil.copy(Path(forkserver.__file__).with_name("client.py"), server_dir / "forkclient.py")
+    process = subprocess.Popen(
+        [sys.executable, str(server), str(server_dir), *settings.forkserver_preload]
+    )
+    # Listening abstract sockets show up in /proc/net/unix with a leading "@".
+    listening = "@" + address(str(server_dir))[1:]
+    deadline = time.monotonic() + 10
+    while listening not in Path("/proc/net/unix").read_text().split():
+        if time.monotonic() > deadline or process.poll() is not None:
+            process.kill()
+            raise SystemExit("fork server did not start")
+        time.sleep(0.01)
+    return process
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        server = start_server(root)
+        client = str(root / "server" / "forkclient.py")
+        commands = {
+            "python Main.py": [sys.executable, "Main.py"],
+            "fork server": [sys.executable, "-I", "-S", client, "Main.py"],
+        }
+        try:
+            print(f"{args.runs} runs each, preloading {len(settings.forkserver_preload)} modules")
+            for program, source in PROGRAMS.items():
+                results = {
+                    name: time_runs(command, root, source, args.runs)
+                    for name, command in commands.items()
+                }
+                outputs = [outputs for _, outputs in results.values()]
+                if len(outputs[0]) != 1 or outputs[0] != outputs[1]:
+                    raise SystemExit(f"{program}: outputs differ: {outputs}")
+                for name, (samples, _) in results.items():
+                    mean, p50 = statistics.mean(samples), statistics.median(samples)
+                    print(
+                        f"{program:<10} {name:<15} mean {mean:6.1f}  p50 {p50:6.1f}  "
+                        f"p95 {percentile(samples, 95):6.1f} ms"
+                    )
+        finally:
+            server.kill()
+
+
+if __name__ == "__main__":
+    main()
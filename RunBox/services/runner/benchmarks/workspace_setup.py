@@ -0,0 +1,117 @@
+"""
+Micro-benchmark for workspace materialization.
+
+    cd services/runner
+    python -m benchmarks.workspace_setup [--runs 20]
+
+Always times tarball bundling; when a Docker daemon is reachable it also counts Docker API
+requests and latency per run for the legacy flow (mkdir exec + put_archive + command exec)
+against the current one (working_dir at create, workspace inlined into the command exec).
+"""
+from __future__ import annotations
+
+import argparse
+import io
+import statistics
+import tarfile
+import time
+
+from docker.errors import DockerException
+
+from src.accounting import RunUsage
+from src.config import settings
+from src.docker_runner import IMAGE_MAP, DockerSandbox
+
+FILES = [
+    {"name": "Main.py", "content": "from util import greet\n\nprint(greet('bench'))\n"},
+    {"name": "util.py", "content": "def greet(name):\n    return f'hello {name}'\n" * 20},
+]
+
+
+def legacy_bundle(files: list[dict[str, str]]) -> bytes:
+    tar_stream = io.BytesIO()
+    with tarfile.open(fileobj=tar_stream, mode="w") as tar:
+        for file in files:
+            data = file["content"].encode()
+            tarinfo = tarfile.TarInfo(name=file["name"])
+            tarinfo.size = len(data)
+            tar.addfile(tarinfo, io.BytesIO(data))
+    tar_stream.seek(0)
+    return tar_stream.read()
+
+
+def time_it(fn, runs: int) -> tuple[float, float]:
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples), max(samples)
+
+
+class RequestCounter:
+    def __init__(self, api) -> None:
+        self.calls = 0
+        self._request = api.request
+        api.request = self
+
+    def __call__(self, *args, **kwargs):
+        self.calls += 1
+        return self._request(*args, **kwargs)
+
+
+def bench_bundling(sandbox: DockerSandbox, runs: int) -> None:
+    files = FILES * 50
+    legacy = time_it(lambda: legacy_bundle(files), runs)
+    current = time_it(lambda: sandbox._bundle_files(files).getbuffer(), runs)
+    print(f"bundle  legacy  median {legacy[0]:.3f} ms  max {legacy[1]:.3f} ms")
+    print(f"bundle  current median {current[0]:.3f} ms  max {current[1]:.3f} ms")
+
+
+def bench_docker(sandbox: DockerSandbox, runs: int) -> None:
+    client = sandbox.get_client()
+    client.ping()
+    counter = RequestCounter(client.api)
+    image = IMAGE_MAP["python"]
+    command = "/bin/sh -lc 'cd /workspace && python Main.py'"
+
+    def legacy_run(container) -> None:
+        container.exec_run("mkdir -p /workspace")
+        container.put_archive(path="/workspace", data=legacy_bundle(FILES))
+        container.exec_run(command)
+
+    def current_run(container) -> None:
+        command = sandbox._prepare_workspace(
+            container, "python", image, FILES, None, None, RunUsage()
+        )
+        container.exec_run(command)
+
+    for name, flow in (("legacy", legacy_run), ("current", current_run)):
+        pooled = sandbox.pool._create("python", image)
+        try:
+            counter.calls = 0
+            latency = time_it(lambda: flow(pooled.container), runs)
+            print(
+                f"docker  {name:<7} {counter.calls / runs:.1f} API calls/run  "
+                f"median {latency[0]:.1f} ms  max {latency[1]:.1f} ms"
+            )
+        finally:
+            sandbox.pool._destroy(pooled)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args()
+
+    settings.artifact_cache_enabled = False
+    sandbox = DockerSandbox()
+    bench_bundling(sandbox, args.runs)
+    try:
+        bench_docker(sandbox, args.runs)
+    except DockerException as exc:
+        print(f"docker  skipped: {exc}")
+
+
+if __name__ == "__main__":
+    main()
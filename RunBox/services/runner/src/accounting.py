@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Iterator
+
+from docker.errors import DockerException
+
+from .config import settings
+
+
+@dataclass
+class RunUsage:
+    """
+    Per-run resource accounting. Phases are wall-clock; CPU and I/O are deltas of the
+    container's cgroup counters (via the Docker stats API) across the run, so they stay
+    per-run on pooled containers. Memory is the run's peak, see `StatsSampler`.
+    """
+
+    queue_ms: int | None = None
+    setup_ms: int | None = None
+    build_ms: int | None = None
+    exec_ms: int | None = None
+    cpu_user_ms: int | None = None
+    cpu_system_ms: int | None = None
+    peak_memory_kb: int | None = None
+    io_write_bytes: int | None = None
+    output_bytes: int | None = None
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            elapsed = int((time.monotonic() - started) * 1000)
+            setattr(self, name, (getattr(self, name) or 0) + elapsed)
+
+    def apply_stats(
+        self, before: dict | None, after: dict | None, sampled_peak: int | None = None
+    ) -> None:
+        """
+        Record the deltas between two stats samples of one container. `sampled_peak` is the
+        highest memory usage seen in between, for when the cgroup's own peak is not this run's.
+        """
+        if not before or not after:
+            return
+        cpu_before = before.get("cpu_stats", {}).get("cpu_usage", {})
+        cpu_after = after.get("cpu_stats", {}).get("cpu_usage", {})
+        # A counter missing from either sample is unreported, not zero: a one-sided delta
+        # would be the container's lifetime total.
+        if "usage_in_usermode" in cpu_before and "usage_in_usermode" in cpu_after:
+            user_ns = cpu_after["usage_in_usermode"] - cpu_before["usage_in_usermode"]
+            self.cpu_user_ms = user_ns // 1_000_000
+        if "usage_in_kernelmode" in cpu_before and "usage_in_kernelmode" in cpu_after:
+            system_ns = cpu_after["usage_in_kernelmode"] - cpu_before["usage_in_kernelmode"]
+            self.cpu_system_ms = system_ns // 1_000_000
+
+        peak_before = before.get("memory_stats", {}).get("max_usage")
+        peak_after = after.get("memory_stats", {}).get("max_usage")
+        if peak_after and peak_after > (peak_before or 0):
+            # The container's lifetime peak (cgroup v1) rose during this run, so it is this run's.
+            peak = peak_after
+        else:
+            peak = max(
+                (value for value in (sampled_peak, _memory_usage(after)) if value is not None),
+                default=None,
+            )
+        if peak is not None:
+            self.peak_memory_kb = peak // 1024
+        self.io_write_bytes = _written(after) - _written(before)
+
+
+def _memory_usage(stats: dict | None) -> int | None:
+    return (stats or {}).get("memory_stats", {}).get("usage")
+
+
+def _written(stats: dict) -> int:
+    # Cumulative, and omitted until the container first writes, so a missing entry is zero.
+    entries = (stats.get("blkio_stats") or {}).get("io_service_bytes_recursive") or []
+    return sum(entry.get("value", 0) for entry in entries if entry.get("op", "").lower() == "write")
+
+
+def container_stats(container) -> dict | None:
+    if not settings.resource_accounting:
+        return None
+    try:
+        return container.stats(stream=False, one_shot=True)
+    except DockerException:
+        return None
+
+
+class StatsSampler:
+    """
+    Stats of one container across a run. Takes the `before` sample when created; inside
+    `sampling()` blocks it also polls memory usage every `resource_sample_interval` seconds.
+    A pooled container's cgroup peak covers its whole life (and cgroup v2 reports none), so
+    unless the run raised that peak, the run's peak is the highest usage sampled.
+    """
+
+    def __init__(self, container) -> None:
+        self._container = container
+        self._before = container_stats(container)
+        self._peak = _memory_usage(self._before)
+
+    def _poll(self, stop: threading.Event) -> None:
+        while not stop.wait(settings.resource_sample_interval):
+            usage = _memory_usage(container_stats(self._container))
+            if usage is not None:
+                self._peak = max(self._peak or 0, usage)
+
+    @contextmanager
+    def sampling(self) -> Iterator[None]:
+        if self._before is None or settings.resource_sample_interval <= 0:
+            yield
+            return
+        stop = threading.Event()
+        poller = threading.Thread(target=self._poll, args=(stop,), daemon=True)
+        poller.start()
+        try:
+            yield
+        finally:
+            stop.set()
+            poller.join()
+
+    def apply(self, usage: RunUsage) -> None:
+        """Take the `after` sample and record the run's CPU, memory and I/O in `usage`."""
+        if self._before is not None:
+            usage.apply_stats(self._before, container_stats(self._container), self._peak)
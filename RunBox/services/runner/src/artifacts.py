@@ -0,0 +1,117 @@
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+import time
+from contextlib import suppress
+from pathlib import Path
+
+import orjson
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+COMPILE_COMMAND = {
+    "go": "go build -o Main Main.go",
+    "rust": "rustc Main.rs",
+}
+ARTIFACT_NAME = "Main"
+# Other workers share the store, so the running size total is re-checked on disk this often.
+RESCAN_INTERVAL = 60
+
+
+class ArtifactCache:
+    """
+    Content-addressed store of compiled binaries keyed by source hash and toolchain image id.
+    Entries live on local disk; the least recently used ones (by mtime) are evicted once the
+    store grows past `artifact_cache_max_bytes`. The store's size is tracked as a running total
+    and only rescanned when that total crosses the limit or goes stale.
+    """
+
+    def __init__(self, root: str) -> None:
+        self._root = Path(root)
+        self._lock = threading.Lock()
+        self._size = 0
+        self._scanned_at: float | None = None
+
+    def key(self, language: str, image_id: str, files: list[dict[str, str]]) -> str:
+        normalized = {
+            "language": language,
+            "image": image_id,
+            "compile": COMPILE_COMMAND[language],
+            "files": sorted((file["name"], file["content"]) for file in files),
+        }
+        return hashlib.sha256(orjson.dumps(normalized)).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self._root / key[:2] / key
+
+    def get(self, key: str) -> bytes | None:
+        path = self._path(key)
+        try:
+            data = path.read_bytes()
+        except OSError:
+            return None
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            # Evicted since the read; the data is still good for this run.
+            pass
+        return data
+
+    def put(self, key: str, data: bytes) -> None:
+        if len(data) > settings.artifact_max_entry_bytes:
+            return
+        path = self._path(key)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            # A private temp file per writer: concurrent workers may store the same key.
+            fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as file:
+                    file.write(data)
+                os.replace(tmp, path)
+            except BaseException:
+                with suppress(FileNotFoundError):
+                    os.unlink(tmp)
+                raise
+        except OSError as exc:
+            logger.warning("Could not store build artifact %s: %s", key, exc)
+            return
+        with self._lock:
+            self._size += len(data)
+            stale = (
+                self._scanned_at is None or time.monotonic() - self._scanned_at > RESCAN_INTERVAL
+            )
+            if stale or self._size > settings.artifact_cache_max_bytes:
+                self._evict()
+
+    def _evict(self) -> None:
+        """Rescan the store and drop the oldest entries past the limit; holds `_lock`."""
+        entries = []
+        total = 0
+        for path in self._root.glob("*/*"):
+            if path.suffix == ".tmp":
+                continue
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                # Evicted by another worker mid-scan.
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+        if total > settings.artifact_cache_max_bytes:
+            for _, size, path in sorted(entries):
+                path.unlink(missing_ok=True)
+                total -= size
+                if total <= settings.artifact_cache_max_bytes:
+                    break
+        self._size = total
+        self._scanned_at = time.monotonic()
+
+
+artifact_cache = ArtifactCache(settings.artifact_cache_dir)
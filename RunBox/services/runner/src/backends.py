@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+import importlib
+from typing import Callable, Iterable, Protocol
+
+from runbox_sandbox import Capabilities, SandboxResult, configure
+
+from .accounting import RunUsage
+from .config import settings
+from .streaming import OutputPublisher
+
+DEFAULT_RUN_COMMAND = {
+    "python": "python Main.py",
+    "node": "node Main.mjs",
+    "go": "go run Main.go",
+    "rust": "rustc Main.rs && ./Main",
+}
+
+configure(settings.sandbox_timeout, settings.sandbox_memory, settings.sandbox_output_limit)
+
+
+class ExecutionBackend(Protocol):
+    """
+    What the worker needs from a sandbox implementation. Every backend honours
+    `sandbox_timeout` and `sandbox_output_limit` and returns `SandboxResult`s; `capabilities`
+    says what else it provides.
+    """
+
+    name: str
+    capabilities: Capabilities
+
+    def run(
+        self,
+        language: str,
+        files: list[dict[str, str]],
+        build_cmd: str | None,
+        run_cmd: str | None,
+        env: dict[str, str] | None = None,
+        stdin: Iterable[bytes] | None = None,
+        usage: RunUsage | None = None,
+    ) -> SandboxResult: ...
+
+    def stream(
+        self,
+        language: str,
+        files: list[dict[str, str]],
+        build_cmd: str | None,
+        run_cmd: str | None,
+        publisher: OutputPublisher,
+        env: dict[str, str] | None = None,
+        stdin: Iterable[bytes] | None = None,
+        usage: RunUsage | None = None,
+    ) -> SandboxResult: ...
+
+    def run_batch(
+        self,
+        language: str,
+        files: list[dict[str, str]],
+        build_cmd: str | None,
+        run_cmd: str | None,
+        variants: list[dict],
+        parallelism: int = 1,
+        env: dict[str, str] | None = None,
+        usage: RunUsage | None = None,
+    ) -> dict: ...
+
+    def start(self) -> None:
+        """Per worker process, after the pool forks (e.g. pre-start containers)."""
+
+    def close(self) -> None:
+        """Release held resources, e.g. before worker processes fork."""
+
+    def stats(self) -> dict: ...
+
+
+# Imported lazily, so a backend's dependencies (the Docker SDK) are only needed when selected.
+BACKENDS: dict[str, str] = {
+    "docker": "docker_runner:DockerSandbox",
+    "namespace": "namespace_runner:NamespaceSandbox",
+    "process": "process_runner:ProcessSandbox",
+}
+
+
+def register_backend(name: str, target: str) -> None:
+    """Add a backend as `module:Class`, relative to this package or absolute."""
+    BACKENDS[name] = target
+
+
+def backend_factory(name: str) -> Callable[[], ExecutionBackend]:
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown sandbox backend {name!r}; expected one of {sorted(BACKENDS)}")
+    module, _, attr = BACKENDS[name].partition(":")
+    if "." not in module:
+        module = f"{__package__}.{module}"
+    return getattr(importlib.import_module(module), attr)
+
+
+_backend: ExecutionBackend | None = None
+
+
+def get_backend() -> ExecutionBackend:
+    """The backend selected by `sandbox_backend`, created once per process."""
+    global _backend
+    if _backend is None:
+        _backend = backend_factory(settings.sandbox_backend)()
+    return _backend
@@ -0,0 +1,64 @@
+from __future__ import annotations
+
+from kombu import Exchange, Queue
+
+from runbox_sandbox import MAX_BATCH_VARIANTS
+from runbox_sandbox import tasks as shared
+from runbox_sandbox.tasks import RESULT_SERIALIZER
+
+from .config import Settings, settings
+
+shared.register_result_serializer()
+
+
+def runner_queues(config: Settings = settings) -> list[str]:
+    """The default queue followed by one `<queue>.<language>` queue per `language_queues` entry."""
+    name = config.runner_queue_name
+    return [name, *(f"{name}.{language}" for language in config.language_queues)]
+
+
+def task_time_limits(config: Settings = settings) -> tuple[int, int]:
+    """
+    Soft and hard limits for `runner.execute`. The soft limit defaults to the longest a healthy
+    run can take (slot wait, build and run); the hard limit adds a grace period for cleanup.
+    """
+    soft = config.task_soft_time_limit or config.slot_wait_timeout + 2 * config.sandbox_timeout
+    return soft, soft + config.task_time_limit_grace
+
+
+def batch_time_limits(
+    variants: int = MAX_BATCH_VARIANTS, parallelism: int = 1, config: Settings = settings
+) -> tuple[int, int]:
+    """
+    Limits for `runner.execute_batch` from this runner's settings. The API sends limits with
+    each batch; the task's own, for messages without them, fit the largest batch.
+    """
+    return shared.batch_time_limits(
+        variants,
+        parallelism,
+        config.sandbox_timeout,
+        config.slot_wait_timeout,
+        config.task_time_limit_grace,
+    )
+
+
+def celery_config(config: Settings = settings) -> dict:
+    hard_limit = max(task_time_limits(config)[1], batch_time_limits(config=config)[1])
+    return {
+        "task_default_queue": config.runner_queue_name,
+        "task_queues": [
+            Queue(name, Exchange(name), routing_key=name)
+            for name in config.worker_queues or runner_queues(config)
+        ],
+        "task_track_started": True,
+        "task_acks_late": config.task_acks_late,
+        # With late acks, a run whose worker process died is requeued rather than failed.
+        "task_reject_on_worker_lost": config.task_acks_late,
+        "worker_prefetch_multiplier": config.worker_prefetch_multiplier,
+        "worker_pool": config.worker_pool,
+        "result_serializer": RESULT_SERIALIZER if config.result_compression else "json",
+        "result_accept_content": ["json", RESULT_SERIALIZER],
+        "result_expires": config.result_expires,
+        # Redis redelivers unacked messages after this long, so it must outlast any run.
+        "broker_transport_options": {"visibility_timeout": max(3600, 2 * hard_limit)},
+    }
@@ -1,15 +1,113 @@
 from functools import lru_cache
 
+from pydantic import Field
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
 class Settings(BaseSettings):
     redis_url: str = "redis://redis:6379/0"
-    queue_name: str = "runbox-runs"
+    runner_queue_name: str = "runbox-runs"
     docker_host: str = "unix://var/run/docker.sock"
+    # Execution backend (see backends.BACKENDS): "docker", "namespace" or "process" (no
+    # isolation, dev only).
+    sandbox_backend: str = "docker"
     sandbox_timeout: int = 30
     sandbox_cpus: float = 0.5
     sandbox_memory: str = "512m"
+    # Captured bytes kept per stream (stdout, stderr) of a non-streamed run; the rest is dropped.
+    sandbox_output_limit: int = 1024 * 1024
+    sandbox_pids_limit: int = 128
+    sandbox_nofile_limit: int = 256
+    # Largest file a run may write (RLIMIT_FSIZE).
+    sandbox_fsize_limit: int = 64 * 1024 * 1024
+    # Size of the sandbox's /tmp tmpfs; the rest of its root filesystem is read-only.
+    sandbox_tmp_size: str = "64m"
+
+    # Namespace backend: read-only root filesystem per language (e.g. an exported IMAGE_MAP
+    # image; languages without one are refused), the host uid runs execute as when the runner is
+    # root, and a delegated cgroup v2 directory for per-run limits (empty: rlimits only).
+    namespace_rootfs: dict[str, str] = Field(default_factory=dict)
+    namespace_uid: int = 100000
+    namespace_cgroup: str = ""
+
+    # Per-run CPU/memory/I/O deltas from the Docker stats API (two extra API calls per run).
+    resource_accounting: bool = True
+    # How often memory usage is sampled during a run, for its peak (0 samples only around it).
+    resource_sample_interval: float = 0.25
+
+    # Prometheus exporter served by the worker parent process (0 disables); pool processes
+    # write their samples under `metrics_dir`.
+    metrics_port: int = 9540
+    metrics_dir: str = "/tmp/runbox-metrics"
+
+    # Gzipped workspaces up to this size travel inside the run command instead of put_archive.
+    workspace_inline_max_bytes: int = 48 * 1024
+
+    pool_enabled: bool = True
+    pool_min_idle: int = 1
+    pool_max_idle: int = 4
+    pool_max_reuse: int = 50
+    pool_idle_ttl: int = 300
+
+    stream_max_bytes: int = 1024 * 1024
+    stream_chunk_bytes: int = 4096
+    stream_flush_interval: float = 0.05
+    stream_maxlen: int = 10_000
+    stream_ttl: int = 3600
+
+    stdin_chunk_bytes: int = 64 * 1024
+    stdin_block_ms: int = 1000
+    stdin_idle_timeout: int = 300
+
+    # Languages whose default command runs through a preloaded fork server in the container
+    # (only "python" is implemented), and the modules that server imports up front.
+    forkserver_languages: list[str] = Field(default_factory=list)
+    forkserver_preload: list[str] = Field(
+        default_factory=lambda: [
+            "collections", "dataclasses", "datetime", "decimal", "fractions", "functools",
+            "heapq", "itertools", "json", "math", "random", "re", "string", "typing",
+        ]
+    )
+
+    artifact_cache_enabled: bool = True
+    artifact_cache_dir: str = "/var/cache/runbox/artifacts"
+    artifact_cache_max_bytes: int = 1024 * 1024 * 1024
+    artifact_max_entry_bytes: int = 64 * 1024 * 1024
+    # Named Docker volumes for Go caches; empty disables the mount.
+    go_build_cache_volume: str = ""
+    go_mod_cache_volume: str = ""
+
+    # 0 derives worker concurrency from host CPUs/memory and the per-sandbox limits.
+    worker_concurrency: int = 0
+    # "prefork" runs tasks in child processes (required for task time limits); "threads" and
+    # "solo" run them in the worker process.
+    worker_pool: str = "prefork"
+    # Messages each pool process reserves ahead; 1 stops one worker hoarding long runs.
+    worker_prefetch_multiplier: int = 1
+    # Languages with a dedicated `<runner_queue_name>.<language>` queue; must match the API's
+    # RUNBOX_RUNNER_LANGUAGE_QUEUES.
+    language_queues: list[str] = Field(default_factory=list)
+    # Queues this worker consumes; empty consumes the default queue and every language queue.
+    worker_queues: list[str] = Field(default_factory=list)
+    # Ack runs once finished, so a run whose worker died is redelivered instead of lost.
+    task_acks_late: bool = True
+    # 0 derives the soft limit from slot_wait_timeout and sandbox_timeout (see celeryconfig).
+    task_soft_time_limit: int = 0
+    task_time_limit_grace: int = 30
+    result_compression: bool = True
+    result_expires: int = 86400
+    language_slots: dict[str, int] = Field(default_factory=dict)
+    slot_wait_timeout: int = 120
+    # How long a slot is held before it is presumed leaked by a killed worker; 0 uses the
+    # longest task's hard time limit (see slots.lease_seconds).
+    slot_lease_seconds: int = 0
+    slot_poll_interval: float = 0.1
+
+    # Startup phase: pull and pin IMAGE_MAP to digests, then run a trivial program per language.
+    image_pull_on_startup: bool = True
+    image_pin_digests: bool = True
+    warmup_enabled: bool = True
+    readiness_file: str = "/tmp/runbox-runner-ready"
 
     python_image: str = "python:3.11-slim"
     node_image: str = "node:20-slim"
@@ -1,14 +1,31 @@
 from __future__ import annotations
 
+import base64
+import gzip
 import io
+import shlex
+import socket
 import tarfile
-from contextlib import suppress
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, suppress
+from typing import Iterable, Iterator
 
 import docker
-from docker.errors import DockerException, NotFound
+from docker.errors import DockerException
+from docker.utils.socket import STDOUT, frames_iter
 
-from .config import settings
+from runbox_sandbox import STDIN_DIR, Capabilities, SandboxResult, check_file_name
 
+from . import forkserver
+from .accounting import RunUsage, StatsSampler
+from .artifacts import ARTIFACT_NAME, COMPILE_COMMAND, artifact_cache
+from .backends import DEFAULT_RUN_COMMAND
+from .config import settings
+from .metrics import artifact_cache_lookups
+from .pool import ContainerPool
+from .streaming import OutputPublisher
 
 IMAGE_MAP = {
     "python": settings.python_image,
@@ -17,88 +34,545 @@ IMAGE_MAP = {
     "rust": settings.rust_image,
 }
 
-DEFAULT_RUN_COMMAND = {
-    "python": "python Main.py",
-    "node": "node Main.mjs",
-    "go": "go run Main.go",
-    "rust": "rustc Main.rs && ./Main",
-}
+
+def default_run_command(language: str) -> str | None:
+    if forkserver.enabled(language):
+        return forkserver.run_command()
+    return DEFAULT_RUN_COMMAND.get(language)
+
+
+class _Timeout(Exception):
+    """A build step outlived `sandbox_timeout`; its container has been killed."""
+
+
+class _BuildFailed(Exception):
+    """A build step exited non-zero; `result` carries its output as the run's result."""
+
+    def __init__(self, result: SandboxResult) -> None:
+        super().__init__(result.exit_code)
+        self.result = result
+
+
+def _collect(
+    chunks: Iterator[tuple[bytes | None, bytes | None]],
+    limit: int,
+    expired: threading.Event | None = None,
+) -> tuple[bytes, bytes, bool, int]:
+    """
+    Drain (stdout, stderr) chunks keeping at most `limit` bytes per stream. The rest is read and
+    dropped, so a chatty program neither blocks on a full pipe nor grows the worker's memory.
+    Returns both streams, whether either was truncated, and the total bytes produced.
+    """
+    streams = (bytearray(), bytearray())
+    truncated = False
+    total = 0
+    try:
+        for chunk_pair in chunks:
+            for buffer, chunk in zip(streams, chunk_pair):
+                if not chunk:
+                    continue
+                total += len(chunk)
+                room = limit - len(buffer)
+                if len(chunk) > room:
+                    truncated = True
+                    chunk = chunk[:max(room, 0)]
+                buffer.extend(chunk)
+    except Exception:
+        # Killing the container at the deadline may cut the stream mid-frame.
+        if expired is None or not expired.is_set():
+            raise
+    return bytes(streams[0]), bytes(streams[1]), truncated, total
+
+
+def _feed_stdin(sock, chunks: Iterable[bytes]) -> None:
+    raw = getattr(sock, "_sock", sock)
+    try:
+        for chunk in chunks:
+            raw.sendall(chunk)
+        raw.shutdown(socket.SHUT_WR)
+    except OSError:
+        # The process exited without reading all of its input.
+        pass
 
 
 class DockerSandbox:
+    """Runs in pooled, network-disabled containers through the Docker daemon at `docker_host`."""
+
+    name = "docker"
+    capabilities = Capabilities(streaming=True, stdin=True, limits=True, batch=True)
+
     def __init__(self) -> None:
         self._client: docker.DockerClient | None = None
+        self.pool = ContainerPool(self.get_client)
+        self._image_ids: dict[str, str] = {}
 
-    def _get_client(self) -> docker.DockerClient:
+    def get_client(self) -> docker.DockerClient:
+        """The Docker client, connected on first use and dropped by `close`."""
         if self._client is None:
             self._client = docker.DockerClient(base_url=settings.docker_host)
         return self._client
 
-    def _bundle_files(self, files: list[dict[str, str]]) -> bytes:
-        tar_stream = io.BytesIO()
-        with tarfile.open(fileobj=tar_stream, mode="w") as tar:
+    def start(self) -> None:
+        self.pool.fill(IMAGE_MAP)
+
+    def stats(self) -> dict:
+        return self.pool.snapshot()
+
+    def close(self) -> None:
+        """Drop pooled containers and the Docker client, e.g. before worker processes fork."""
+        self.pool.drain()
+        if self._client is not None:
+            self._client.close()
+            self._client = None
+
+    @contextmanager
+    def _deadline(self, container, seconds: float | None = None) -> Iterator[threading.Event]:
+        """
+        Kill `container` if the block is still running after `seconds` (`sandbox_timeout` by
+        default), which also ends any exec stream being read. The event reports whether it
+        fired; a killed container is never returned to the pool.
+        """
+        expired = threading.Event()
+
+        def kill() -> None:
+            expired.set()
+            with suppress(DockerException):
+                container.kill()
+
+        timer = threading.Timer(seconds or settings.sandbox_timeout, kill)
+        timer.daemon = True
+        timer.start()
+        try:
+            yield expired
+        finally:
+            timer.cancel()
+
+    def _oom_killed(self, container) -> bool:
+        try:
+            container.reload()
+        except DockerException:
+            return False
+        return bool(container.attrs.get("State", {}).get("OOMKilled"))
+
+    def _image_id(self, image: str) -> str:
+        if image not in self._image_ids:
+            self._image_ids[image] = self.get_client().images.get(image).id
+        return self._image_ids[image]
+
+    def _bundle_files(self, files: list[dict[str, str]], binary: bytes | None = None) -> io.BytesIO:
+        """Build the workspace tarball once; callers read it through the buffer without copying."""
+        archive = io.BytesIO()
+        with tarfile.open(fileobj=archive, mode="w") as tar:
             for file in files:
                 data = file["content"].encode()
-                tarinfo = tarfile.TarInfo(name=file["name"])
+                tarinfo = tarfile.TarInfo(name=check_file_name(file["name"]))
                 tarinfo.size = len(data)
                 tarinfo.mtime = 0
                 tarinfo.mode = 0o644
                 tar.addfile(tarinfo, io.BytesIO(data))
-        tar_stream.seek(0)
-        return tar_stream.read()
+            if binary is not None:
+                tarinfo = tarfile.TarInfo(name=ARTIFACT_NAME)
+                tarinfo.size = len(binary)
+                tarinfo.mtime = 0
+                tarinfo.mode = 0o755
+                tar.addfile(tarinfo, io.BytesIO(binary))
+        archive.seek(0)
+        return archive
 
-    def run(
+    def _upload(self, container, archive: io.BytesIO) -> str | None:
+        """
+        Ship the workspace to the container. Small archives are inlined into the run command as
+        base64 (returned as an extraction step), saving the put_archive round-trip.
+        """
+        compressed = gzip.compress(archive.getbuffer(), compresslevel=1)
+        if len(compressed) <= settings.workspace_inline_max_bytes:
+            return f"echo {base64.b64encode(compressed).decode()} | base64 -d | tar -xzf -"
+        container.put_archive(path="/workspace", data=archive)
+        return None
+
+    def _fetch_artifact(self, container) -> bytes | None:
+        chunks, _ = container.get_archive(f"/workspace/{ARTIFACT_NAME}")
+        with tarfile.open(fileobj=io.BytesIO(b"".join(chunks))) as tar:
+            member = tar.extractfile(ARTIFACT_NAME)
+            return member.read() if member else None
+
+    def _prepare_workspace(
         self,
+        container,
         language: str,
+        image: str,
         files: list[dict[str, str]],
         build_cmd: str | None,
         run_cmd: str | None,
+        usage: RunUsage,
+        env: dict[str, str] | None = None,
     ) -> str:
+        """
+        Upload the run's files, run the build step as its own exec (timed as `build_ms`) and
+        return the command to execute. Default Go/Rust runs reuse a cached binary when the
+        sources were compiled before. Raises _BuildFailed with the build's output if it fails.
+        """
+        key = None
+        if (
+            settings.artifact_cache_enabled
+            and language in COMPILE_COMMAND
+            and not build_cmd
+            and not run_cmd
+        ):
+            key = artifact_cache.key(language, self._image_id(image), files)
+        binary = artifact_cache.get(key) if key else None
+        if key:
+            artifact_cache_lookups.labels(language, "miss" if binary is None else "hit").inc()
+        with usage.phase("setup_ms"):
+            extract = self._upload(container, self._bundle_files(files, binary))
+
+        if binary is not None:
+            return self._build_command(language, None, f"./{ARTIFACT_NAME}", extract)
+        if key:
+            compile_cmd = self._build_command(language, None, COMPILE_COMMAND[language], extract)
+            self._build(container, compile_cmd, None, usage)
+            binary = self._fetch_artifact(container)
+            if binary is not None:
+                artifact_cache.put(key, binary)
+            return self._build_command(language, None, f"./{ARTIFACT_NAME}")
+        if build_cmd:
+            self._build(
+                container, self._build_command(language, None, build_cmd, extract), env, usage
+            )
+            return self._build_command(language, None, run_cmd)
+        return self._build_command(language, None, run_cmd, extract)
+
+    def _build(self, container, command: str, env: dict[str, str] | None, usage: RunUsage) -> None:
+        """
+        Run a build step. Raises _BuildFailed with its output when it fails, and _Timeout past
+        `sandbox_timeout`.
+        """
+        with usage.phase("build_ms"), self._deadline(container) as expired:
+            result, _ = self._exec(container, command, env, None, expired)
+        if result.timed_out:
+            raise _Timeout()
+        if result.exit_code != 0:
+            raise _BuildFailed(result)
+
+    def _build_command(
+        self, language: str, build_cmd: str | None, run_cmd: str | None, extract: str | None = None
+    ) -> str:
+        exec_commands: list[str | None] = ["cd /workspace", extract]
+        if build_cmd:
+            exec_commands.append(build_cmd)
+        if run_cmd:
+            exec_commands.append(run_cmd)
+        else:
+            default_cmd = default_run_command(language)
+            if default_cmd:
+                exec_commands.append(default_cmd)
+
+        joined = " && ".join(filter(None, exec_commands))
+        return f"/bin/sh -lc '{joined}'"
+
+    def _exec_output(
+        self,
+        container,
+        command: str | list[str],
+        env: dict[str, str] | None,
+        stdin: Iterable[bytes] | None,
+    ) -> tuple[str, Iterator[tuple[bytes | None, bytes | None]]]:
+        """
+        Start `command` and return its exec id and (stdout, stderr) chunks as they arrive.
+        With `stdin`, the exec is attached over a raw socket and the chunks are written to the
+        process from a separate thread, so input is streamed rather than buffered up front.
+        """
+        api = self.get_client().api
+        exec_id = api.exec_create(
+            container.id,
+            command,
+            stdin=stdin is not None,
+            stdout=True,
+            stderr=True,
+            tty=False,
+            environment=env or None,
+        )["Id"]
+        if stdin is None:
+            return exec_id, api.exec_start(exec_id, stream=True, demux=True)
+
+        sock = api.exec_start(exec_id, socket=True)
+        threading.Thread(target=_feed_stdin, args=(sock, stdin), daemon=True).start()
+
+        def frames() -> Iterator[tuple[bytes | None, bytes | None]]:
+            try:
+                for stream, data in frames_iter(sock, tty=False):
+                    yield (data, None) if stream == STDOUT else (None, data)
+            finally:
+                sock.close()
+
+        return exec_id, frames()
+
+    def _exec(
+        self,
+        container,
+        command: str | list[str],
+        env: dict[str, str] | None,
+        stdin: Iterable[bytes] | None,
+        expired: threading.Event,
+    ) -> tuple[SandboxResult, int]:
+        """Run `command` until it exits or `expired` fires; also returns the bytes it produced."""
+        exec_id, chunks = self._exec_output(container, command, env, stdin)
+        stdout, stderr, truncated, total = _collect(chunks, settings.sandbox_output_limit, expired)
+        result = SandboxResult(
+            stdout=stdout.decode(errors="replace"),
+            stderr=stderr.decode(errors="replace"),
+            truncated=truncated,
+            timed_out=expired.is_set(),
+        )
+        if not result.timed_out:
+            result.exit_code = self.get_client().api.exec_inspect(exec_id).get("ExitCode")
+        return result, total
+
+    def run(
+        self,
+        language: str,
+        files: list[dict[str, str]],
+        build_cmd: str | None,
+        run_cmd: str | None,
+        env: dict[str, str] | None = None,
+        stdin: Iterable[bytes] | None = None,
+        usage: RunUsage | None = None,
+    ) -> SandboxResult:
+        """
+        Build and run within `sandbox_timeout` each, keeping `sandbox_output_limit` bytes per
+        stream. `usage`, when given, is filled with the run's phase timings and resource usage.
+        """
         image = IMAGE_MAP.get(language, settings.python_image)
+        usage = usage or RunUsage()
         try:
-            client = self._get_client()
+            self.get_client()
         except DockerException as exc:
-            return f"Runner unavailable: {exc}"
+            return SandboxResult(error=f"Runner unavailable: {exc}")
 
-        container = None
+        pooled = None
+        tainted = False
         try:
-            container = client.containers.create(
-                image=image,
-                command="/bin/sh",
-                tty=True,
-                stdin_open=True,
-                detach=True,
-                mem_limit=settings.sandbox_memory,
-                nano_cpus=int(settings.sandbox_cpus * 1e9),
-                network_disabled=True,
+            with usage.phase("setup_ms"):
+                pooled = self.pool.acquire(language, image)
+            container = pooled.container
+            stats = StatsSampler(container)
+            command = self._prepare_workspace(
+                container, language, image, files, build_cmd, run_cmd, usage, env
             )
-            container.start()
-            container.exec_run("mkdir -p /workspace")
-            archive = self._bundle_files(files)
-            container.put_archive(path="/workspace", data=archive)
-
-            exec_commands: list[str] = ["cd /workspace"]
-            if build_cmd:
-                exec_commands.append(build_cmd)
-            if run_cmd:
-                exec_commands.append(run_cmd)
-            else:
-                default_cmd = DEFAULT_RUN_COMMAND.get(language)
-                if default_cmd:
-                    exec_commands.append(default_cmd)
-
-            joined = " && ".join(filter(None, exec_commands))
-            exit_code, output = container.exec_run(f"/bin/sh -lc '{joined}'", demux=True, tty=False)
-
-            stdout = output[0].decode() if output and output[0] else ""
-            stderr = output[1].decode() if output and output[1] else ""
-            return stdout + stderr if exit_code == 0 else f"Process exited with code {exit_code}\n{stdout}{stderr}"
+            with (
+                usage.phase("exec_ms"),
+                self._deadline(container) as expired,
+                stats.sampling(),
+            ):
+                result, usage.output_bytes = self._exec(container, command, env, stdin, expired)
+            if not result.timed_out:
+                stats.apply(usage)
+            # Killed by a signal or the deadline: don't trust the container for reuse.
+            tainted = result.exit_code is None or result.exit_code >= 128
+            if tainted and not result.timed_out:
+                result.oom_killed = self._oom_killed(container)
+            return result
+        except _BuildFailed as failed:
+            result = failed.result
+            tainted = result.exit_code is None or result.exit_code >= 128
+            if tainted:
+                result.oom_killed = self._oom_killed(container)
+            return result
+        except _Timeout:
+            tainted = True
+            return SandboxResult(timed_out=True)
+        except (DockerException, ValueError) as exc:
+            tainted = True
+            return SandboxResult(error=f"Runner failure: {exc}")
+        finally:
+            if pooled:
+                self.pool.release(pooled, tainted=tainted)
+
+    def stream(
+        self,
+        language: str,
+        files: list[dict[str, str]],
+        build_cmd: str | None,
+        run_cmd: str | None,
+        publisher: OutputPublisher,
+        env: dict[str, str] | None = None,
+        stdin: Iterable[bytes] | None = None,
+        usage: RunUsage | None = None,
+    ) -> SandboxResult:
+        """
+        Run like `run`, but forward output chunks to `publisher` as they are produced; its
+        `stream_max_bytes` cap replaces `sandbox_output_limit`.
+        """
+        image = IMAGE_MAP.get(language, settings.python_image)
+        usage = usage or RunUsage()
+        try:
+            client = self.get_client()
         except DockerException as exc:
-            return f"Runner failure: {exc}"
+            error = f"Runner unavailable: {exc}"
+            publisher.close(None, error=error)
+            return SandboxResult(error=error)
+
+        pooled = None
+        tainted = False
+        result = SandboxResult()
+        try:
+            try:
+                with usage.phase("setup_ms"):
+                    pooled = self.pool.acquire(language, image)
+                container = pooled.container
+                stats = StatsSampler(container)
+                command = self._prepare_workspace(
+                    container, language, image, files, build_cmd, run_cmd, usage, env
+                )
+                with (
+                    usage.phase("exec_ms"),
+                    self._deadline(container) as expired,
+                    stats.sampling(),
+                ):
+                    exec_id, chunks = self._exec_output(container, command, env, stdin)
+                    try:
+                        for stdout, stderr in chunks:
+                            accepted = True
+                            if stdout:
+                                accepted = publisher.write("stdout", stdout)
+                            if stderr:
+                                accepted = publisher.write("stderr", stderr) and accepted
+                            if not accepted:
+                                # Output cap reached; the container is killed on release.
+                                break
+                    except Exception:
+                        if not expired.is_set():
+                            raise
+                result.timed_out = expired.is_set()
+                if not publisher.truncated and not result.timed_out:
+                    result.exit_code = client.api.exec_inspect(exec_id).get("ExitCode")
+                    stats.apply(usage)
+                tainted = result.exit_code is None or result.exit_code >= 128
+                if tainted and not result.timed_out and not publisher.truncated:
+                    result.oom_killed = self._oom_killed(container)
+            except _BuildFailed as failed:
+                # Published as a whole: the build's output was collected, not streamed.
+                publisher.write("stdout", failed.result.stdout.encode())
+                publisher.write("stderr", failed.result.stderr.encode())
+                result.exit_code = failed.result.exit_code
+                tainted = result.exit_code is None or result.exit_code >= 128
+                if tainted:
+                    result.oom_killed = self._oom_killed(container)
+            except _Timeout:
+                tainted = result.timed_out = True
+            except (DockerException, ValueError) as exc:
+                tainted = True
+                result.error = f"Runner failure: {exc}"
+            usage.output_bytes = publisher.total_bytes
+            result.stdout, result.stderr = publisher.stdout, publisher.stderr
+            result.truncated = publisher.truncated
+            publisher.close(result.exit_code, error=result.error or result.kill_reason)
+            return result
         finally:
-            if container:
-                with suppress(NotFound, DockerException):
-                    container.remove(force=True)
+            if pooled:
+                self.pool.release(pooled, tainted=tainted)
+
+    def run_batch(
+        self,
+        language: str,
+        files: list[dict[str, str]],
+        build_cmd: str | None,
+        run_cmd: str | None,
+        variants: list[dict],
+        parallelism: int = 1,
+        env: dict[str, str] | None = None,
+        usage: RunUsage | None = None,
+    ) -> dict:
+        """
+        Build once, then run every variant (stdin and extra args) in the same container,
+        at most `parallelism` at a time. Returns the build output and per-variant results.
+        """
+        image = IMAGE_MAP.get(language, settings.python_image)
+        usage = usage or RunUsage()
+        try:
+            self.get_client()
+        except DockerException as exc:
+            return {"status": "failed", "output": f"Runner unavailable: {exc}", "variants": []}
+
+        compiled = language in COMPILE_COMMAND and not build_cmd and not run_cmd
+        setup = COMPILE_COMMAND[language] if compiled else build_cmd
+        if compiled:
+            command = f"./{ARTIFACT_NAME}"
+        else:
+            command = run_cmd or default_run_command(language) or ""
+        stdin_files = [
+            {"name": f"{STDIN_DIR}/{index}", "content": variant.get("stdin") or ""}
+            for index, variant in enumerate(variants)
+        ]
 
+        pooled = None
+        tainted = False
+        try:
+            with usage.phase("setup_ms"):
+                pooled = self.pool.acquire(language, image)
+                container = pooled.container
+                extract = self._upload(container, self._bundle_files(files + stdin_files))
+            stats = StatsSampler(container)
+            build_output = ""
+            if extract or setup:
+                steps = " && ".join(filter(None, ["cd /workspace", extract, setup]))
+                with (
+                    usage.phase("build_ms"),
+                    self._deadline(container) as expired,
+                    stats.sampling(),
+                ):
+                    build, _ = self._exec(container, ["/bin/sh", "-lc", steps], env, None, expired)
+                if build.exit_code != 0:
+                    tainted = build.exit_code is None or build.exit_code >= 128
+                    if tainted and not build.timed_out:
+                        build.oom_killed = self._oom_killed(container)
+                    return {"status": "failed", "output": build.output, "variants": []}
+                build_output = build.output
+
+            def run_variant(index: int) -> dict:
+                args = shlex.join(variants[index].get("args") or [])
+                line = f"cd /workspace && {command} {args} < {STDIN_DIR}/{index}"
+                started = time.monotonic()
+                result, produced = SandboxResult(timed_out=True), 0
+                # Variants left when the deadline kills the container count as timed out.
+                if not expired.is_set():
+                    try:
+                        result, produced = self._exec(
+                            container, ["/bin/sh", "-lc", line], env, None, expired
+                        )
+                    except DockerException:
+                        if not expired.is_set():
+                            raise
+                return {
+                    "index": index,
+                    "exit_code": result.exit_code,
+                    "stdout": result.stdout,
+                    "stderr": result.stderr,
+                    "timed_out": result.timed_out,
+                    "truncated": result.truncated,
+                    "output_bytes": produced,
+                    "duration_ms": int((time.monotonic() - started) * 1000),
+                }
+
+            # Each round of `parallelism` variants gets `sandbox_timeout`.
+            workers = max(parallelism, 1)
+            rounds = max(-(-len(variants) // workers), 1)
+            with (
+                usage.phase("exec_ms"),
+                self._deadline(container, rounds * settings.sandbox_timeout) as expired,
+                stats.sampling(),
+                ThreadPoolExecutor(max_workers=workers) as executor,
+            ):
+                results = list(executor.map(run_variant, range(len(variants))))
+            if not expired.is_set():
+                stats.apply(usage)
+            usage.output_bytes = sum(r.pop("output_bytes") for r in results)
+            tainted = any(r["exit_code"] is None or r["exit_code"] >= 128 for r in results)
+            return {"status": "completed", "output": build_output, "variants": results}
+        except (DockerException, ValueError) as exc:
+            tainted = True
+            return {"status": "failed", "output": f"Runner failure: {exc}", "variants": []}
+        finally:
+            if pooled:
+                self.pool.release(pooled, tainted=tainted)
 
-sandbox = DockerSandbox()
@@ -0,0 +1,48 @@
+from __future__ import annotations
+
+import io
+import tarfile
+from pathlib import Path
+
+from ..config import settings
+
+# Where pooled containers get the server and client scripts, and the server its socket.
+FORKSERVER_DIR = "/opt/runbox"
+SERVER_SCRIPT = "forkserver.py"
+CLIENT_SCRIPT = "forkclient.py"
+# Languages with a fork server implementation; `forkserver_languages` opts them in.
+SUPPORTED_LANGUAGES = {"python"}
+
+_SOURCES = {
+    SERVER_SCRIPT: Path(__file__).with_name("server.py"),
+    CLIENT_SCRIPT: Path(__file__).with_name("client.py"),
+}
+
+
+def enabled(language: str) -> bool:
+    return language in SUPPORTED_LANGUAGES and language in settings.forkserver_languages
+
+
+def container_command() -> list[str]:
+    """The pooled container's init process: the fork server with the configured preloads."""
+    server = f"{FORKSERVER_DIR}/{SERVER_SCRIPT}"
+    return ["python", server, FORKSERVER_DIR, *settings.forkserver_preload]
+
+
+def run_command(script: str = "Main.py") -> str:
+    # -I -S: the client only relays the run, so it skips site and environment lookups.
+    return f"python -I -S {FORKSERVER_DIR}/{CLIENT_SCRIPT} {script}"
+
+
+def archive() -> bytes:
+    """Tarball of both scripts, extracted at `/` before the container starts."""
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w") as tar:
+        for name, source in _SOURCES.items():
+            data = source.read_bytes()
+            tarinfo = tarfile.TarInfo(name=f"{FORKSERVER_DIR.lstrip('/')}/{name}")
+            tarinfo.size = len(data)
+            tarinfo.mtime = 0
+            tarinfo.mode = 0o644
+            tar.addfile(tarinfo, io.BytesIO(data))
+    return buffer.getvalue()
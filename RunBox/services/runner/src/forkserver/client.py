@@ -0,0 +1,39 @@
+"""
+Run a script through the fork server serving this file's directory.
+
+    python -I -S client.py Main.py [arg ...]
+
+Hands argv, the working directory, the environment and this process's stdio to the server and
+exits with the run's exit code. Falls back to exec'ing `python` when no server is listening.
+Standard library only, and kept to cheap imports: this is the per-run startup cost.
+"""
+import json
+import os
+import socket
+import sys
+
+# Abstract socket address; must match `server.address`.
+SOCKET = "\0" + os.path.join(os.path.dirname(os.path.abspath(__file__)), "forkserver.sock")
+
+
+def main() -> None:
+    request = {"argv": sys.argv[1:], "cwd": os.getcwd(), "env": dict(os.environ)}
+    conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        conn.connect(SOCKET)
+    except OSError:
+        os.execvp("python", ["python", *sys.argv[1:]])
+    payload = json.dumps(request).encode() + b"\n"
+    sent = socket.send_fds(conn, [payload], [0, 1, 2])
+    conn.sendall(payload[sent:])
+    reply = b""
+    while not reply.endswith(b"\n"):
+        chunk = conn.recv(64)
+        if not chunk:
+            sys.exit("forkserver: connection lost")
+        reply += chunk
+    sys.exit(int(reply))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""
+Fork server run as a sandbox container's init process (see `forkserver.container_command`).
+
+    python server.py <dir> [module ...]
+
+Imports the given modules once, then serves run requests on the abstract unix socket named
+`<dir>/forkserver.sock` (abstract, as the container's root filesystem is read-only). The client
+(`client.py`) sends its argv, working directory and environment with its stdio descriptors
+attached; a fresh grandchild runs the script there as `__main__`, while the intermediate child
+waits for it and reports the exit code back. The server itself keeps no per-run state.
+Standard library only: this file runs inside the language image.
+"""
+from __future__ import annotations
+
+import atexit
+import gc
+import importlib
+import json
+import os
+import runpy
+import signal
+import socket
+import sys
+import traceback
+
+SOCKET_NAME = "forkserver.sock"
+MAX_REQUEST_BYTES = 1024 * 1024
+
+
+def address(directory: str) -> str:
+    """The abstract socket address the server for `directory` listens on."""
+    return "\0" + os.path.join(directory, SOCKET_NAME)
+
+
+def _receive(conn: socket.socket) -> tuple[dict, list[int]]:
+    """Read one newline-terminated JSON request; the stdio descriptors ride on its first bytes."""
+    data, fds, _, _ = socket.recv_fds(conn, 64 * 1024, 3)
+    buffer = bytearray(data)
+    while not buffer.endswith(b"\n"):
+        if not data or len(buffer) > MAX_REQUEST_BYTES:
+            for fd in fds:
+                os.close(fd)
+            raise ValueError("incomplete request")
+        data = conn.recv(64 * 1024)
+        buffer.extend(data)
+    if len(fds) != 3:
+        for fd in fds:
+            os.close(fd)
+        raise ValueError("expected stdin, stdout and stderr descriptors")
+    return json.loads(buffer), fds
+
+
+def _exit_code(code: object) -> int:
+    if code is None:
+        return 0
+    if isinstance(code, int):
+        return code
+    print(code, file=sys.stderr)
+    return 1
+
+
+def _run(request: dict, fds: list[int]) -> None:
+    """Become the requested program, as `python <argv>` would run it from `cwd`."""
+    for target, fd in enumerate(fds):
+        os.dup2(fd, target)
+        os.close(fd)
+    sys.stdin = sys.__stdin__ = open(0, closefd=False)
+    sys.stdout = sys.__stdout__ = open(1, "w", closefd=False)
+    sys.stderr = sys.__stderr__ = open(
+        2, "w", buffering=1, errors="backslashreplace", closefd=False
+    )
+    os.environ.clear()
+    os.environ.update(request["env"])
+    os.chdir(request["cwd"])
+    argv = request["argv"]
+    path = os.path.abspath(argv[0])
+    sys.argv = argv
+    sys.path[0] = os.path.dirname(path)
+    # `random` reseeds itself after fork; nothing else imported here carries per-process state.
+
+    try:
+        runpy.run_path(path, run_name="__main__")
+        code = 0
+    except SystemExit as exc:
+        code = _exit_code(exc.code)
+    except BaseException as exc:
+        tb = exc.__traceback__
+        # Hide the server's and runpy's frames, as a plain `python Main.py` would.
+        while tb is not None and tb.tb_frame.f_code.co_filename != path:
+            tb = tb.tb_next
+        traceback.print_exception(type(exc), exc, tb)
+        code = 1
+
+    if "threading" in sys.modules:
+        sys.modules["threading"]._shutdown()
+    atexit._run_exitfuncs()
+    for stream in (sys.stdout, sys.stderr):
+        try:
+            stream.flush()
+        except (OSError, ValueError):
+            code = code or 120
+    os._exit(code)
+
+
+def _supervise(conn: socket.socket, request: dict, fds: list[int]) -> None:
+    """Fork the run and report how it ended, as a shell would: signals become 128 + signum."""
+    signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+    pid = os.fork()
+    if pid == 0:
+        conn.close()
+        _run(request, fds)
+    for fd in fds:
+        os.close(fd)
+    _, status = os.waitpid(pid, 0)
+    code = os.waitstatus_to_exitcode(status)
+    try:
+        conn.sendall(f"{code if code >= 0 else 128 - code}\n".encode())
+    finally:
+        os._exit(0)
+
+
+def serve(directory: str, preload: list[str]) -> None:
+    for name in preload:
+        try:
+            importlib.import_module(name)
+        except ImportError as exc:
+            print(f"forkserver: cannot preload {name}: {exc}", file=sys.stderr)
+    # Supervisors are never waited for; let the kernel reap them.
+    signal.signal(signal.SIGCHLD, signal.SIG_IGN)
+
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    listener.bind(address(directory))
+    listener.listen(64)
+    # Everything allocated so far is shared copy-on-write with each run; keep the collector from
+    # touching (and so copying) those pages in the children.
+    gc.freeze()
+
+    while True:
+        conn, _ = listener.accept()
+        try:
+            request, fds = _receive(conn)
+        except (OSError, ValueError) as exc:
+            print(f"forkserver: bad request: {exc}", file=sys.stderr)
+            conn.close()
+            continue
+        if os.fork() == 0:
+            listener.close()
+            _supervise(conn, request, fds)
+        conn.close()
+        for fd in fds:
+            os.close(fd)
+
+
+if __name__ == "__main__":
+    serve(sys.argv[1], sys.argv[2:])
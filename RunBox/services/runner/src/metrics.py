@@ -0,0 +1,137 @@
+from __future__ import annotations
+
+import os
+from pathlib import Path
+from typing import Iterable, Iterator
+
+from .config import settings
+
+# Celery runs tasks in forked pool processes, so metrics are written to per-process files and
+# aggregated by the exporter in the parent. The directory must be set before prometheus_client
+# is imported, as it picks its value backend at import time.
+if settings.metrics_port:
+    os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", settings.metrics_dir)
+    Path(os.environ["PROMETHEUS_MULTIPROC_DIR"]).mkdir(parents=True, exist_ok=True)
+
+from prometheus_client import (  # noqa: E402
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    multiprocess,
+    start_http_server,
+)
+from prometheus_client.core import GaugeMetricFamily  # noqa: E402
+from redis.exceptions import RedisError  # noqa: E402
+
+from .celeryconfig import runner_queues  # noqa: E402
+from .slots import language_slots  # noqa: E402
+from .streaming import get_redis  # noqa: E402
+
+RUN_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+RUN_PHASES = ("queue", "setup", "build", "exec")
+
+run_duration = Histogram(
+    "runbox_runner_run_seconds",
+    "Runner task time from pickup to result.",
+    ("language", "status"),
+    buckets=RUN_BUCKETS,
+)
+run_phase_duration = Histogram(
+    "runbox_runner_run_phase_seconds",
+    "Time runs spent queued, in workspace setup, building and executing.",
+    ("language", "phase"),
+    buckets=RUN_BUCKETS,
+)
+sandbox_failures = Counter(
+    "runbox_runner_sandbox_failures_total",
+    "Failed runs by cause.",
+    ("language", "cause"),
+)
+slot_wait = Histogram(
+    "runbox_runner_slot_wait_seconds",
+    "Time tasks waited for a per-language host slot.",
+    ("language",),
+    buckets=RUN_BUCKETS,
+)
+pool_acquires = Counter(
+    "runbox_runner_pool_acquires_total",
+    "Container pool lookups by outcome (hit: reused an idle container, miss: created one).",
+    ("language", "outcome"),
+)
+pool_idle = Gauge(
+    "runbox_runner_pool_idle_containers",
+    "Idle pre-started containers.",
+    ("language",),
+    multiprocess_mode="livesum",
+)
+artifact_cache_lookups = Counter(
+    "runbox_runner_artifact_cache_lookups_total",
+    "Build artifact cache lookups by outcome.",
+    ("language", "outcome"),
+)
+
+
+def observe_run(language: str, status: str, cause: str | None, elapsed: float, usage: dict) -> None:
+    run_duration.labels(language, status).observe(elapsed)
+    for phase in RUN_PHASES:
+        value = usage.get(f"{phase}_ms")
+        if value is not None:
+            run_phase_duration.labels(language, phase).observe(value / 1000)
+    if cause:
+        sandbox_failures.labels(language, cause).inc()
+
+
+class QueueCollector:
+    """Broker queue depth and per-language slot occupancy, read from Redis at scrape time."""
+
+    def __init__(self, languages: Iterable[str]) -> None:
+        self._languages = languages
+
+    def collect(self) -> Iterator[GaugeMetricFamily]:
+        try:
+            redis = get_redis()
+            depth = sum(redis.llen(queue) for queue in runner_queues())
+            occupancy = {
+                language: language_slots.occupancy(language) for language in self._languages
+            }
+        except RedisError:
+            return
+        yield GaugeMetricFamily(
+            "runbox_runner_queue_depth",
+            "Runs waiting in the broker queues.",
+            value=depth,
+        )
+        held = GaugeMetricFamily(
+            "runbox_runner_slots_held",
+            "Per-language host slots held by running tasks.",
+            labels=["language"],
+        )
+        waiting = GaugeMetricFamily(
+            "runbox_runner_slots_waiting",
+            "Tasks on this host waiting for a per-language slot.",
+            labels=["language"],
+        )
+        for language, (holders, waiters) in occupancy.items():
+            held.add_metric([language], holders)
+            waiting.add_metric([language], waiters)
+        yield held
+        yield waiting
+
+
+def start_exporter(languages: Iterable[str]) -> None:
+    """Serve the aggregated metrics of all pool processes. Call once, in the worker parent."""
+    if not settings.metrics_port:
+        return
+    # Files left by a previous worker would be summed into this one's counters.
+    for stale in Path(os.environ["PROMETHEUS_MULTIPROC_DIR"]).glob("*.db"):
+        stale.unlink(missing_ok=True)
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    registry.register(QueueCollector(languages))
+    start_http_server(settings.metrics_port, registry=registry)
+
+
+def mark_process_dead(pid: int) -> None:
+    if settings.metrics_port:
+        multiprocess.mark_process_dead(pid)
@@ -0,0 +1,319 @@
+from __future__ import annotations
+
+import logging
+import os
+import shlex
+import shutil
+import signal
+import tempfile
+import threading
+import time
+import uuid
+from contextlib import contextmanager, suppress
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable, Iterator
+
+from runbox_sandbox import Capabilities, SandboxResult
+
+from .accounting import RunUsage
+from .config import settings
+from .process_runner import OutputSink, ProcessSandbox, _usage_lock, limit_argv
+from .slots import parse_memory
+
+logger = logging.getLogger(__name__)
+
+# Where the run's workspace appears inside the sandbox, on a tmpfs /tmp.
+WORKSPACE = "/tmp/workspace"
+SANDBOX_PATH = "/usr/local/sbin:/usr/local/bin:/usr/sbin:/usr/bin:/sbin:/bin"
+# Mountpoint of the new root. Every run mounts onto it in its own mount namespace, so one
+# (always empty) directory on the host serves all of them.
+NEW_ROOT = Path(tempfile.gettempdir()) / "runbox-root"
+# Skeleton bound over the sandbox's /dev: empty files the devices are bound onto, and /dev/fd.
+DEV_SKELETON = Path(tempfile.gettempdir()) / "runbox-dev"
+DEVICES = ("null", "zero", "random", "urandom")
+# Paths hidden behind an empty, read-only tmpfs when the root filesystem has them: runtime
+# sockets (the Docker socket among them); `_masked_paths` adds the runner's code and state.
+MASKED_PATHS = ("/run", "/var/run")
+# Carries the run's root filesystem from `run` down to `_execute`; never reaches the process.
+ROOTFS_ENV = "RUNBOX_NS_ROOTFS"
+CPU_PERIOD = 100_000
+# Failed (or successful) probes of a root filesystem are repeated after this many seconds.
+PROBE_TTL = 60
+
+# Runs as root of the new namespaces, on the host's filesystem: joins the run's cgroup, mounts
+# the new root from the run's fstab in one `mount -a`, marks setup as done, then chroots into
+# the new root with the rlimits applied and runs the command. It stays pid 1 of the namespace,
+# so the command can still be killed by a signal it sends itself.
+# $1 run state directory, $2 cgroup or "", $3 command.
+_INIT = """\
+set -e
+[ -z "$2" ] || echo 0 > "$2/cgroup.procs"
+mount -a -T "$1/fstab"
+: > "$1/ready"
+"""
+
+
+def _escape(path: str | Path) -> str:
+    """A path as an fstab field."""
+    table = {" ": "\\040", "\t": "\\011", "\n": "\\012", "\\": "\\134"}
+    return "".join(table.get(char, char) for char in str(path))
+
+
+def _masked_paths() -> list[str]:
+    paths = [*MASKED_PATHS, str(Path(__file__).resolve().parents[1]), str(Path.home())]
+    paths += [settings.artifact_cache_dir, settings.metrics_dir]
+    if settings.docker_host.startswith("unix://"):
+        socket = Path("/", settings.docker_host.removeprefix("unix://").lstrip("/"))
+        paths.append(str(socket.parent))
+    return paths
+
+
+def _fstab(rootfs: str, workspace: Path) -> str:
+    """The mounts that build a run's root at NEW_ROOT, in order, for `mount -a -T`."""
+    root, tmp_size = NEW_ROOT, settings.sandbox_tmp_size
+    entries = [
+        (rootfs, root, "none", "rbind,ro,nosuid,nodev"),
+        ("tmpfs", root / "tmp", "tmpfs", f"nosuid,nodev,size={tmp_size},mode=1777"),
+        (workspace, root / WORKSPACE.lstrip("/"), "none", "bind,X-mount.mkdir"),
+        (DEV_SKELETON, root / "dev", "none", "bind"),
+        *((f"/dev/{device}", root / "dev" / device, "none", "bind") for device in DEVICES),
+        ("proc", root / "proc", "proc", "nosuid,nodev,noexec"),
+        (root / "proc/sys", root / "proc/sys", "none", "bind,ro"),
+    ]
+    # /tmp is a fresh tmpfs already, and anything under a masked directory is hidden with it.
+    hidden = [Path("/tmp")]
+    for path in sorted(map(Path, _masked_paths()), key=lambda path: len(path.parts)):
+        target = Path(rootfs, *path.parts[1:])
+        # A symlink (e.g. /var/run -> /run) would be resolved against the host's root.
+        if any(path.is_relative_to(parent) for parent in hidden) or target.is_symlink():
+            continue
+        if target.is_dir():
+            hidden.append(path)
+            masked = root.joinpath(*path.parts[1:])
+            entries.append(("tmpfs", masked, "tmpfs", "ro,nosuid,nodev,noexec,size=4k,mode=000"))
+    return "".join(
+        f"{_escape(source)} {_escape(target)} {fstype} {options} 0 0\n"
+        for source, target, fstype, options in entries
+    )
+
+
+def _remove_cgroup(cgroup: Path) -> None:
+    # Usually empty already: the pid namespace dies with its init when the runner kills the run.
+    try:
+        (cgroup / "cgroup.kill").write_text("1")
+    except OSError:
+        # cgroup.kill needs Linux 5.14.
+        for pid in (cgroup / "cgroup.procs").read_text().split():
+            with suppress(ProcessLookupError):
+                os.kill(int(pid), signal.SIGKILL)
+    deadline = time.monotonic() + 1
+    while True:
+        try:
+            cgroup.rmdir()
+            return
+        except OSError as exc:
+            if time.monotonic() > deadline:
+                logger.warning("Could not remove cgroup %s: %s", cgroup, exc)
+                return
+            time.sleep(0.01)
+
+
+@dataclass
+class _Setup:
+    """Per-command inputs of the namespace init, read by `_argv`."""
+
+    state: Path
+    cgroup: Path | None
+
+
+class NamespaceSandbox(ProcessSandbox):
+    """
+    Runs jobs in fresh Linux namespaces (mount, pid, network, ipc, uts) spawned with util-linux
+    `unshare`, with no daemon in the way. Each run sees a read-only bind of its language's root
+    filesystem (`namespace_rootfs`; languages without one are refused), a tmpfs /tmp holding the
+    workspace, its own /proc with a read-only /proc/sys, a minimal /dev, no network, and runtime
+    and runner directories masked. A root runner drops runs to `namespace_uid`; an unprivileged
+    one maps itself to root of a new user namespace instead. With `namespace_cgroup`, every
+    command also gets a cgroup v2 with `sandbox_cpus`, `sandbox_memory` (no swap) and
+    `sandbox_pids_limit`; otherwise only the rlimits apply.
+    """
+
+    name = "namespace"
+
+    def __init__(self) -> None:
+        self._cgroup_root = Path(settings.namespace_cgroup) if settings.namespace_cgroup else None
+        self.capabilities = Capabilities(
+            streaming=True, stdin=True, limits=self._cgroup_root is not None, batch=True
+        )
+        self._unshare = shutil.which("unshare")
+        self._uid = settings.namespace_uid if os.geteuid() == 0 else None
+        # Root filesystem -> (monotonic time probed, why it cannot be used or None).
+        self._checked: dict[str, tuple[float, str | None]] = {}
+        # `_argv` runs inside ProcessSandbox._execute, on the calling thread.
+        self._local = threading.local()
+        NEW_ROOT.mkdir(exist_ok=True)
+        DEV_SKELETON.mkdir(exist_ok=True)
+        for device in DEVICES:
+            (DEV_SKELETON / device).touch()
+        with suppress(FileExistsError):
+            (DEV_SKELETON / "fd").symlink_to("/proc/self/fd")
+
+    def start(self) -> None:
+        for rootfs in set(settings.namespace_rootfs.values()):
+            error = self._check(rootfs)
+            if error:
+                logger.error("%s", error)
+
+    def _argv(self, command: str, workspace: Path) -> list[str]:
+        setup = self._local.setup
+        namespaces = ["--mount", "--net", "--pid", "--ipc", "--uts", "--fork", "--kill-child"]
+        chroot = [self._unshare, f"--root={NEW_ROOT}", f"--wd={WORKSPACE}"]
+        if self._uid is None:
+            namespaces = ["--user", "--map-root-user", *namespaces]
+        else:
+            chroot += [f"--setuid={self._uid}", f"--setgid={self._uid}"]
+        init = f'{_INIT}{shlex.join([*limit_argv(), *chroot, "--", "/bin/sh", "-c"])} "$3"\n'
+        cgroup = str(setup.cgroup) if setup.cgroup else ""
+        return [
+            self._unshare, *namespaces, "--", "/bin/sh", "-c", init, "runbox-init",
+            str(setup.state), cgroup, command,
+        ]
+
+    def _environment(self, workspace: Path, env: dict[str, str] | None) -> dict[str, str]:
+        return {"PATH": SANDBOX_PATH, "HOME": WORKSPACE, "LANG": "C.UTF-8", **(env or {})}
+
+    @contextmanager
+    def _workspace(self, files: list[dict[str, str]]) -> Iterator[Path]:
+        with super()._workspace(files) as workspace:
+            if self._uid is not None:
+                for path in [workspace, *workspace.rglob("*")]:
+                    os.lchown(path, self._uid, self._uid)
+            yield workspace
+
+    @contextmanager
+    def _cgroup(self) -> Iterator[Path | None]:
+        if self._cgroup_root is None:
+            yield None
+            return
+        cgroup = self._cgroup_root / f"run-{uuid.uuid4().hex}"
+        cgroup.mkdir()
+        try:
+            quota = int(settings.sandbox_cpus * CPU_PERIOD)
+            (cgroup / "cpu.max").write_text(f"{quota} {CPU_PERIOD}")
+            (cgroup / "memory.max").write_text(str(parse_memory(settings.sandbox_memory)))
+            (cgroup / "pids.max").write_text(str(settings.sandbox_pids_limit))
+            # Absent when the kernel does not account swap.
+            with suppress(FileNotFoundError):
+                (cgroup / "memory.swap.max").write_text("0")
+            yield cgroup
+        finally:
+            _remove_cgroup(cgroup)
+
+    def _account(self, cgroup: Path, result: SandboxResult, usage: RunUsage | None) -> None:
+        events = (cgroup / "memory.events").read_text().split()
+        counts = dict(zip(events[::2], events[1::2]))
+        result.oom_killed = int(counts.get("oom_kill", 0)) > 0
+        peak = cgroup / "memory.peak"
+        if usage is not None and peak.exists():
+            # Covers the whole run, where rusage only sees the largest single process.
+            with _usage_lock:
+                peak_kb = int(peak.read_text()) // 1024
+                usage.peak_memory_kb = max(usage.peak_memory_kb or 0, peak_kb)
+
+    def _execute(
+        self,
+        command: str,
+        workspace: Path,
+        env: dict[str, str],
+        stdin: Iterable[bytes] | None = None,
+        usage: RunUsage | None = None,
+        sink: OutputSink | None = None,
+    ) -> tuple[SandboxResult, int]:
+        env = dict(env)
+        rootfs = env.pop(ROOTFS_ENV)
+        # Outside the workspace, so the run cannot see it or fake the ready marker.
+        with tempfile.TemporaryDirectory(prefix="runbox-ns-") as state, self._cgroup() as cgroup:
+            state = Path(state)
+            (state / "fstab").write_text(_fstab(rootfs, workspace))
+            self._local.setup = _Setup(state, cgroup)
+            result, total = super()._execute(command, workspace, env, stdin, usage, sink)
+            if not (state / "ready").exists():
+                lines = result.stderr.strip().splitlines() or [result.kill_reason or "no output"]
+                error = f"Runner failure: namespace setup failed: {lines[0]}"
+                return SandboxResult(error=error), 0
+            if cgroup:
+                self._account(cgroup, result, usage)
+        return result, total
+
+    def _rootfs(self, language: str) -> str | None:
+        return settings.namespace_rootfs.get(language)
+
+    def _check(self, rootfs: str) -> str | None:
+        """Why runs from `rootfs` cannot work on this host, if they cannot; cached for PROBE_TTL."""
+        checked_at, error = self._checked.get(rootfs, (None, None))
+        if checked_at is None or time.monotonic() - checked_at > PROBE_TTL:
+            error = self._probe(rootfs)
+            self._checked[rootfs] = (time.monotonic(), error)
+        return error
+
+    def _probe(self, rootfs: str) -> str | None:
+        if not self._unshare:
+            return "Runner unavailable: unshare (util-linux) is not installed"
+        if not Path(rootfs).is_dir():
+            return f"Runner unavailable: root filesystem {rootfs} does not exist"
+        if self._cgroup_root is not None:
+            try:
+                (self._cgroup_root / "cgroup.subtree_control").write_text("+cpu +memory +pids")
+            except OSError as exc:
+                return f"Runner unavailable: cannot use cgroup {self._cgroup_root}: {exc}"
+        probe = super().run("probe", [], None, ":", {ROOTFS_ENV: rootfs})
+        if probe.error:
+            return probe.error.replace("Runner failure:", "Runner unavailable:", 1)
+        if probe.exit_code != 0:
+            lines = probe.stderr.strip().splitlines() or [probe.output]
+            return f"Runner unavailable: probe run in {rootfs} failed: {lines[-1]}"
+        return None
+
+    def _unavailable(self, language: str) -> tuple[str | None, str | None]:
+        """The language's root filesystem, or why it cannot run here."""
+        rootfs = self._rootfs(language)
+        if rootfs is None:
+            return None, f"Runner unavailable: no namespace root filesystem for {language!r}"
+        return rootfs, self._check(rootfs)
+
+    def run(
+        self,
+        language: str,
+        files: list[dict[str, str]],
+        build_cmd: str | None,
+        run_cmd: str | None,
+        env: dict[str, str] | None = None,
+        stdin: Iterable[bytes] | None = None,
+        usage: RunUsage | None = None,
+        sink: OutputSink | None = None,
+    ) -> SandboxResult:
+        rootfs, error = self._unavailable(language)
+        if error:
+            return SandboxResult(error=error)
+        env = {**(env or {}), ROOTFS_ENV: rootfs}
+        return super().run(language, files, build_cmd, run_cmd, env, stdin, usage, sink)
+
+    def run_batch(
+        self,
+        language: str,
+        files: list[dict[str, str]],
+        build_cmd: str | None,
+        run_cmd: str | None,
+        variants: list[dict],
+        parallelism: int = 1,
+        env: dict[str, str] | None = None,
+        usage: RunUsage | None = None,
+    ) -> dict:
+        rootfs, error = self._unavailable(language)
+        if error:
+            return {"status": "failed", "output": error, "variants": []}
+        env = {**(env or {}), ROOTFS_ENV: rootfs}
+        return super().run_batch(
+            language, files, build_cmd, run_cmd, variants, parallelism, env, usage
+        )
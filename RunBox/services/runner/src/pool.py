@@ -0,0 +1,245 @@
+from __future__ import annotations
+
+import hashlib
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import suppress
+from dataclasses import dataclass, field
+
+import docker
+from docker.errors import DockerException, ImageNotFound, NotFound
+from docker.models.containers import Container
+from docker.types import Mount, Ulimit
+
+from . import forkserver
+from .config import settings
+from .metrics import pool_acquires, pool_idle
+
+logger = logging.getLogger(__name__)
+
+POOL_LABEL = "runbox.pool"
+# The only writable paths of a pooled container; the root filesystem is read-only.
+WRITABLE_PATHS = ("/workspace", "/tmp", "/dev/shm")
+RESET_COMMAND = (
+    "/bin/sh -c 'kill -9 -1 2>/dev/null; "
+    f"find {' '.join(WRITABLE_PATHS)} -mindepth 1 -maxdepth 1 -exec rm -rf {{}} +'"
+)
+FORKSERVER_REPOSITORY = "runbox-forkserver"
+
+
+def sandbox_ulimits() -> list[Ulimit]:
+    limits = {"nofile": settings.sandbox_nofile_limit, "fsize": settings.sandbox_fsize_limit}
+    return [Ulimit(name=name, soft=limit, hard=limit) for name, limit in limits.items()]
+
+
+@dataclass
+class PooledContainer:
+    language: str
+    container: Container
+    uses: int = 0
+    last_used: float = field(default_factory=time.monotonic)
+
+
+@dataclass
+class PoolStats:
+    hits: int = 0
+    misses: int = 0
+    recycled: int = 0
+    discarded: int = 0
+    evicted: int = 0
+
+
+class ContainerPool:
+    """
+    Per-language pool of pre-started, network-disabled sandbox containers with a read-only root
+    filesystem. Containers are reset (processes killed, the writable paths wiped) before they
+    are reused, so nothing a run leaves behind reaches the next one.
+    """
+
+    def __init__(self, client_factory) -> None:
+        self._client_factory = client_factory
+        self._idle: dict[str, deque[PooledContainer]] = {}
+        # Base image -> the same image with the fork server scripts added.
+        self._forkserver_images: dict[str, str] = {}
+        self._lock = threading.Lock()
+        self.stats = PoolStats()
+
+    def _cache_mounts(self, language: str) -> tuple[dict[str, dict[str, str]], dict[str, str]]:
+        volumes: dict[str, dict[str, str]] = {}
+        environment: dict[str, str] = {}
+        if language == "go":
+            if settings.go_build_cache_volume:
+                volumes[settings.go_build_cache_volume] = {"bind": "/cache/go-build", "mode": "rw"}
+                environment["GOCACHE"] = "/cache/go-build"
+            if settings.go_mod_cache_volume:
+                # Pre-warmed by the operator; read-only so runs cannot poison it for each other.
+                volumes[settings.go_mod_cache_volume] = {"bind": "/go/pkg/mod", "mode": "ro"}
+                environment["GOPROXY"] = "off"
+        return volumes, environment
+
+    def _forkserver_image(self, client: docker.DockerClient, image: str) -> str:
+        """
+        `image` with the fork server scripts baked in, committed once per base image and script
+        version: the read-only root filesystem rules out copying them into each container.
+        """
+        with self._lock:
+            derived = self._forkserver_images.get(image)
+        if derived:
+            return derived
+        archive = forkserver.archive()
+        tag = hashlib.sha256(image.encode() + archive).hexdigest()[:16]
+        derived = f"{FORKSERVER_REPOSITORY}:{tag}"
+        try:
+            client.images.get(derived)
+        except ImageNotFound:
+            builder = client.containers.create(image=image, command="/bin/true")
+            try:
+                builder.put_archive(path="/", data=archive)
+                builder.commit(repository=FORKSERVER_REPOSITORY, tag=tag)
+            finally:
+                builder.remove(force=True)
+        with self._lock:
+            self._forkserver_images[image] = derived
+        return derived
+
+    def _create(self, language: str, image: str) -> PooledContainer:
+        client: docker.DockerClient = self._client_factory()
+        volumes, environment = self._cache_mounts(language)
+        with_forkserver = forkserver.enabled(language)
+        if with_forkserver:
+            image = self._forkserver_image(client, image)
+        container = client.containers.create(
+            image=image,
+            # As init, the fork server outlives the reset's `kill -9 -1`.
+            command=forkserver.container_command() if with_forkserver else "/bin/sh",
+            tty=True,
+            stdin_open=True,
+            detach=True,
+            # Docker creates the working dir, saving an exec round-trip per container.
+            working_dir="/workspace",
+            mem_limit=settings.sandbox_memory,
+            # Equal to mem_limit: no swap, so a runaway allocation hits the OOM killer promptly.
+            memswap_limit=settings.sandbox_memory,
+            pids_limit=settings.sandbox_pids_limit,
+            ulimits=sandbox_ulimits(),
+            nano_cpus=int(settings.sandbox_cpus * 1e9),
+            network_disabled=True,
+            labels={POOL_LABEL: language},
+            read_only=True,
+            # A volume rather than a tmpfs: put_archive cannot write into a tmpfs (or anywhere
+            # else) in a read-only container.
+            mounts=[Mount(target="/workspace", source=None, type="volume")],
+            tmpfs={"/tmp": f"rw,nosuid,nodev,size={settings.sandbox_tmp_size},mode=1777"},
+            volumes=volumes,
+            # Toolchain caches under $HOME (e.g. Go's) land on the wiped /tmp.
+            environment={"HOME": "/tmp", **environment},
+        )
+        container.start()
+        return PooledContainer(language=language, container=container)
+
+    def _destroy(self, pooled: PooledContainer) -> None:
+        with suppress(NotFound, DockerException):
+            # v=True also removes the anonymous /workspace volume.
+            pooled.container.remove(force=True, v=True)
+
+    def _reset(self, pooled: PooledContainer) -> bool:
+        try:
+            exit_code, _ = pooled.container.exec_run(RESET_COMMAND)
+        except DockerException:
+            return False
+        return exit_code == 0
+
+    def acquire(self, language: str, image: str) -> PooledContainer:
+        self.evict_idle()
+        with self._lock:
+            idle = self._idle.get(language)
+            pooled = idle.pop() if idle else None
+            if pooled:
+                self.stats.hits += 1
+                pool_idle.labels(language).set(len(idle))
+            else:
+                self.stats.misses += 1
+        pool_acquires.labels(language, "hit" if pooled else "miss").inc()
+        if pooled is None:
+            pooled = self._create(language, image)
+        pooled.uses += 1
+        return pooled
+
+    def release(self, pooled: PooledContainer, tainted: bool = False) -> None:
+        if not settings.pool_enabled or tainted or pooled.uses >= settings.pool_max_reuse:
+            self._discard(pooled)
+            return
+        if not self._reset(pooled):
+            self._discard(pooled)
+            return
+
+        pooled.last_used = time.monotonic()
+        with self._lock:
+            idle = self._idle.setdefault(pooled.language, deque())
+            if len(idle) >= settings.pool_max_idle:
+                pooled_to_drop = pooled
+            else:
+                idle.append(pooled)
+                self.stats.recycled += 1
+                pooled_to_drop = None
+                pool_idle.labels(pooled.language).set(len(idle))
+        if pooled_to_drop:
+            self._discard(pooled_to_drop)
+
+    def _discard(self, pooled: PooledContainer) -> None:
+        with self._lock:
+            self.stats.discarded += 1
+        self._destroy(pooled)
+
+    def evict_idle(self) -> None:
+        deadline = time.monotonic() - settings.pool_idle_ttl
+        expired: list[PooledContainer] = []
+        with self._lock:
+            for language, idle in self._idle.items():
+                while len(idle) > settings.pool_min_idle and idle[0].last_used < deadline:
+                    expired.append(idle.popleft())
+                pool_idle.labels(language).set(len(idle))
+            self.stats.evicted += len(expired)
+        for pooled in expired:
+            self._destroy(pooled)
+
+    def fill(self, images: dict[str, str]) -> None:
+        if not settings.pool_enabled:
+            return
+        for language, image in images.items():
+            with self._lock:
+                missing = settings.pool_min_idle - len(self._idle.get(language, ()))
+            for _ in range(max(missing, 0)):
+                try:
+                    pooled = self._create(language, image)
+                except DockerException as exc:
+                    logger.warning("Could not pre-start %s container: %s", language, exc)
+                    break
+                with self._lock:
+                    idle = self._idle.setdefault(language, deque())
+                    idle.append(pooled)
+                    pool_idle.labels(language).set(len(idle))
+
+    def drain(self) -> None:
+        with self._lock:
+            pooled = [item for idle in self._idle.values() for item in idle]
+            for language in self._idle:
+                pool_idle.labels(language).set(0)
+            self._idle.clear()
+        for item in pooled:
+            self._destroy(item)
+
+    def snapshot(self) -> dict[str, int | dict[str, int]]:
+        with self._lock:
+            lookups = self.stats.hits + self.stats.misses
+            return {
+                "hits": self.stats.hits,
+                "misses": self.stats.misses,
+                "hit_ratio_pct": int(self.stats.hits * 100 / lookups) if lookups else 0,
+                "recycled": self.stats.recycled,
+                "discarded": self.stats.discarded,
+                "evicted": self.stats.evicted,
+                "idle": {language: len(idle) for language, idle in self._idle.items()},
+            }
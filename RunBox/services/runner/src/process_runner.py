@@ -0,0 +1,310 @@
+from __future__ import annotations
+
+import os
+import resource
+import selectors
+import shlex
+import signal
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack, contextmanager, suppress
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from typing import IO, Callable, Iterable, Iterator
+
+from runbox_sandbox import STDIN_DIR, Capabilities, SandboxResult, workspace_path
+
+from .accounting import RunUsage
+from .backends import DEFAULT_RUN_COMMAND
+from .config import settings
+from .slots import parse_memory
+from .streaming import OutputPublisher
+
+READ_CHUNK = 64 * 1024
+# How often a blocked read loop checks whether the process has exited.
+POLL_INTERVAL = 0.05
+
+OutputSink = Callable[[str, bytes], bool]
+
+# Batch variants fold their rusage into one RunUsage from several threads.
+_usage_lock = threading.Lock()
+
+
+def limit_argv() -> list[str]:
+    """
+    util-linux `prlimit` prefix applying the sandbox rlimits to the command it wraps. The
+    worker is threaded, so they are not set from a `preexec_fn` between fork and exec.
+    """
+    memory = parse_memory(settings.sandbox_memory)
+    cpu_seconds = settings.sandbox_timeout
+    return [
+        "prlimit",
+        # RLIMIT_DATA rather than RLIMIT_AS: Go and V8 reserve large PROT_NONE regions up front.
+        f"--data={memory}",
+        f"--cpu={cpu_seconds}:{cpu_seconds + 1}",
+        f"--nofile={settings.sandbox_nofile_limit}",
+        f"--fsize={settings.sandbox_fsize_limit}",
+        "--",
+    ]
+
+
+def _kill_group(pid: int) -> None:
+    with suppress(ProcessLookupError, PermissionError):
+        os.killpg(pid, signal.SIGKILL)
+
+
+def _feed(pipe: IO[bytes], chunks: Iterable[bytes]) -> None:
+    try:
+        for chunk in chunks:
+            pipe.write(chunk)
+            pipe.flush()
+    except (BrokenPipeError, ConnectionResetError, ValueError):
+        # The process exited (or was killed) without reading all of its input.
+        pass
+    finally:
+        with suppress(OSError):
+            pipe.close()
+
+
+def _exited(pid: int) -> bool:
+    """Whether `pid` has exited, without reaping it (its rusage is collected later)."""
+    return os.waitid(os.P_PID, pid, os.WEXITED | os.WNOHANG | os.WNOWAIT) is not None
+
+
+def _add_rusage(usage: RunUsage, rusage: resource.struct_rusage) -> None:
+    with _usage_lock:
+        usage.cpu_user_ms = (usage.cpu_user_ms or 0) + int(rusage.ru_utime * 1000)
+        usage.cpu_system_ms = (usage.cpu_system_ms or 0) + int(rusage.ru_stime * 1000)
+        usage.peak_memory_kb = max(usage.peak_memory_kb or 0, rusage.ru_maxrss)
+        # ru_oublock counts 512-byte blocks written to storage.
+        usage.io_write_bytes = (usage.io_write_bytes or 0) + rusage.ru_oublock * 512
+
+
+class ProcessSandbox:
+    """
+    Runs jobs as local process groups in throwaway workspaces, under rlimits derived from
+    `sandbox_memory` and `sandbox_timeout` but with no further isolation: for development and
+    for hosts where the runner itself is the sandbox. Each command runs in its own session, is
+    read through one selector loop and has its whole group killed at the deadline. Subclasses
+    isolate further by overriding `_argv`.
+    """
+
+    name = "process"
+    capabilities = Capabilities(streaming=True, stdin=True, batch=True)
+
+    def start(self) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+    def stats(self) -> dict:
+        return {}
+
+    def _argv(self, command: str, workspace: Path) -> list[str]:
+        return [*limit_argv(), "/bin/sh", "-c", command]
+
+    def _environment(self, workspace: Path, env: dict[str, str] | None) -> dict[str, str]:
+        # Not the worker's environment: that carries broker URLs and credentials.
+        path = os.environ.get("PATH", os.defpath)
+        return {"PATH": path, "HOME": str(workspace), "LANG": "C.UTF-8", **(env or {})}
+
+    @contextmanager
+    def _workspace(self, files: list[dict[str, str]]) -> Iterator[Path]:
+        with TemporaryDirectory(prefix="runbox-") as tmp:
+            workspace = Path(tmp)
+            for file in files:
+                path = workspace_path(workspace, file["name"])
+                path.parent.mkdir(parents=True, exist_ok=True)
+                path.write_text(file["content"], encoding="utf-8")
+            yield workspace
+
+    def _execute(
+        self,
+        command: str,
+        workspace: Path,
+        env: dict[str, str],
+        stdin: Iterable[bytes] | None = None,
+        usage: RunUsage | None = None,
+        sink: OutputSink | None = None,
+    ) -> tuple[SandboxResult, int]:
+        """
+        Run `command` to exit or `sandbox_timeout`, keeping `sandbox_output_limit` bytes per
+        stream; `sink`, when given, also receives every chunk and stops the run by returning
+        False. Returns the result and the total bytes produced.
+        """
+        process = subprocess.Popen(
+            self._argv(command, workspace),
+            cwd=workspace,
+            env=env,
+            stdin=subprocess.DEVNULL if stdin is None else subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            start_new_session=True,
+        )
+        if stdin is not None:
+            threading.Thread(target=_feed, args=(process.stdin, stdin), daemon=True).start()
+
+        deadline = time.monotonic() + settings.sandbox_timeout
+        limit = settings.sandbox_output_limit
+        buffers = {"stdout": bytearray(), "stderr": bytearray()}
+        total = 0
+        result = SandboxResult()
+        stopped = False
+        with selectors.DefaultSelector() as selector:
+            selector.register(process.stdout, selectors.EVENT_READ, "stdout")
+            selector.register(process.stderr, selectors.EVENT_READ, "stderr")
+            while selector.get_map() and not stopped:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    result.timed_out = True
+                    break
+                for key, _ in selector.select(min(remaining, POLL_INTERVAL)):
+                    data = os.read(key.fd, READ_CHUNK)
+                    if not data:
+                        selector.unregister(key.fileobj)
+                        continue
+                    total += len(data)
+                    if sink and not sink(key.data, data):
+                        stopped = True
+                        break
+                    buffer = buffers[key.data]
+                    room = limit - len(buffer)
+                    if len(data) > room:
+                        result.truncated = True
+                        data = data[:max(room, 0)]
+                    buffer.extend(data)
+                if _exited(process.pid):
+                    # Background processes left in the group would otherwise keep the pipes open.
+                    _kill_group(process.pid)
+        _kill_group(process.pid)
+        _, status, rusage = os.wait4(process.pid, 0)
+        process.returncode = os.waitstatus_to_exitcode(status)
+        for pipe in (process.stdout, process.stderr):
+            pipe.close()
+
+        if not result.timed_out and not stopped:
+            code = process.returncode
+            result.exit_code = code if code >= 0 else 128 - code
+        result.stdout = buffers["stdout"].decode(errors="replace")
+        result.stderr = buffers["stderr"].decode(errors="replace")
+        if usage is not None:
+            _add_rusage(usage, rusage)
+        return result, total
+
+    def _build(
+        self, build_cmd: str | None, workspace: Path, env: dict[str, str], usage: RunUsage
+    ) -> SandboxResult | None:
+        """Run the build step; returns its result only when it failed."""
+        if not build_cmd:
+            return None
+        with usage.phase("build_ms"):
+            build, _ = self._execute(build_cmd, workspace, env, usage=usage)
+        return build if build.failure_cause() else None
+
+    def run(
+        self,
+        language: str,
+        files: list[dict[str, str]],
+        build_cmd: str | None,
+        run_cmd: str | None,
+        env: dict[str, str] | None = None,
+        stdin: Iterable[bytes] | None = None,
+        usage: RunUsage | None = None,
+        sink: OutputSink | None = None,
+    ) -> SandboxResult:
+        usage = usage or RunUsage()
+        command = run_cmd or DEFAULT_RUN_COMMAND.get(language)
+        if not command:
+            return SandboxResult(error=f"Runner failure: language {language!r} is not supported")
+        try:
+            with ExitStack() as stack:
+                with usage.phase("setup_ms"):
+                    workspace = stack.enter_context(self._workspace(files))
+                environment = self._environment(workspace, env)
+                failed = self._build(build_cmd, workspace, environment, usage)
+                if failed:
+                    return failed
+                with usage.phase("exec_ms"):
+                    result, usage.output_bytes = self._execute(
+                        command, workspace, environment, stdin, usage, sink
+                    )
+                return result
+        except (OSError, ValueError) as exc:
+            return SandboxResult(error=f"Runner failure: {exc}")
+
+    def stream(
+        self,
+        language: str,
+        files: list[dict[str, str]],
+        build_cmd: str | None,
+        run_cmd: str | None,
+        publisher: OutputPublisher,
+        env: dict[str, str] | None = None,
+        stdin: Iterable[bytes] | None = None,
+        usage: RunUsage | None = None,
+    ) -> SandboxResult:
+        """Run like `run`, forwarding output to `publisher`; its cap stops the run."""
+        usage = usage or RunUsage()
+        result = self.run(language, files, build_cmd, run_cmd, env, stdin, usage, publisher.write)
+        result.stdout, result.stderr = publisher.stdout, publisher.stderr
+        result.truncated = publisher.truncated
+        usage.output_bytes = publisher.total_bytes
+        publisher.close(result.exit_code, error=result.error or result.kill_reason)
+        return result
+
+    def run_batch(
+        self,
+        language: str,
+        files: list[dict[str, str]],
+        build_cmd: str | None,
+        run_cmd: str | None,
+        variants: list[dict],
+        parallelism: int = 1,
+        env: dict[str, str] | None = None,
+        usage: RunUsage | None = None,
+    ) -> dict:
+        """Build once, then run each variant with its own deadline, `parallelism` at a time."""
+        usage = usage or RunUsage()
+        command = run_cmd or DEFAULT_RUN_COMMAND.get(language)
+        if not command:
+            output = f"Runner failure: language {language!r} is not supported"
+            return {"status": "failed", "output": output, "variants": []}
+        stdin_files = [
+            {"name": f"{STDIN_DIR}/{index}", "content": variant.get("stdin") or ""}
+            for index, variant in enumerate(variants)
+        ]
+        try:
+            with ExitStack() as stack:
+                with usage.phase("setup_ms"):
+                    workspace = stack.enter_context(self._workspace(files + stdin_files))
+                environment = self._environment(workspace, env)
+                failed = self._build(build_cmd, workspace, environment, usage)
+                if failed:
+                    return {"status": "failed", "output": failed.output, "variants": []}
+
+                def run_variant(index: int) -> dict:
+                    args = shlex.join(variants[index].get("args") or [])
+                    line = f"{command} {args} < {STDIN_DIR}/{index}"
+                    started = time.monotonic()
+                    result, produced = self._execute(line, workspace, environment, usage=usage)
+                    return {
+                        "index": index,
+                        "exit_code": result.exit_code,
+                        "stdout": result.stdout,
+                        "stderr": result.stderr,
+                        "timed_out": result.timed_out,
+                        "truncated": result.truncated,
+                        "output_bytes": produced,
+                        "duration_ms": int((time.monotonic() - started) * 1000),
+                    }
+
+                workers = max(parallelism, 1)
+                with usage.phase("exec_ms"), ThreadPoolExecutor(max_workers=workers) as executor:
+                    results = list(executor.map(run_variant, range(len(variants))))
+                usage.output_bytes = sum(r.pop("output_bytes") for r in results)
+                return {"status": "completed", "output": "", "variants": results}
+        except (OSError, ValueError) as exc:
+            return {"status": "failed", "output": f"Runner failure: {exc}", "variants": []}
@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+import os
+import socket
+import time
+import uuid
+from functools import lru_cache
+
+from runbox_sandbox import DONE_KEY, DONE_TTL, PENDING_KEY
+
+from .celeryconfig import batch_time_limits, task_time_limits
+from .config import settings
+from .streaming import get_redis
+
+MEMORY_UNITS = {"b": 1, "k": 1024, "m": 1024**2, "g": 1024**3}
+
+
+def parse_memory(value: str) -> int:
+    value = value.strip().lower()
+    if value and value[-1] in MEMORY_UNITS:
+        return int(float(value[:-1]) * MEMORY_UNITS[value[-1]])
+    return int(value)
+
+
+@lru_cache()
+def host_slots() -> int:
+    """Concurrent sandboxes this host fits, given each one's `sandbox_cpus`/`sandbox_memory`."""
+    by_cpu = int((os.cpu_count() or 1) / settings.sandbox_cpus)
+    try:
+        memory = os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+        by_memory = memory // parse_memory(settings.sandbox_memory)
+    except (ValueError, OSError):
+        by_memory = by_cpu
+    return max(1, min(by_cpu, by_memory))
+
+
+def lease_seconds() -> int:
+    """
+    Slots outlive any task that could hold them: past its hard time limit, a task's worker
+    process has been killed and the slot it held is free to reclaim.
+    """
+    if settings.slot_lease_seconds:
+        return settings.slot_lease_seconds
+    return max(task_time_limits()[1], batch_time_limits()[1])
+
+
+class LanguageSlots:
+    """
+    Per-host, per-language counting semaphore shared by all worker processes through Redis.
+    Holders are kept in a sorted set by acquisition time, so waiters are admitted roughly in
+    arrival order and slots held by crashed workers expire.
+    """
+
+    def __init__(self) -> None:
+        self._host = socket.gethostname()
+
+    def _key(self, language: str) -> str:
+        return f"runbox:slots:{self._host}:{language}"
+
+    def limit(self, language: str) -> int:
+        return settings.language_slots.get(language, host_slots())
+
+    def acquire(self, language: str, timeout: float) -> str | None:
+        client = get_redis()
+        key = self._key(language)
+        token = uuid.uuid4().hex
+        deadline = time.monotonic() + timeout
+        client.zadd(key, {token: time.time()})
+        try:
+            while True:
+                client.zremrangebyscore(key, 0, time.time() - lease_seconds())
+                rank = client.zrank(key, token)
+                if rank is None:
+                    client.zadd(key, {token: time.time()})
+                elif rank < self.limit(language):
+                    return token
+                if time.monotonic() >= deadline:
+                    client.zrem(key, token)
+                    return None
+                time.sleep(settings.slot_poll_interval)
+        except Exception:
+            client.zrem(key, token)
+            raise
+
+    def release(self, language: str, token: str) -> None:
+        get_redis().zrem(self._key(language), token)
+
+    def occupancy(self, language: str) -> tuple[int, int]:
+        """(held, waiting) for this host: the set holds holders first, then waiters."""
+        members = get_redis().zcount(self._key(language), time.time() - lease_seconds(), "+inf")
+        limit = self.limit(language)
+        return min(members, limit), max(members - limit, 0)
+
+
+def release_pending(run_id: str, client: str) -> None:
+    """Release the run's slot in its client's pending count, unless the API already did."""
+    redis = get_redis()
+    if not redis.set(DONE_KEY.format(run_id=run_id), 1, nx=True, ex=DONE_TTL):
+        return
+    key = PENDING_KEY.format(client=client)
+    if redis.decr(key) < 0:
+        # The count expired while the run was pending.
+        redis.delete(key)
+
+
+language_slots = LanguageSlots()
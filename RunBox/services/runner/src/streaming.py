@@ -0,0 +1,162 @@
+from __future__ import annotations
+
+import codecs
+import threading
+import time
+from typing import Iterator
+
+import redis
+
+from .config import settings
+
+_redis: redis.Redis | None = None
+
+
+def get_redis() -> redis.Redis:
+    global _redis
+    if _redis is None:
+        _redis = redis.Redis.from_url(settings.redis_url)
+    return _redis
+
+
+def stream_key(run_id: str) -> str:
+    return f"runbox:runs:{run_id}:output"
+
+
+def input_key(run_id: str) -> str:
+    return f"runbox:runs:{run_id}:input"
+
+
+def input_chunks(run_id: str, client: redis.Redis | None = None) -> Iterator[bytes]:
+    """
+    Yield stdin chunks the API relays from an interactive session (`data` entries) until
+    an `eof` entry arrives or nothing is received for `stdin_idle_timeout` seconds.
+    """
+    client = client or get_redis()
+    key = input_key(run_id)
+    cursor = "0-0"
+    idle_ms = 0
+    while idle_ms < settings.stdin_idle_timeout * 1000:
+        batches = client.xread({key: cursor}, count=100, block=settings.stdin_block_ms)
+        if not batches:
+            idle_ms += settings.stdin_block_ms
+            continue
+        idle_ms = 0
+        for entry_id, fields in batches[0][1]:
+            cursor = entry_id
+            if b"eof" in fields:
+                return
+            yield fields.get(b"data", b"")
+
+
+class OutputPublisher:
+    """
+    Publishes framed stdout/stderr chunks with sequence numbers to a per-run Redis stream.
+    XADD is synchronous, so a slow Redis naturally slows down reading from the sandbox,
+    and the stream itself is trimmed to `stream_maxlen` entries. Buffered output is flushed
+    after `stream_flush_interval` even when the program goes quiet (e.g. waiting on input),
+    by a flusher thread started with the first write.
+    """
+
+    def __init__(self, run_id: str, client: redis.Redis | None = None) -> None:
+        self.key = stream_key(run_id)
+        self._client = client or get_redis()
+        self._seq = 0
+        self._total = 0
+        self._buffers: dict[str, bytearray] = {"stdout": bytearray(), "stderr": bytearray()}
+        self._decoders = {
+            name: codecs.getincrementaldecoder("utf-8")("replace") for name in self._buffers
+        }
+        self._last_flush = time.monotonic()
+        # Guards the buffers and the stream between `write` and the flusher thread.
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+        self._flusher: threading.Thread | None = None
+        self.captured: dict[str, list[str]] = {"stdout": [], "stderr": []}
+        self.truncated = False
+
+    def _xadd(self, fields: dict[str, str | int]) -> None:
+        fields["seq"] = self._seq
+        self._seq += 1
+        self._client.xadd(self.key, fields, maxlen=settings.stream_maxlen, approximate=True)
+
+    def _flush(self, name: str, final: bool = False) -> None:
+        buffer = self._buffers[name]
+        text = self._decoders[name].decode(bytes(buffer), final=final)
+        buffer.clear()
+        if text:
+            self.captured[name].append(text)
+            self._xadd({"event": "chunk", "stream": name, "data": text})
+
+    def _flush_all(self) -> None:
+        for name in self._buffers:
+            self._flush(name)
+        self._last_flush = time.monotonic()
+
+    def _flush_idle(self) -> None:
+        """Flusher thread: publish output that has sat in the buffers for a flush interval."""
+        interval = settings.stream_flush_interval
+        timeout = interval
+        while not self._closed.wait(timeout):
+            with self._lock:
+                if self._closed.is_set():
+                    return
+                waited = time.monotonic() - self._last_flush
+                if waited >= interval and any(self._buffers.values()):
+                    self._flush_all()
+                    waited = 0.0
+                timeout = max(interval - waited, 0.001)
+
+    def write(self, name: str, data: bytes) -> bool:
+        """Buffer a chunk; returns False once the byte cap has been reached."""
+        with self._lock:
+            if self.truncated:
+                return False
+            remaining = settings.stream_max_bytes - self._total
+            if len(data) > remaining:
+                data = data[:remaining]
+                self.truncated = True
+            self._total += len(data)
+            self._buffers[name].extend(data)
+
+            if (
+                self.truncated
+                or len(self._buffers[name]) >= settings.stream_chunk_bytes
+                or time.monotonic() - self._last_flush >= settings.stream_flush_interval
+            ):
+                self._flush_all()
+            elif self._flusher is None and not self._closed.is_set():
+                self._flusher = threading.Thread(
+                    target=self._flush_idle, name=f"flush-{self.key}", daemon=True
+                )
+                self._flusher.start()
+            return not self.truncated
+
+    def close(self, exit_code: int | None, error: str | None = None) -> None:
+        self._closed.set()
+        if self._flusher is not None:
+            self._flusher.join()
+        for name in self._buffers:
+            self._flush(name, final=True)
+        fields: dict[str, str | int] = {
+            "event": "end",
+            "exit_code": -1 if exit_code is None else exit_code,
+        }
+        if self.truncated:
+            fields["truncated"] = 1
+        if error:
+            fields["error"] = error
+        self._xadd(fields)
+        self._client.expire(self.key, settings.stream_ttl)
+
+    @property
+    def total_bytes(self) -> int:
+        return self._total
+
+    @property
+    def stdout(self) -> str:
+        return "".join(self.captured["stdout"])
+
+    @property
+    def stderr(self) -> str:
+        return "".join(self.captured["stderr"])
@@ -0,0 +1,133 @@
+from __future__ import annotations
+
+import logging
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from docker.errors import DockerException
+
+from .backends import DEFAULT_RUN_COMMAND, ExecutionBackend
+from .config import settings
+
+if TYPE_CHECKING:
+    from .docker_runner import DockerSandbox
+
+logger = logging.getLogger(__name__)
+
+WARMUP_FILES = {
+    "python": [{"name": "Main.py", "content": 'print("ok")\n'}],
+    "node": [{"name": "Main.mjs", "content": 'console.log("ok");\n'}],
+    "go": [
+        {
+            "name": "Main.go",
+            "content": 'package main\n\nimport "fmt"\n\nfunc main() {\n\tfmt.Println("ok")\n}\n',
+        }
+    ],
+    "rust": [{"name": "Main.rs", "content": 'fn main() {\n    println!("ok");\n}\n'}],
+}
+
+
+@dataclass
+class LanguageWarmup:
+    image: str | None = None
+    pinned: str | None = None
+    pull_ms: int | None = None
+    warmup_ms: int | None = None
+    error: str | None = None
+
+
+class RunnerWarmup:
+    """
+    Startup phase of a runner: pull every image in IMAGE_MAP and pin it to its registry digest
+    (Docker backend only), then run a trivial program per language so images, page cache and
+    toolchain caches are hot before the first real run. Readiness is signalled through
+    `readiness_file`.
+    """
+
+    def __init__(self) -> None:
+        self.report: dict[str, LanguageWarmup] = {}
+        self.ready = False
+
+    def _images(self, sandbox: ExecutionBackend) -> dict[str, str]:
+        """Images to pull and pin, by language; only the Docker backend runs from images."""
+        if sandbox.name != "docker":
+            return {}
+        from .docker_runner import IMAGE_MAP
+
+        return IMAGE_MAP
+
+    def _pin(
+        self,
+        sandbox: DockerSandbox,
+        images: dict[str, str],
+        language: str,
+        entry: LanguageWarmup,
+    ) -> None:
+        started = time.monotonic()
+        image = sandbox.get_client().images.pull(entry.image)
+        entry.pull_ms = int((time.monotonic() - started) * 1000)
+        if not settings.image_pin_digests:
+            return
+        name = entry.image.split("@", 1)[0].rsplit(":", 1)[0].rsplit("/", 1)[-1]
+        digests = image.attrs.get("RepoDigests") or []
+        # Pick the digest of the repository we asked for; locally built images have none.
+        entry.pinned = next(
+            (digest for digest in digests if digest.split("@", 1)[0].rsplit("/", 1)[-1] == name),
+            None,
+        )
+        if entry.pinned:
+            images[language] = entry.pinned
+
+    def _warm(self, sandbox: ExecutionBackend, language: str, entry: LanguageWarmup) -> None:
+        started = time.monotonic()
+        result = sandbox.run(
+            language=language, files=WARMUP_FILES[language], build_cmd=None, run_cmd=None
+        )
+        entry.warmup_ms = int((time.monotonic() - started) * 1000)
+        if result.failure_cause() or result.stdout.strip() != "ok":
+            raise RuntimeError(f"warm-up run produced unexpected output: {result.output[:200]!r}")
+
+    def run(self, sandbox: ExecutionBackend) -> bool:
+        self.ready = False
+        self.report = {}
+        images = self._images(sandbox)
+        for language in DEFAULT_RUN_COMMAND:
+            image = images.get(language)
+            entry = self.report[language] = LanguageWarmup(image=image)
+            try:
+                if settings.image_pull_on_startup and image:
+                    self._pin(sandbox, images, language, entry)
+                if settings.warmup_enabled and language in WARMUP_FILES:
+                    self._warm(sandbox, language, entry)
+            except (DockerException, RuntimeError) as exc:
+                entry.error = str(exc)
+                logger.error("Warm-up of %s (%s) failed: %s", language, image, exc)
+                continue
+            logger.info(
+                "Warmed %s: image %s, pull %s ms, warm-up %s ms",
+                language,
+                entry.pinned or entry.image,
+                entry.pull_ms,
+                entry.warmup_ms,
+            )
+
+        self.ready = not any(entry.error for entry in self.report.values())
+        if self.ready and settings.readiness_file:
+            Path(settings.readiness_file).touch()
+        return self.ready
+
+    def clear(self) -> None:
+        self.ready = False
+        if settings.readiness_file:
+            Path(settings.readiness_file).unlink(missing_ok=True)
+
+    def snapshot(self) -> dict:
+        return {
+            "ready": self.ready,
+            "languages": {language: asdict(entry) for language, entry in self.report.items()},
+        }
+
+
+runner_warmup = RunnerWarmup()
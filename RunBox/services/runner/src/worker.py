@@ -1,30 +1,287 @@
 from __future__ import annotations
 
+import gzip
 import json
 import logging
+import os
+import time
+import urllib.parse
+import urllib.request
+from dataclasses import asdict
+from pathlib import Path
+from typing import Iterator
 
 from celery import Celery
+from celery.exceptions import SoftTimeLimitExceeded
+from celery.signals import (
+    task_postrun,
+    worker_init,
+    worker_process_init,
+    worker_process_shutdown,
+    worker_shutdown,
+)
 
+from runbox_sandbox import SandboxResult, failure_cause
+from runbox_sandbox.tasks import LOG_GZIP_LEVEL, log_preview
+
+from .accounting import RunUsage
+from .backends import DEFAULT_RUN_COMMAND, get_backend
+from .celeryconfig import batch_time_limits, celery_config, task_time_limits
 from .config import settings
-from .docker_runner import sandbox
+from .metrics import mark_process_dead, observe_run, slot_wait, start_exporter
+from .slots import host_slots, language_slots, release_pending
+from .streaming import OutputPublisher, input_chunks
+from .warmup import runner_warmup
 
 logger = logging.getLogger(__name__)
 
 celery_app = Celery(__name__, broker=settings.redis_url, backend=settings.redis_url)
-celery_app.conf.update(task_default_queue=settings.queue_name)
+celery_app.conf.update(
+    celery_config(),
+    worker_concurrency=settings.worker_concurrency or host_slots(),
+)
+SOFT_TIME_LIMIT, TIME_LIMIT = task_time_limits()
+BATCH_SOFT_TIME_LIMIT, BATCH_TIME_LIMIT = batch_time_limits()
+sandbox = get_backend()
+
+
+@worker_init.connect
+def warm_runner(**_: object) -> None:
+    start_exporter(DEFAULT_RUN_COMMAND)
+    # Runs in the parent before the pool forks, so children inherit the pinned IMAGE_MAP.
+    if not runner_warmup.run(sandbox):
+        logger.error("Runner warm-up failed; not reporting ready")
+    sandbox.close()
+
+
+@worker_shutdown.connect
+def clear_readiness(**_: object) -> None:
+    runner_warmup.clear()
+
+
+@worker_process_init.connect
+def warm_pool(**_: object) -> None:
+    sandbox.start()
+
+
+@worker_process_shutdown.connect
+def drain_pool(**_: object) -> None:
+    sandbox.close()
+    mark_process_dead(os.getpid())
+
+
+@task_postrun.connect
+def finish_run(task: object = None, args: tuple = (), **_: object) -> None:
+    """Release the client's pending slot once the run has ended, however it ended."""
+    if getattr(task, "name", None) not in (execute_run.name, execute_batch.name) or not args:
+        return
+    payload = args[0]
+    if payload.get("id") and payload.get("client"):
+        try:
+            release_pending(payload["id"], payload["client"])
+        except Exception:
+            # The API releases it when it reads the result.
+            logger.exception("Failed to release the pending slot of run %s", payload["id"])
 
 
-@celery_app.task(name="runner.execute")
+def _acquire_slot(run_id: str | None, language: str) -> str | None:
+    waited = time.monotonic()
+    token = language_slots.acquire(language, settings.slot_wait_timeout)
+    if token is None:
+        logger.warning("Run %s gave up waiting for a %s slot", run_id, language)
+    else:
+        waited = time.monotonic() - waited
+        slot_wait.labels(_label(language)).observe(waited)
+        logger.info("Run %s waited %.0f ms for a slot", run_id, waited * 1000)
+    return token
+
+
+def _queued_usage(payload: dict, started: float) -> RunUsage:
+    """Queue time covers the broker (from the API's `submitted_at`) and the slot wait."""
+    submitted_at = payload.get("submitted_at")
+    waited = time.time() - submitted_at if submitted_at else time.monotonic() - started
+    return RunUsage(queue_ms=max(int(waited * 1000), 0))
+
+
+@celery_app.task(name="runner.execute", soft_time_limit=SOFT_TIME_LIMIT, time_limit=TIME_LIMIT)
 def execute_run(payload: dict) -> str:
-    logger.info("Executing run %s", payload.get("id"))
+    run_id = payload.get("id")
+    language = payload.get("language", "python")
+    logger.info("Executing run %s", run_id)
+
+    started = time.monotonic()
+    token = _acquire_slot(run_id, language)
+    if token is None:
+        output = f"Runner failure: no {language} slot available"
+        return _result(language, started, {"output": output, "status": "failed"})
+    usage = _queued_usage(payload, started)
+
+    try:
+        result = _execute(payload, language, usage)
+    except SoftTimeLimitExceeded:
+        logger.warning("Run %s exceeded the %ss task time limit", run_id, SOFT_TIME_LIMIT)
+        result = SandboxResult(error=f"Runner failure: time limit of {SOFT_TIME_LIMIT}s exceeded")
+    finally:
+        language_slots.release(language, token)
+    logger.info("Run %s finished", run_id)
+    data = {
+        "output": result.output,
+        "status": "failed" if result.failure_cause() else "completed",
+        "exit_code": result.exit_code,
+        "timed_out": result.timed_out,
+        "oom_killed": result.oom_killed,
+        "truncated": result.truncated,
+        "usage": asdict(usage),
+    }
+    if data["status"] == "failed":
+        data["cause"] = result.failure_cause()
+    return _result(language, started, _offload_output(payload, data))
+
+
+# The API sends limits scaled to each batch's variant count; these cover the largest batch.
+@celery_app.task(
+    name="runner.execute_batch",
+    soft_time_limit=BATCH_SOFT_TIME_LIMIT,
+    time_limit=BATCH_TIME_LIMIT,
+)
+def execute_batch(payload: dict) -> str:
+    run_id = payload.get("id")
+    language = payload.get("language", "python")
+    variants = payload.get("variants", [])
+    logger.info("Executing batch %s with %s variants", run_id, len(variants))
+
+    started = time.monotonic()
+    token = _acquire_slot(run_id, language)
+    if token is None:
+        output = f"Runner failure: no {language} slot available"
+        return _result(language, started, {"output": output, "status": "failed", "variants": []})
+    usage = _queued_usage(payload, started)
+
+    try:
+        result = sandbox.run_batch(
+            language=language,
+            files=payload.get("files", []),
+            build_cmd=payload.get("build_cmd"),
+            run_cmd=payload.get("run_cmd"),
+            variants=variants,
+            parallelism=payload.get("parallelism", 1),
+            env=payload.get("env"),
+            usage=usage,
+        )
+    except SoftTimeLimitExceeded:
+        logger.warning("Batch %s exceeded its task time limit", run_id)
+        output = "Runner failure: time limit of the batch exceeded"
+        result = {"status": "failed", "output": output, "variants": []}
+    finally:
+        language_slots.release(language, token)
+    logger.info("Batch %s finished", run_id)
+    return _result(language, started, _offload_output(payload, {**result, "usage": asdict(usage)}))
+
+
+def _label(language: str) -> str:
+    # Job languages come from clients; keep metric label cardinality bounded.
+    return language if language in DEFAULT_RUN_COMMAND else "other"
+
+
+def _result(language: str, started: float, result: dict) -> str:
+    """Record the run's metrics and serialize it; failures carry a `cause`."""
+    if result["status"] == "failed":
+        # Batch build failures return the compiler output, without a failure prefix.
+        result.setdefault("cause", failure_cause(result["output"]) or "build")
+    observe_run(
+        _label(language),
+        result["status"],
+        result.get("cause"),
+        time.monotonic() - started,
+        result.get("usage") or {},
+    )
+    return json.dumps(result)
+
+
+def _upload(url: str, body: bytes) -> None:
+    if url.startswith("file:"):
+        # The API's filesystem log store, for development setups sharing one host.
+        Path(urllib.request.url2pathname(urllib.parse.urlparse(url).path)).write_bytes(body)
+        return
+    request = urllib.request.Request(url, data=body, method="PUT")
+    with urllib.request.urlopen(request):
+        pass
+
+
+def _offload_output(payload: dict, result: dict) -> dict:
+    """
+    Upload an output over the API's inline limit to the log URL sent with the job and publish
+    only a preview. Should the upload fail, the full output is published as before.
+    """
+    url = payload.get("log_url")
+    data = result.get("output", "").encode()
+    if not url or len(data) <= payload.get("log_inline_limit", 0):
+        return result
+    try:
+        _upload(url, gzip.compress(data, compresslevel=LOG_GZIP_LEVEL))
+    except (OSError, ValueError) as exc:
+        logger.warning("Failed to upload the output of run %s: %s", payload.get("id"), exc)
+        return result
+    preview = log_preview(data, payload.get("log_preview_bytes", 4096))
+    return {**result, "output": preview, "log_bytes": len(data)}
+
+
+def _download(url: str) -> Iterator[bytes]:
+    with urllib.request.urlopen(url) as response:
+        while chunk := response.read(settings.stdin_chunk_bytes):
+            yield chunk
+
+
+def _stdin(payload: dict) -> Iterator[bytes] | None:
+    """Interactive input relayed through Redis, a stored blob, or inline text, in that order."""
+    if payload.get("interactive") and payload.get("id"):
+        return input_chunks(payload["id"])
+    if payload.get("stdin_url"):
+        return _download(payload["stdin_url"])
+    if payload.get("stdin") is not None:
+        data = payload["stdin"].encode()
+        size = settings.stdin_chunk_bytes
+        return (data[offset:offset + size] for offset in range(0, len(data), size))
+    return None
+
+
+def _execute(payload: dict, language: str, usage: RunUsage) -> SandboxResult:
     files = payload.get("files", [])
     build_cmd = payload.get("build_cmd")
     run_cmd = payload.get("run_cmd")
-    language = payload.get("language", "python")
+    env = payload.get("env")
+    stdin = _stdin(payload)
+
+    if payload.get("stream") and payload.get("id"):
+        return sandbox.stream(
+            language=language,
+            files=files,
+            build_cmd=build_cmd,
+            run_cmd=run_cmd,
+            publisher=OutputPublisher(payload["id"]),
+            env=env,
+            stdin=stdin,
+            usage=usage,
+        )
+    return sandbox.run(
+        language=language,
+        files=files,
+        build_cmd=build_cmd,
+        run_cmd=run_cmd,
+        env=env,
+        stdin=stdin,
+        usage=usage,
+    )
+
+
+@celery_app.task(name="runner.pool_stats")
+def pool_stats() -> dict:
+    return sandbox.stats()
+
 
-    output = sandbox.run(language=language, files=files, build_cmd=build_cmd, run_cmd=run_cmd)
-    logger.info("Run %s finished", payload.get("id"))
-    return json.dumps({"output": output})
+@celery_app.task(name="runner.warmup_report")
+def warmup_report() -> dict:
+    return runner_warmup.snapshot()
 
 
 if __name__ == "__main__":
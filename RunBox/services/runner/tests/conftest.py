@@ -0,0 +1,6 @@
+import os
+
+# Settings are read at import time; keep the slow cases short and the exporter off.
+os.environ.setdefault("RUNBOX_SANDBOX_TIMEOUT", "2")
+os.environ.setdefault("RUNBOX_SANDBOX_OUTPUT_LIMIT", "65536")
+os.environ.setdefault("RUNBOX_METRICS_PORT", "0")
@@ -0,0 +1,24 @@
+import os
+
+from src.artifacts import ArtifactCache
+from src.config import settings
+
+
+def test_put_evicts_the_oldest_entries_past_the_limit(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "artifact_cache_max_bytes", 25)
+    cache = ArtifactCache(str(tmp_path))
+    for index, key in enumerate(["aa1", "bb2", "cc3"]):
+        cache.put(key, b"x" * 10)
+        os.utime(cache._path(key), (index, index))
+    assert cache.get("aa1") is None
+    assert cache.get("bb2") == cache.get("cc3") == b"x" * 10
+
+
+def test_put_tolerates_entries_removed_by_other_workers(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "artifact_cache_max_bytes", 15)
+    cache = ArtifactCache(str(tmp_path))
+    cache.put("aa1", b"x" * 10)
+    # Another worker evicts the entry behind this one's running total.
+    cache._path("aa1").unlink()
+    cache.put("bb2", b"x" * 10)
+    assert cache.get("bb2") == b"x" * 10
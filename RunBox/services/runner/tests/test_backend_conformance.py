@@ -0,0 +1,171 @@
+"""
+The execution contract, checked the same way against every registered backend
+(`backends.BACKENDS`) and the API's inline LocalSandbox: exit codes and `failure_cause()` for
+normal exits, errors, signals, timeouts and build failures, stdin and env passing, and
+per-stream output truncation. Backends unavailable here (e.g. no Docker daemon) are skipped, and
+so are cases a backend does not claim in its `capabilities`.
+"""
+from __future__ import annotations
+
+import asyncio
+import importlib
+import importlib.util
+import sys
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable
+
+import pytest
+
+from src.backends import BACKENDS, backend_factory
+from src.config import settings
+
+API_SRC = Path(__file__).resolve().parents[3] / "apps" / "api" / "src"
+
+
+def main_py(source: str) -> list[dict[str, str]]:
+    return [{"name": "Main.py", "content": source}]
+
+
+@dataclass
+class Case:
+    name: str
+    source: str
+    check: Callable[[Any], bool]
+    build_cmd: str | None = None
+    stdin: bytes | None = None
+    env: dict[str, str] | None = None
+    # Capability flag the case depends on.
+    needs: str | None = None
+
+
+CASES = [
+    Case(
+        "hello",
+        "print('hello')\n",
+        lambda r: r.exit_code == 0 and r.stdout == "hello\n" and r.failure_cause() is None,
+    ),
+    Case(
+        "exit code",
+        "import sys\nprint('oops', file=sys.stderr)\nsys.exit(3)\n",
+        lambda r: r.exit_code == 3
+        and "oops" in r.stderr
+        and r.failure_cause() == "exit_code"
+        and r.output.startswith("Process exited with code 3\n"),
+    ),
+    Case(
+        "exception",
+        "raise ValueError('boom')\n",
+        lambda r: r.exit_code == 1 and "ValueError: boom" in r.stderr,
+    ),
+    Case(
+        "signal",
+        "import os, signal\nos.kill(os.getpid(), signal.SIGKILL)\n",
+        lambda r: r.failure_cause() == "killed"
+        and not r.timed_out
+        and r.exit_code in (None, 128 + 9),
+    ),
+    Case(
+        "timeout",
+        "import time\nprint('started', flush=True)\ntime.sleep(60)\n",
+        lambda r: r.timed_out
+        and r.exit_code is None
+        and r.failure_cause() == "timeout"
+        and r.output.startswith("Process timed out"),
+    ),
+    Case(
+        "truncation",
+        "import sys\nsys.stdout.write('x' * 4 * 1024 * 1024)\n",
+        lambda r: r.truncated
+        and settings.sandbox_output_limit <= len(r.stdout) < settings.sandbox_output_limit + 256
+        and "[output truncated" in r.output,
+    ),
+    Case(
+        "build failure",
+        "print('unreachable')\n",
+        lambda r: r.exit_code == 4
+        and r.failure_cause() == "exit_code"
+        and "unreachable" not in r.stdout,
+        build_cmd="echo broken >&2; exit 4",
+    ),
+    Case(
+        "stdin",
+        "print(input()[::-1])\n",
+        lambda r: r.exit_code == 0 and r.stdout == "olleh\n",
+        stdin=b"hello\n",
+        needs="stdin",
+    ),
+    Case(
+        "env",
+        "import os\nprint(os.environ['GREETING'])\n",
+        lambda r: r.exit_code == 0 and r.stdout == "hi\n",
+        env={"GREETING": "hi"},
+    ),
+]
+
+
+class ApiSandbox:
+    """The API's LocalSandbox behind the runner's synchronous `run`."""
+
+    def __init__(self, sandbox) -> None:
+        self.name = sandbox.name
+        self.capabilities = sandbox.capabilities
+        self._sandbox = sandbox
+
+    def run(self, language, files, build_cmd, run_cmd, env=None, stdin=None):
+        return asyncio.run(
+            self._sandbox.run_async(language, files, build_cmd, run_cmd, env=env, stdin=stdin)
+        )
+
+    def close(self) -> None:
+        """LocalSandbox holds nothing between runs."""
+
+
+def load_api_sandbox() -> ApiSandbox:
+    """Import the API's LocalSandbox under its own name; both services call their package `src`."""
+    spec = importlib.util.spec_from_file_location(
+        "runbox_api", API_SRC / "__init__.py", submodule_search_locations=[str(API_SRC)]
+    )
+    package = importlib.util.module_from_spec(spec)
+    sys.modules["runbox_api"] = package
+    spec.loader.exec_module(package)
+    return ApiSandbox(importlib.import_module("runbox_api.services.executor").sandbox)
+
+
+@pytest.fixture(scope="module", params=[*BACKENDS, "api"])
+def backend(request):
+    if request.param == "api":
+        # The API's dependencies are only installed next to it.
+        pytest.importorskip("pydantic_settings")
+        backend = load_api_sandbox()
+    else:
+        backend = backend_factory(request.param)()
+    try:
+        probe = backend.run("python", main_py("print('hello')\n"), None, None)
+        if probe.error:
+            pytest.skip(f"{request.param} unavailable: {probe.error.splitlines()[0][:120]}")
+        yield backend
+    finally:
+        backend.close()
+
+
+@pytest.mark.parametrize("case", CASES, ids=[case.name for case in CASES])
+def test_conformance(backend, case: Case):
+    if case.needs and not getattr(backend.capabilities, case.needs):
+        pytest.skip(f"{backend.name} has no {case.needs} support")
+    stdin = iter([case.stdin]) if case.stdin is not None else None
+    result = backend.run(
+        "python", main_py(case.source), case.build_cmd, None, env=case.env, stdin=stdin
+    )
+    assert case.check(result), (
+        f"exit_code={result.exit_code} timed_out={result.timed_out} "
+        f"truncated={result.truncated} cause={result.failure_cause()} "
+        f"stdout={result.stdout[:80]!r} stderr={result.stderr[-200:]!r}"
+    )
+
+
+@pytest.mark.parametrize("name", ["../escaped.py", "/tmp/escaped.py"])
+def test_rejects_file_names_outside_the_workspace(backend, name):
+    files = [*main_py("print('hello')\n"), {"name": name, "content": "print('escaped')\n"}]
+    result = backend.run("python", files, None, None)
+    assert result.failure_cause() == "docker_error" and "invalid file name" in result.error
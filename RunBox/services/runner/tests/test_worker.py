@@ -0,0 +1,29 @@
+import gzip
+
+from src.worker import _offload_output
+
+
+def test_large_outputs_are_uploaded_and_published_as_a_preview(tmp_path):
+    target = tmp_path / "runs" / "run-1" / "output.log.gz"
+    target.parent.mkdir(parents=True)
+    payload = {
+        "id": "run-1",
+        "log_url": target.as_uri(),
+        "log_inline_limit": 100,
+        "log_preview_bytes": 50,
+    }
+    output = "a" * 200 + "b" * 200
+
+    published = _offload_output(payload, {"status": "completed", "output": output})
+    assert published["log_bytes"] == 400
+    assert published["output"] == f"{'a' * 50}\n... [300 bytes omitted, see /logs] ...\n{'b' * 50}"
+    assert gzip.decompress(target.read_bytes()).decode() == output
+
+    small = {"status": "completed", "output": "ok"}
+    assert _offload_output(payload, small) is small
+
+
+def test_failed_uploads_publish_the_full_output(tmp_path):
+    payload = {"log_url": (tmp_path / "missing" / "log.gz").as_uri(), "log_inline_limit": 1}
+    result = {"status": "completed", "output": "full output"}
+    assert _offload_output(payload, result) is result